@@ -0,0 +1,215 @@
+# chat/admission.py
+"""
+Controle de admissão das chamadas ao modelo.
+
+Sem limite, cada turno do chat vai direto ao provedor e, num pico, todos
+os workers ficam presos esperando o modelo: até as telas de lembretes e
+contatos passam a esperar por um worker livre. Aqui há um número máximo
+de chamadas simultâneas (CHAT_MAX_CONCURRENT_LLM_CALLS) e uma fila curta
+(CHAT_ADMISSION_QUEUE_SIZE, esperando no máximo CHAT_ADMISSION_WAIT
+segundos). Fila cheia ou espera esgotada: o turno é recusado na hora
+(ChatSaturatedError -> 503 + Retry-After) em vez de ocupar mais um worker.
+
+O mesmo portão vale para as views síncronas (threads) e para a view async
+(event loop): a vaga liberada passa direto para o primeiro da fila (FIFO).
+"""
+import asyncio
+import threading
+from collections import deque
+from contextlib import asynccontextmanager, contextmanager
+
+from django.conf import settings
+
+BUSY_REPLY = (
+    "Estou atendendo muitas pessoas neste momento. "
+    "Pode me perguntar de novo daqui a alguns segundos?"
+)
+
+
+class ChatSaturatedError(Exception):
+    """Todas as vagas de chamada ao modelo estão ocupadas e a fila está cheia."""
+
+    # Resposta amigável mostrada ao paciente no lugar da do modelo
+    reply = BUSY_REPLY
+
+    def __init__(self, retry_after: float) -> None:
+        self.retry_after = retry_after
+        super().__init__(
+            f"Assistente sobrecarregado. Nova tentativa em {retry_after:.0f}s."
+        )
+
+
+class _Waiter:
+    """Um turno esperando vaga: thread (Event) ou corrotina (Future do loop)."""
+    __slots__ = ("event", "loop", "future", "granted")
+
+    def __init__(self, event=None, loop=None, future=None) -> None:
+        self.event = event
+        self.loop = loop
+        self.future = future
+        self.granted = False
+
+    def wake(self) -> bool:
+        if self.event is not None:
+            self.event.set()
+            return True
+        try:
+            self.loop.call_soon_threadsafe(_resolve, self.future)
+        except RuntimeError:
+            return False  # loop já fechado: a vaga vai para o próximo
+        return True
+
+
+def _resolve(future) -> None:
+    if not future.done():
+        future.set_result(None)
+
+
+class AdmissionGate:
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._in_flight = 0
+        self._waiters: deque[_Waiter] = deque()
+        self._admitted = 0
+        self._waited = 0
+        self._rejected = 0
+        self._peak = 0
+
+    @staticmethod
+    def _limit() -> int:
+        return getattr(settings, 'CHAT_MAX_CONCURRENT_LLM_CALLS', 32)
+
+    @staticmethod
+    def _queue_size() -> int:
+        return getattr(settings, 'CHAT_ADMISSION_QUEUE_SIZE', 32)
+
+    @staticmethod
+    def _wait() -> float:
+        return getattr(settings, 'CHAT_ADMISSION_WAIT', 1.0)
+
+    # -- com o lock ----------------------------------------------------------
+
+    def _enter_locked(self) -> bool:
+        if self._in_flight < self._limit() and not self._waiters:
+            self._in_flight += 1
+            self._admitted += 1
+            self._peak = max(self._peak, self._in_flight)
+            return True
+        return False
+
+    def _can_queue_locked(self) -> bool:
+        return self._wait() > 0 and len(self._waiters) < self._queue_size()
+
+    def _reject_locked(self) -> ChatSaturatedError:
+        self._rejected += 1
+        return ChatSaturatedError(getattr(settings, 'CHAT_ADMISSION_RETRY_AFTER', 2))
+
+    def _queue_locked(self, waiter: _Waiter) -> None:
+        self._waiters.append(waiter)
+        self._waited += 1
+
+    def _give_up_locked(self, waiter: _Waiter) -> bool:
+        """Desiste da fila. False se a vaga chegou nesse meio tempo."""
+        if waiter.granted:
+            return False
+        self._waiters.remove(waiter)
+        return True
+
+    # -- API -------------------------------------------------------------------
+
+    def check(self) -> None:
+        """
+        Recusa na hora (ChatSaturatedError) se um turno novo não teria vaga
+        nem lugar na fila. Usado antes de abrir um stream, que não pode
+        mais virar 503 depois de começar.
+        """
+        with self._lock:
+            if self._in_flight >= self._limit() and not self._can_queue_locked():
+                raise self._reject_locked()
+
+    def acquire(self) -> None:
+        """Ocupa uma vaga, esperando na fila se preciso. Sem vaga: ChatSaturatedError."""
+        with self._lock:
+            if self._enter_locked():
+                return
+            if not self._can_queue_locked():
+                raise self._reject_locked()
+            waiter = _Waiter(event=threading.Event())
+            self._queue_locked(waiter)
+
+        if waiter.event.wait(self._wait()):
+            return
+        with self._lock:
+            if self._give_up_locked(waiter):
+                raise self._reject_locked()
+
+    async def aacquire(self) -> None:
+        """Versão assíncrona de acquire: espera na fila sem bloquear o event loop."""
+        with self._lock:
+            if self._enter_locked():
+                return
+            if not self._can_queue_locked():
+                raise self._reject_locked()
+            loop = asyncio.get_running_loop()
+            waiter = _Waiter(loop=loop, future=loop.create_future())
+            self._queue_locked(waiter)
+
+        try:
+            await asyncio.wait_for(asyncio.shield(waiter.future), self._wait())
+            return
+        except asyncio.TimeoutError:
+            pass
+        except asyncio.CancelledError:
+            # Quem esperava foi cancelado: se a vaga já era dele, devolve
+            with self._lock:
+                gave_up = self._give_up_locked(waiter)
+            if not gave_up:
+                self.release()
+            raise
+
+        with self._lock:
+            if self._give_up_locked(waiter):
+                raise self._reject_locked()
+
+    def release(self) -> None:
+        """Libera a vaga: vai direto para o primeiro da fila, se houver."""
+        with self._lock:
+            while self._waiters:
+                waiter = self._waiters.popleft()
+                waiter.granted = True
+                self._admitted += 1
+                if waiter.wake():
+                    return
+            self._in_flight -= 1
+
+    @contextmanager
+    def slot(self):
+        self.acquire()
+        try:
+            yield
+        finally:
+            self.release()
+
+    @asynccontextmanager
+    async def aslot(self):
+        await self.aacquire()
+        try:
+            yield
+        finally:
+            self.release()
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {
+                "limite": self._limit(),
+                "em_andamento": self._in_flight,
+                "na_fila": len(self._waiters),
+                "pico": self._peak,
+                "admitidas": self._admitted,
+                "esperaram_na_fila": self._waited,
+                "recusadas": self._rejected,
+            }
+
+
+# Portão compartilhado pelo processo (views síncronas e async)
+chat_admission = AdmissionGate()
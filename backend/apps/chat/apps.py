@@ -4,3 +4,9 @@ from django.apps import AppConfig
 class ChatConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'apps.chat'
+
+    def ready(self):
+        # Invalidação do contexto RAG em cache. O ChatEngine não é criado
+        # aqui, em todo comando de gerenciamento: só o servidor o pré-carrega
+        # (wsgi.py / asgi.py, ver chat/registry.py).
+        from . import signals  # noqa: F401
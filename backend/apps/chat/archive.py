@@ -0,0 +1,148 @@
+# chat/archive.py
+"""
+Arquivamento (armazenamento frio) do histórico do chat.
+
+O HistoricoChat cresce para sempre e fica no mesmo arquivo SQLite de todo
+o resto: cada consulta e cada backup pagam pelo histórico inteiro. Aqui as
+mensagens com mais de CHAT_ARCHIVE_AFTER_DAYS dias saem da tabela e viram
+segmentos ArquivoChat de até CHAT_ARCHIVE_SEGMENT_MESSAGES mensagens, em
+NDJSON comprimido com zlib. Cada segmento é gravado e as mensagens
+apagadas na mesma transação, então o comando pode ser interrompido a
+qualquer momento sem perder nem duplicar nada.
+
+Com CHAT_ARCHIVE_REQUIRE_SUMMARY, só são arquivadas mensagens já
+incorporadas ao resumo (ResumoConversa.ultima_mensagem_id), para que
+nenhuma memória se perca do prompt. Segmentos com mais de
+CHAT_ARCHIVE_RETENTION_DAYS dias são expurgados (None: guarda para sempre).
+
+Rodado pelo comando 'arquivar_historico' (cron ou --loop).
+"""
+import json
+import logging
+import zlib
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.utils import timezone
+
+from .models import ArquivoChat, HistoricoChat, ResumoConversa
+from .vector_index import SOURCE_CHAT, vector_index
+
+logger = logging.getLogger(__name__)
+
+FIELDS = ('id', 'sessao_id', 'role', 'content', 'timestamp')
+
+
+def archive_cutoff(now=None, days=None):
+    """Mensagens anteriores a este instante vão para o arquivo."""
+    if days is None:
+        days = getattr(settings, 'CHAT_ARCHIVE_AFTER_DAYS', 180)
+    return (now or timezone.now()) - timedelta(days=days)
+
+
+def encode_segment(rows: list[dict]) -> tuple[bytes, int]:
+    """NDJSON comprimido das mensagens e o tamanho antes da compressão."""
+    raw = "\n".join(
+        json.dumps({**row, 'timestamp': row['timestamp'].isoformat()}, ensure_ascii=False)
+        for row in rows
+    ).encode()
+    return zlib.compress(raw, getattr(settings, 'CHAT_ARCHIVE_COMPRESSION_LEVEL', 6)), len(raw)
+
+
+def read_segment(segment: ArquivoChat) -> list[dict]:
+    """Mensagens de um segmento, em ordem cronológica."""
+    raw = zlib.decompress(bytes(segment.dados)).decode()
+    return [json.loads(line) for line in raw.splitlines() if line]
+
+
+def _archivable_qs(user_id, cutoff):
+    qs = HistoricoChat.objects.filter(usuario_id=user_id, timestamp__lt=cutoff)
+    if getattr(settings, 'CHAT_ARCHIVE_REQUIRE_SUMMARY', True):
+        summarized = (
+            ResumoConversa.objects.filter(usuario_id=user_id)
+            .values_list('ultima_mensagem_id', flat=True).first()
+        ) or 0
+        qs = qs.filter(id__lte=summarized)
+    return qs
+
+
+def archive_user(user_id, cutoff, segment_size: int | None = None) -> int:
+    """
+    Move as mensagens antigas de um usuário para segmentos arquivados.
+    Retorna quantas mensagens saíram do HistoricoChat.
+    """
+    if segment_size is None:
+        segment_size = getattr(settings, 'CHAT_ARCHIVE_SEGMENT_MESSAGES', 500)
+
+    qs = _archivable_qs(user_id, cutoff)
+    total = 0
+    while True:
+        rows = list(qs.order_by('timestamp', 'id').values(*FIELDS)[:segment_size])
+        if not rows:
+            break
+        dados, tamanho = encode_segment(rows)
+        ids = [row['id'] for row in rows]
+        with transaction.atomic():
+            ArquivoChat.objects.create(
+                usuario_id=user_id,
+                primeira_mensagem_id=min(ids),
+                ultima_mensagem_id=max(ids),
+                inicio=rows[0]['timestamp'],
+                fim=rows[-1]['timestamp'],
+                mensagens=len(rows),
+                dados=dados,
+                tamanho_original=tamanho,
+            )
+            HistoricoChat.objects.filter(id__in=ids).delete()
+        # As mensagens não existem mais: tira do índice semântico
+        vector_index.remove(user_id, SOURCE_CHAT, ids)
+        total += len(rows)
+        if len(rows) < segment_size:
+            break
+    return total
+
+
+def archive_all(now=None, days=None, usernames=None) -> dict:
+    """Arquiva o histórico antigo de todos os usuários (ou só de 'usernames')."""
+    cutoff = archive_cutoff(now, days)
+    users = HistoricoChat.objects.filter(timestamp__lt=cutoff)
+    if usernames:
+        users = users.filter(usuario__username__in=usernames)
+
+    stats = {"usuarios": 0, "mensagens": 0, "erros": 0}
+    for user_id in users.order_by().values_list('usuario_id', flat=True).distinct():
+        try:
+            moved = archive_user(user_id, cutoff)
+        except Exception:
+            logger.exception("Erro ao arquivar o histórico do usuário %s", user_id)
+            stats["erros"] += 1
+            continue
+        if moved:
+            stats["usuarios"] += 1
+            stats["mensagens"] += moved
+    return stats
+
+
+def purge_expired(now=None, retention_days=None) -> int:
+    """Apaga os segmentos além do prazo de retenção. Retorna quantos saíram."""
+    if retention_days is None:
+        retention_days = getattr(settings, 'CHAT_ARCHIVE_RETENTION_DAYS', None)
+    if not retention_days:
+        return 0
+    limit = (now or timezone.now()) - timedelta(days=retention_days)
+    deleted, _ = ArquivoChat.objects.filter(fim__lt=limit).delete()
+    return deleted
+
+
+def compact_database() -> bool:
+    """
+    Devolve ao sistema o espaço das linhas apagadas (VACUUM). Só no
+    SQLite, onde o arquivo não encolhe sozinho, e fora de transação;
+    trava o banco enquanto roda.
+    """
+    if connection.vendor != 'sqlite' or connection.in_atomic_block:
+        return False
+    with connection.cursor() as cursor:
+        cursor.execute("VACUUM")
+    return True
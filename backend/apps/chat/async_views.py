@@ -0,0 +1,271 @@
+# chat/async_views.py
+"""
+View async do chat, para rodar sob ASGI (ex: uvicorn guardiao_backend.asgi:application).
+
+As views do DRF são síncronas: sob ASGI cada chamada ao modelo ainda
+ocupa uma thread enquanto espera o provedor. Aqui a espera é feita com
+o AsyncInferenceClient e o ORM async, então um único processo segura
+centenas de conversas aguardando o modelo ao mesmo tempo.
+
+Mesmo contrato do POST /api/chat/ (inclusive ?stream=1 e ?async=1), com
+autenticação por token. Também serve o long-polling das tarefas do modo
+assíncrono (GET /api/chat/async/tarefas/<id>/?esperar=N): aqui a espera
+não ocupa uma thread, então pode durar até CHAT_JOB_MAX_WAIT segundos.
+"""
+import json
+from contextlib import aclosing, nullcontext
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.http import JsonResponse, StreamingHttpResponse
+from django.urls import reverse
+from django.utils import timezone
+from django.utils.decorators import classonlymethod
+from django.views import View
+from django.views.decorators.csrf import csrf_exempt
+
+from . import jobs
+from .admission import ChatSaturatedError, chat_admission
+from .authentication import aauthenticate_token
+from .conversation import abuild_history, apersist_turn, aquick_answer
+from .intents import is_intent
+from .models import TarefaChat
+from .registry import get_engine
+from .renderers import format_sse
+from .resilience import FALLBACK_REPLY, CircuitOpenError, is_retryable, llm_breaker
+from .response_cache import response_cache
+from .serializers import ChatInputSerializer, TarefaChatSerializer
+from .singleflight import get_async_flights
+from .throttling import ChatRateThrottle
+from .tokens import TokenUsage
+from .usage import arecord_usage, atoken_plan
+
+
+def _json_response(data, status=200):
+    # Acentos sem escape, como no JSONRenderer do DRF
+    return JsonResponse(data, status=status, json_dumps_params={"ensure_ascii": False})
+
+
+def _unauthorized_response():
+    return _json_response(
+        {"detail": "As credenciais de autenticação não foram fornecidas ou são inválidas."},
+        status=401,
+    )
+
+
+class AsyncChatView(View):
+    http_method_names = ['post', 'options']
+
+    @classonlymethod
+    def as_view(cls, **initkwargs):
+        # Autenticação por token (sem cookie de sessão): CSRF não se aplica,
+        # assim como no APIView do DRF.
+        return csrf_exempt(super().as_view(**initkwargs))
+
+    def _unavailable_response(self, exc):
+        retry_after = getattr(exc, 'retry_after', None) or llm_breaker.retry_after() or 5
+        response = _json_response(
+            {"resposta": getattr(exc, 'reply', FALLBACK_REPLY), "error": f"Erro na IA: {str(exc)}"},
+            status=503,
+        )
+        response['Retry-After'] = str(int(retry_after + 0.999))
+        return response
+
+    def _wants_async(self, request):
+        value = request.GET.get('async')
+        if value is not None:
+            return value in ('1', 'true')
+        # Modo assíncrono como padrão (CHAT_ASYNC_MODE), exceto para streaming
+        return getattr(settings, 'CHAT_ASYNC_MODE', False) and request.GET.get('stream') not in ('1', 'true')
+
+    async def _enqueue_response(self, user, user_input):
+        """Enfileira o turno (ver chat/jobs.py); o resultado sai no long-polling async."""
+        job = await sync_to_async(jobs.enqueue)(user, user_input)
+        url = reverse('chat-async-tarefa', args=[job.id])
+        response = _json_response({"tarefa": job.id, "status": job.status, "url": url}, status=202)
+        response['Location'] = url
+        return response
+
+    def _error_event(self, exc, partial):
+        data = {"error": f"Erro na IA: {str(exc)}"}
+        if not partial and (isinstance(exc, (CircuitOpenError, ChatSaturatedError)) or is_retryable(exc)):
+            data["resposta"] = getattr(exc, 'reply', FALLBACK_REPLY)
+        return format_sse('error', data)
+
+    def _stream_response(self, engine, user, user_input):
+        """Mesmos eventos SSE (e mesma coalescência) do ChatAPIView."""
+        flights = get_async_flights()
+
+        async def event_stream():
+            flight, leader = flights.begin(user.pk, user_input)
+            if not leader:
+                try:
+                    answer = await flights.wait(flight)
+                except Exception as e:
+                    yield self._error_event(e, partial=False)
+                    return
+                yield format_sse('token', {"delta": answer})
+                yield format_sse('done', {"resposta": answer})
+                return
+
+            parts = []
+            answer = ""
+            error = None
+            usage = None
+            # Vaga antes da vez do usuário, como no ChatAPIView
+            slot = nullcontext() if is_intent(user_input) else chat_admission.aslot()
+            try:
+                async with slot, flights.user_turn(user.pk):
+                    try:
+                        now = timezone.now()
+                        quick, cache_key = await aquick_answer(user, user_input, now)
+                        if quick is not None:
+                            parts.append(quick)
+                            yield format_sse('token', {"delta": quick})
+                        else:
+                            plan = await atoken_plan(user, now)
+                            history_list = await abuild_history(
+                                user, user_input, now, engine.system_prompt, plan.prompt_budget
+                            )
+                            usage = TokenUsage()
+                            async with aclosing(engine.astream_message(
+                                user_input, history_list, plan.max_tokens, usage
+                            )) as stream:
+                                async for delta in stream:
+                                    parts.append(delta)
+                                    yield format_sse('token', {"delta": delta})
+                            response_cache.put(cache_key, "".join(parts).strip())
+                    except Exception as e:
+                        error = e
+                        yield self._error_event(e, partial=bool(parts))
+                    finally:
+                        answer = "".join(parts).strip()
+                        if answer:
+                            await apersist_turn(user, user_input, answer)
+                        if usage is not None:
+                            await arecord_usage(user, now, usage)
+            except ChatSaturatedError as e:
+                error = e
+                yield self._error_event(e, partial=False)
+            finally:
+                # Resposta cortada por erro não vale para quem repetir a pergunta
+                if answer and error is None:
+                    flights.finish(user.pk, user_input, flight, result=answer)
+                else:
+                    flights.finish(
+                        user.pk, user_input, flight,
+                        error=error or RuntimeError("Turno interrompido antes da resposta."),
+                    )
+            if error is None:
+                yield format_sse('done', {"resposta": answer})
+
+        response = StreamingHttpResponse(
+            event_stream(),
+            content_type='text/event-stream; charset=utf-8',
+        )
+        response['Cache-Control'] = 'no-cache'
+        response['X-Accel-Buffering'] = 'no'
+        return response
+
+    async def post(self, request, *args, **kwargs):
+        user = await aauthenticate_token(request)
+        if user is None:
+            return _unauthorized_response()
+
+        # Mesmo limite por usuário do POST /api/chat/ (ver throttling.py)
+        request.user = user
+        throttle = ChatRateThrottle()
+        # O throttle lê e grava no cache (Redis/Memcached fazem I/O): fora do loop
+        if not await sync_to_async(throttle.allow_request)(request, self):
+            wait = throttle.wait() or 1
+            response = _json_response(
+                {"detail": f"Muitas mensagens seguidas. Tente de novo em {int(wait + 0.999)}s."},
+                status=429,
+            )
+            response['Retry-After'] = str(int(wait + 0.999))
+            return response
+
+        try:
+            data = json.loads(request.body or b'{}')
+        except ValueError:
+            return _json_response({"detail": "JSON inválido."}, status=400)
+
+        serializer = ChatInputSerializer(data=data)
+        if not serializer.is_valid():
+            return _json_response(serializer.errors, status=400)
+
+        user_input = serializer.validated_data["message"]
+
+        # Modo assíncrono: o modelo é chamado pelos workers da fila
+        if self._wants_async(request):
+            return await self._enqueue_response(user, user_input)
+
+        try:
+            engine = get_engine()
+        except Exception as e:
+            return _json_response({"error": f"Erro na IA: {str(e)}"}, status=500)
+
+        if request.GET.get('stream') in ('1', 'true'):
+            if not is_intent(user_input):
+                if llm_breaker.is_open():
+                    return self._unavailable_response(CircuitOpenError(llm_breaker.retry_after()))
+                try:
+                    chat_admission.check()
+                except ChatSaturatedError as e:
+                    return self._unavailable_response(e)
+            return self._stream_response(engine, user, user_input)
+
+        async def answer_turn():
+            now = timezone.now()
+            answer, cache_key = await aquick_answer(user, user_input, now)
+            if answer is None:
+                plan = await atoken_plan(user, now)
+                history_list = await abuild_history(
+                    user, user_input, now, engine.system_prompt, plan.prompt_budget
+                )
+                usage = TokenUsage()
+                answer = await engine.asend_message(user_input, history_list, plan.max_tokens, usage)
+                await arecord_usage(user, now, usage)
+                response_cache.put(cache_key, answer)
+            await apersist_turn(user, user_input, answer)
+            return answer
+
+        # Vaga para chamar o modelo antes da vez do usuário (ver ChatAPIView.post)
+        slot = None if is_intent(user_input) else chat_admission.aslot()
+        try:
+            answer, _ = await get_async_flights().do(user.pk, user_input, answer_turn, slot=slot)
+        except (CircuitOpenError, ChatSaturatedError) as e:
+            return self._unavailable_response(e)
+        except Exception as e:
+            if is_retryable(e):
+                return self._unavailable_response(e)
+            return _json_response({"error": f"Erro na IA: {str(e)}"}, status=500)
+
+        return _json_response({"resposta": answer})
+
+
+class AsyncChatTarefaView(View):
+    """Long-polling do resultado de um turno enfileirado (ver chat/jobs.py)."""
+    http_method_names = ['get', 'options']
+
+    async def get(self, request, pk, *args, **kwargs):
+        user = await aauthenticate_token(request)
+        if user is None:
+            return _unauthorized_response()
+
+        try:
+            wait = float(request.GET.get('esperar', 0))
+        except ValueError:
+            return _json_response({"esperar": ["Informe um número de segundos."]}, status=400)
+        wait = min(max(wait, 0.0), getattr(settings, 'CHAT_JOB_MAX_WAIT', 25))
+
+        try:
+            job = await jobs.await_for(pk, user, wait)
+        except TarefaChat.DoesNotExist:
+            return _json_response({"detail": "Tarefa não encontrada."}, status=404)
+
+        response = _json_response(TarefaChatSerializer(job).data)
+        retry_after = jobs.retry_after(job)
+        if retry_after is not None:
+            response['Retry-After'] = str(retry_after)
+        return response
@@ -0,0 +1,23 @@
+# chat/authentication.py
+"""
+Autenticação por token (mesmo 'Authorization: Token <chave>' do DRF)
+para as views async, que não passam pelo APIView do DRF.
+"""
+from rest_framework.authtoken.models import Token
+
+
+async def aauthenticate_token(request):
+    """Usuário dono do token do header Authorization, ou None."""
+    header = request.headers.get('Authorization', '')
+    parts = header.split()
+    if len(parts) != 2 or parts[0].lower() != 'token':
+        return None
+
+    try:
+        token = await Token.objects.select_related('user').aget(key=parts[1])
+    except Token.DoesNotExist:
+        return None
+
+    if not token.user.is_active:
+        return None
+    return token.user
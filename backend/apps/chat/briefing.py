@@ -0,0 +1,171 @@
+# chat/briefing.py
+"""
+Briefing diário ("bom dia" + agenda do dia) gerado em lote.
+
+O primeiro chat do dia quase sempre é um "bom dia" cuja resposta é a
+agenda do dia, e pagava a latência inteira do modelo. O comando
+'gerar_briefings' gera essa mensagem de madrugada para todos os usuários,
+com um pool de threads limitado, e ela é servida na hora:
+
+- pelo dashboard (GET /api/chat/briefing/);
+- no chat, como resposta à primeira saudação do dia (ver conversation.quick_answer),
+  desde que os lembretes/contatos não tenham mudado desde a geração.
+
+A geração é retomável: cada briefing é salvo assim que fica pronto e uma
+nova passada só processa quem ainda não tem o do dia (ou, com
+only_stale, quem teve o contexto alterado depois).
+"""
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, time
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.db import connection
+from django.utils import timezone
+
+from .context import aget_rag_data, build_rag_data, format_rag_context, get_rag_data, rag_fingerprint
+from .intents import is_greeting
+from .models import BriefingDiario, HistoricoChat
+from .resilience import llm_breaker
+from .write_buffer import history_buffer
+
+logger = logging.getLogger(__name__)
+
+GERADO = 'gerado'
+ATUAL = 'atual'
+ERRO = 'erro'
+
+
+def _start_of_day(now):
+    local_now = timezone.localtime(now)
+    return datetime.combine(local_now.date(), time.min, tzinfo=local_now.tzinfo)
+
+
+# -- geração em lote --------------------------------------------------------
+
+def pending_user_ids(day, after_id=0, limit=500, only_stale=False, usernames=None) -> list[int]:
+    """
+    Próxima página (por id) de usuários a processar. Sem only_stale, só
+    entram os que ainda não têm o briefing do dia.
+    """
+    users = User.objects.filter(is_active=True, id__gt=after_id)
+    if usernames:
+        users = users.filter(username__in=usernames)
+    if not only_stale:
+        users = users.exclude(briefings__data=day)
+    return list(users.order_by('id').values_list('id', flat=True)[:limit])
+
+
+def generate_for_user(engine, user_id, now, only_stale=False) -> str:
+    """
+    Gera (ou atualiza) o briefing do dia de um usuário. Devolve GERADO ou ATUAL.
+
+    O contexto é lido direto do banco, sem o cache do contexto RAG: o
+    comando roda em outro processo (às vezes por horas, com --loop), e a
+    comparação de only_stale precisa enxergar as edições feitas pela API.
+    """
+    user = User.objects.get(pk=user_id)
+    day = timezone.localtime(now).date()
+    data = build_rag_data(user, now)
+    fingerprint = rag_fingerprint(data)
+
+    if only_stale and BriefingDiario.objects.filter(
+        usuario=user, data=day, contexto_hash=fingerprint
+    ).exists():
+        return ATUAL
+
+    conteudo = engine.daily_briefing(format_rag_context(user, data, now))
+    # Um único INSERT ... ON CONFLICT DO UPDATE: sem ler antes de escrever,
+    # as threads não disputam o lock do banco (no SQLite, inclusive)
+    BriefingDiario.objects.bulk_create(
+        [BriefingDiario(usuario=user, data=day, conteudo=conteudo, contexto_hash=fingerprint)],
+        update_conflicts=True,
+        unique_fields=['usuario', 'data'],
+        update_fields=['conteudo', 'contexto_hash', 'gerado_em'],
+    )
+    return GERADO
+
+
+def generate_all(engine, now=None, workers=None, page_size=500, only_stale=False, usernames=None) -> dict:
+    """
+    Gera os briefings do dia para todos os usuários ativos, com até
+    'workers' chamadas ao modelo ao mesmo tempo. Os usuários são lidos em
+    páginas por id, então a memória não cresce com o número de usuários.
+    Para cedo se o circuit breaker abrir (o provedor caiu); a próxima
+    passada continua de onde parou.
+    """
+    now = now or timezone.now()
+    day = timezone.localtime(now).date()
+    workers = workers or getattr(settings, 'CHAT_BRIEFING_WORKERS', 8)
+    stats = {GERADO: 0, ATUAL: 0, ERRO: 0, "interrompido": False}
+
+    def task(user_id):
+        try:
+            return generate_for_user(engine, user_id, now, only_stale)
+        except Exception as e:
+            logger.warning("Erro ao gerar o briefing do usuário %s: %s", user_id, e)
+            return ERRO
+        finally:
+            # Cada thread do pool tem a sua conexão
+            connection.close()
+
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="briefing") as pool:
+        after_id = 0
+        while True:
+            ids = pending_user_ids(day, after_id, page_size, only_stale, usernames)
+            if not ids:
+                break
+            after_id = ids[-1]
+
+            for result in pool.map(task, ids):
+                stats[result] += 1
+
+            if llm_breaker.is_open():
+                stats["interrompido"] = True
+                break
+
+    return stats
+
+
+# -- uso no chat ------------------------------------------------------------
+
+def _first_turn_qs(user, now):
+    return HistoricoChat.objects.filter(usuario=user, timestamp__gte=_start_of_day(now))
+
+
+def _briefing_qs(user, now):
+    return (
+        BriefingDiario.objects
+        .filter(usuario=user, data=timezone.localtime(now).date())
+        .values_list('conteudo', 'contexto_hash')
+    )
+
+
+def briefing_for_first_turn(user, message: str, now) -> str | None:
+    """
+    O briefing do dia, se a mensagem é a primeira saudação do dia
+    ("bom dia!", "oi") e o briefing ainda bate com o contexto atual.
+    """
+    if not is_greeting(message):
+        return None
+    history_buffer.ensure_persisted(user.pk)
+    if _first_turn_qs(user, now).exists():
+        return None
+    briefing = _briefing_qs(user, now).first()
+    if briefing is None or briefing[1] != rag_fingerprint(get_rag_data(user, now)):
+        return None
+    return briefing[0]
+
+
+async def abriefing_for_first_turn(user, message: str, now) -> str | None:
+    """Versão assíncrona de briefing_for_first_turn (ORM async)."""
+    if not is_greeting(message):
+        return None
+    await history_buffer.aensure_persisted(user.pk)
+    if await _first_turn_qs(user, now).aexists():
+        return None
+    briefing = await _briefing_qs(user, now).afirst()
+    if briefing is None or briefing[1] != rag_fingerprint(await aget_rag_data(user, now)):
+        return None
+    return briefing[0]
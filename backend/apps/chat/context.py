@@ -0,0 +1,224 @@
+# chat/context.py
+"""
+Contexto RAG do chat (lembretes de hoje + contatos de emergência).
+
+Esses dados mudam poucas vezes por dia, mas o contexto é usado em toda
+mensagem do chat. Por isso a parte estruturada fica em cache por usuário
+e por dia. Só a linha de data/hora é montada a cada requisição.
+
+O cache pode ser local a cada processo (LocMemCache), então invalidar é
+apagar a chave só no processo que recebeu a mudança. Em vez disso, os
+signals de Lembrete, Contato, PerfilPaciente e EntradaDiario (ver chat/signals.py)
+incrementam a versão do contexto do usuário no banco (VersaoContexto), e
+a versão faz parte da chave: cada leitura custa uma consulta pelo índice
+único do usuário (sem escrever nada), e nenhum processo serve um
+contexto antigo.
+"""
+import hashlib
+from datetime import datetime, time, timedelta
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db.models import F
+from django.utils import timezone
+
+from apps.lembretes.models import Lembrete
+from apps.contatos.models import Contato
+from apps.core.models import PerfilPaciente
+
+from .models import VersaoContexto
+
+
+def _get_cache():
+    return caches[getattr(settings, 'CHAT_CONTEXT_CACHE_ALIAS', 'default')]
+
+
+def _cache_key(user_id, day, version) -> str:
+    return f"chat:rag:{user_id}:{day.isoformat()}:{version}"
+
+
+def _version_qs(user_id):
+    return VersaoContexto.objects.filter(usuario_id=user_id).values_list('versao', flat=True)
+
+
+def context_version(user_id) -> int:
+    """Versão atual do contexto do usuário (0 se nunca mudou). Só lê."""
+    return _version_qs(user_id).first() or 0
+
+
+async def acontext_version(user_id) -> int:
+    """Versão assíncrona de context_version."""
+    return await _version_qs(user_id).afirst() or 0
+
+
+def _seconds_until_end_of_day(now) -> int:
+    local_now = timezone.localtime(now)
+    tomorrow = datetime.combine(
+        local_now.date() + timedelta(days=1), time.min, tzinfo=local_now.tzinfo
+    )
+    return max(int((tomorrow - local_now).total_seconds()), 1)
+
+
+def _local_day_range(now):
+    """Início e fim (exclusivo) do dia local de 'now', como datetimes."""
+    local_now = timezone.localtime(now)
+    start = datetime.combine(local_now.date(), time.min, tzinfo=local_now.tzinfo)
+    end = datetime.combine(local_now.date() + timedelta(days=1), time.min, tzinfo=local_now.tzinfo)
+    return start, end
+
+
+def rag_querysets(user, now):
+    # Converte para o horário local para filtrar corretamente pelo "dia de hoje"
+    start, end = _local_day_range(now)
+
+    # 1. Recuperar lembretes:
+    # Filtramos pelo intervalo do dia de hoje (e não por data_hora__date,
+    # que aplica uma função na coluna e impede o uso do índice).
+    # Assim pegamos lembretes das 08:00 mesmo se agora forem 20:00.
+    lembretes = (
+        Lembrete.objects
+        .filter(
+            usuario=user,
+            concluido=False,
+            data_hora__gte=start,
+            data_hora__lt=end,
+        )
+        .order_by('data_hora')
+    )
+
+    contatos = Contato.objects.filter(usuario=user, is_emergencia=True)
+
+    nome_perfil = (
+        PerfilPaciente.objects
+        .filter(usuario=user)
+        .values_list('nome_completo', flat=True)
+    )
+    return lembretes, contatos, nome_perfil
+
+
+def _rag_data(lembretes, contatos, nome_perfil) -> dict:
+    # 2. Montar o texto do contexto
+    context_parts = []
+
+    # Lista de Lembretes
+    if lembretes:
+        context_parts.append("\nAGENDA DE HOJE (PENDENTES/ATIVOS):")
+        for lem in lembretes:
+            # Formata hora limpa (ex: 14:30)
+            hora_local = timezone.localtime(lem.data_hora).strftime('%H:%M')
+            # Ex: - [14:30] Tomar remédio X (Medicamento)
+            context_parts.append(
+                f"- [{hora_local}] {lem.titulo} (Tipo: {lem.get_tipo_display()})"
+            )
+    else:
+        context_parts.append("\nNão há lembretes agendados para hoje.")
+
+    # Lista de Contatos
+    if contatos:
+        context_parts.append("\nCONTATOS DE EMERGÊNCIA:")
+        for c in contatos:
+            context_parts.append(
+                f"- Nome: {c.nome}, Telefone: {c.telefone}"
+            )
+
+    return {
+        "nome": nome_perfil,
+        "corpo": "\n".join(context_parts),
+    }
+
+
+def build_rag_data(user, now) -> dict:
+    """
+    Recupera lembretes do DIA ATUAL (passados e futuros) e contatos
+    e monta a parte do contexto que não depende da hora atual.
+    """
+    lembretes, contatos, nome_perfil = rag_querysets(user, now)
+    return _rag_data(list(lembretes), list(contatos), nome_perfil.first())
+
+
+async def abuild_rag_data(user, now) -> dict:
+    """Versão assíncrona de build_rag_data (ORM async)."""
+    lembretes, contatos, nome_perfil = rag_querysets(user, now)
+    return _rag_data(
+        [lem async for lem in lembretes],
+        [c async for c in contatos],
+        await nome_perfil.afirst(),
+    )
+
+
+def get_rag_data(user, now) -> dict:
+    """
+    Parte estruturada do contexto (ver build_rag_data). Dentro do mesmo
+    dia, sem mudanças nos lembretes/contatos/perfil, só consulta a versão
+    do contexto. A versão é lida antes dos dados: um contexto montado
+    durante uma mudança fica guardado sob a versão antiga e não é servido.
+    """
+    cache = _get_cache()
+    key = _cache_key(user.pk, timezone.localtime(now).date(), context_version(user.pk))
+
+    data = cache.get(key)
+    if data is None:
+        data = build_rag_data(user, now)
+        cache.set(key, data, timeout=_seconds_until_end_of_day(now))
+    return data
+
+
+async def aget_rag_data(user, now) -> dict:
+    """Versão assíncrona de get_rag_data (view async sob ASGI)."""
+    cache = _get_cache()
+    key = _cache_key(user.pk, timezone.localtime(now).date(), await acontext_version(user.pk))
+
+    data = await cache.aget(key)
+    if data is None:
+        data = await abuild_rag_data(user, now)
+        await cache.aset(key, data, timeout=_seconds_until_end_of_day(now))
+    return data
+
+
+def rag_fingerprint(data) -> str:
+    """
+    Hash curto da parte estruturada do contexto: muda sempre que um
+    lembrete, contato ou o perfil do dia muda.
+    """
+    raw = f"{data['nome'] or ''}\n{data['corpo']}".encode("utf-8")
+    return hashlib.sha1(raw).hexdigest()[:16]
+
+
+def get_rag_context(user, now) -> str:
+    """Contexto textual para a IA (ver get_rag_data)."""
+    return format_rag_context(user, get_rag_data(user, now), now)
+
+
+async def aget_rag_context(user, now) -> str:
+    """Versão assíncrona de get_rag_context."""
+    return format_rag_context(user, await aget_rag_data(user, now), now)
+
+
+def format_rag_context(user, data, now) -> str:
+    """Contexto textual a partir da parte estruturada (get_rag_data ou build_rag_data)."""
+    # Definição do nome do paciente
+    nome_paciente = data["nome"] or user.first_name or user.username
+
+    # Cabeçalho do Contexto
+    header = [
+        f"Nome do Paciente: {nome_paciente}",
+        f"Data/Hora Atual: {timezone.localtime(now).strftime('%d/%m/%Y %H:%M')}",
+    ]
+    return "\n".join(header) + "\n" + data["corpo"]
+
+
+def invalidate_rag_context(user_id) -> int:
+    """
+    Invalida o contexto em cache do usuário em todos os processos
+    (incrementa a versão no banco; as entradas antigas expiram sozinhas).
+    A linha só é criada na primeira mudança, já com a versão 1.
+    Devolve a versão nova (usada pelos índices em memória, ver lexical_index.py).
+    """
+    updated = VersaoContexto.objects.filter(usuario_id=user_id).update(versao=F('versao') + 1)
+    if not updated:
+        row, created = VersaoContexto.objects.get_or_create(usuario_id=user_id, defaults={'versao': 1})
+        if created:
+            return row.versao
+        # Outra escrita criou a linha ao mesmo tempo: incrementa por cima
+        VersaoContexto.objects.filter(usuario_id=user_id).update(versao=F('versao') + 1)
+    return context_version(user_id)
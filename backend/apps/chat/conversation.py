@@ -0,0 +1,187 @@
+# chat/conversation.py
+"""
+Montagem do prompt e persistência de um turno do chat.
+
+Usado tanto pelas views (modo síncrono e streaming) quanto pelos workers
+do modo assíncrono (ver chat/jobs.py), para que todos respondam com o
+mesmo histórico e o mesmo contexto RAG. As versões com prefixo 'a'
+(abuild_history, apersist_turn) são para a view async sob ASGI.
+"""
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.utils import timezone
+
+from .briefing import abriefing_for_first_turn, briefing_for_first_turn
+from .context import aget_rag_context, get_rag_context
+from .history import aload_history_window, load_history_window
+from .intents import aanswer_intent, answer_intent
+from .lexical_index import search_memories
+from .models import HistoricoChat, ResumoConversa
+from .response_cache import response_cache
+from .sessions import acurrent_session_id, current_session_id, session_value
+from .tokens import estimate_messages_tokens
+from .vector_index import SOURCE_CHAT, semantic_memories, vector_index
+from .write_buffer import history_buffer, write_behind_enabled
+
+
+def quick_answer(user, user_input, now):
+    """
+    Resposta que não precisa do modelo, nesta ordem: atalho de intenções
+    (intents.py), briefing do dia na primeira saudação (briefing.py) e
+    cache de respostas (response_cache.py).
+
+    Devolve (resposta ou None, chave do cache): sem resposta, quem chamar
+    o modelo guarda o resultado com response_cache.put(chave, resposta).
+    """
+    answer = answer_intent(user, user_input, now)
+    if answer is None:
+        answer = briefing_for_first_turn(user, user_input, now)
+    if answer is not None:
+        return answer, None
+    cache_key = response_cache.key_for(user, user_input, now)
+    return response_cache.get(cache_key), cache_key
+
+
+async def aquick_answer(user, user_input, now):
+    """Versão assíncrona de quick_answer."""
+    answer = await aanswer_intent(user, user_input, now)
+    if answer is None:
+        answer = await abriefing_for_first_turn(user, user_input, now)
+    if answer is not None:
+        return answer, None
+    cache_key = await response_cache.akey_for(user, user_input, now)
+    return response_cache.get(cache_key), cache_key
+
+
+def related_memories(user, user_input) -> list[str]:
+    """
+    Entradas do diário/lembretes e conversas antigas relacionadas à
+    mensagem atual (busca por palavras + busca semântica).
+    """
+    memorias = search_memories(user, user_input)
+    for memoria in semantic_memories(user, user_input):
+        if memoria not in memorias:
+            memorias.append(memoria)
+    return memorias
+
+
+def _rag_message(rag_context, memorias):
+    if memorias:
+        rag_context += "\n\nMEMÓRIAS RELACIONADAS (DIÁRIO/LEMBRETES/CONVERSAS):\n"
+        rag_context += "\n".join(f"- {m}" for m in memorias)
+
+    # Injetamos o contexto atualizado como uma instrução de sistema
+    # imediatamente antes da resposta da IA, para garantir prioridade.
+    return {
+        "role": "system",
+        "content": (
+            "--- CONTEXTO ATUALIZADO (RAG) ---\n"
+            "Use as informações abaixo se forem relevantes para responder ao usuário:\n"
+            f"{rag_context}\n"
+            "-----------------------------------"
+        ),
+    }
+
+
+def _summary_messages(resumo):
+    # Resumo das conversas antigas (mantido pelo comando 'resumir_conversas')
+    if not resumo:
+        return []
+    return [{
+        "role": "system",
+        "content": (
+            "--- RESUMO DE CONVERSAS ANTERIORES ---\n"
+            f"{resumo}\n"
+            "-----------------------------------"
+        ),
+    }]
+
+
+def _history_budget(system_prompt, summary_messages, rag_message, user_input, prompt_budget=None) -> int:
+    budget = prompt_budget or getattr(settings, 'CHAT_PROMPT_TOKEN_BUDGET', 3000)
+    return budget - estimate_messages_tokens([
+        {"role": "system", "content": system_prompt},
+        *summary_messages,
+        rag_message,
+        {"role": "user", "content": user_input},
+    ])
+
+
+def _summary_qs(user):
+    return ResumoConversa.objects.filter(usuario=user).values_list('conteudo', flat=True)
+
+
+def build_history(user, user_input, now, system_prompt, prompt_budget=None):
+    """
+    Monta a lista de mensagens enviada ao modelo:
+    resumo das conversas antigas + janela do histórico salvo
+    + contexto RAG atualizado.
+
+    O histórico entra só até caber no orçamento de tokens do prompt
+    (CHAT_PROMPT_TOKEN_BUDGET, ou 'prompt_budget' quando o usuário está
+    perto do orçamento diário, ver usage.py), descontados o prompt do
+    sistema, o bloco RAG e a própria mensagem do usuário.
+    """
+    rag_message = _rag_message(get_rag_context(user, now), related_memories(user, user_input))
+    summary_messages = _summary_messages(_summary_qs(user).first())
+
+    budget = _history_budget(system_prompt, summary_messages, rag_message, user_input, prompt_budget)
+    history_list = summary_messages + load_history_window(user, budget)
+    history_list.append(rag_message)
+    return history_list
+
+
+async def abuild_history(user, user_input, now, system_prompt, prompt_budget=None):
+    """
+    Versão assíncrona de build_history. As consultas usam o ORM async; só
+    a busca nos índices em memória (BM25 / vetorial) roda em thread.
+    """
+    rag_context = await aget_rag_context(user, now)
+    memorias = await sync_to_async(related_memories)(user, user_input)
+    rag_message = _rag_message(rag_context, memorias)
+    summary_messages = _summary_messages(await _summary_qs(user).afirst())
+
+    budget = _history_budget(system_prompt, summary_messages, rag_message, user_input, prompt_budget)
+    history_list = summary_messages + await aload_history_window(user, budget)
+    history_list.append(rag_message)
+    return history_list
+
+
+def _turn_rows(user, user_input, answer, session_id):
+    # Salvamos apenas o que foi dito, não o contexto técnico injetado.
+    # O horário é o do turno, e não o da gravação: com o buffer
+    # (write_buffer.py) o INSERT pode acontecer bem depois.
+    sessao_id = session_value(session_id)
+    return [
+        HistoricoChat(
+            usuario=user, sessao_id=sessao_id, role='user', content=user_input, timestamp=timezone.now()
+        ),
+        HistoricoChat(
+            usuario=user, sessao_id=sessao_id, role='assistant', content=answer, timestamp=timezone.now()
+        ),
+    ]
+
+
+def persist_turn(user, user_input, answer):
+    """
+    Salva a mensagem do usuário e a resposta da IA na conversa atual.
+    Com CHAT_HISTORY_WRITE_BEHIND, só enfileira o turno (ver write_buffer.py).
+    """
+    rows = _turn_rows(user, user_input, answer, current_session_id(user))
+    if write_behind_enabled():
+        history_buffer.add(user.pk, rows, user_input)
+        return
+    user_msg, _ = HistoricoChat.objects.bulk_create(rows)
+
+    # bulk_create não dispara signals: indexamos a fala do paciente aqui
+    vector_index.add(user.pk, SOURCE_CHAT, [(user_msg.id, user_input)])
+
+
+async def apersist_turn(user, user_input, answer):
+    """Versão assíncrona de persist_turn."""
+    rows = _turn_rows(user, user_input, answer, await acurrent_session_id(user))
+    if write_behind_enabled():
+        history_buffer.add(user.pk, rows, user_input)
+        return
+    user_msg, _ = await HistoricoChat.objects.abulk_create(rows)
+    await sync_to_async(vector_index.add)(user.pk, SOURCE_CHAT, [(user_msg.id, user_input)])
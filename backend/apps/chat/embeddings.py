@@ -0,0 +1,70 @@
+# chat/embeddings.py
+"""
+Vetorização local de textos para a busca semântica do chat.
+
+O embedder padrão (HashingEmbedder) não precisa de rede, GPU nem modelo
+baixado: usa "feature hashing" de palavras, pares de palavras e trigramas
+de caracteres. Os trigramas aproximam formas da mesma palavra
+("visitou" / "visitar" / "visita"), o que já ajuda bastante a achar
+memórias descritas com outras palavras.
+
+Para trocar por outro embedder (ex: um modelo local de sentence
+embeddings), aponte CHAT_EMBEDDER no settings.py para uma classe com o
+mesmo contrato: atributos 'name' e 'dim' e o método embed(textos).
+"""
+import threading
+import zlib
+
+import numpy as np
+from django.conf import settings
+from django.utils.module_loading import import_string
+
+from .lexical_index import tokenize
+
+
+class HashingEmbedder:
+    name = "hashing-v1"
+
+    def __init__(self, dim: int = 512, tokenizer=tokenize) -> None:
+        self.dim = dim
+        self.tokenizer = tokenizer
+
+    def _features(self, text: str):
+        words = self.tokenizer(text)
+        for word in words:
+            yield word, 1.0
+            padded = f"#{word}#"
+            for i in range(len(padded) - 2):
+                yield padded[i:i + 3], 0.5
+        for first, second in zip(words, words[1:]):
+            yield f"{first} {second}", 0.7
+
+    def embed(self, texts: list[str]) -> np.ndarray:
+        """Matriz (len(texts), dim) float32 com linhas de norma 1."""
+        matrix = np.zeros((len(texts), self.dim), dtype=np.float32)
+        for row, text in enumerate(texts):
+            for feature, weight in self._features(text):
+                h = zlib.crc32(feature.encode("utf-8"))
+                # O bit mais alto define o sinal, o que reduz o viés das colisões
+                sign = -1.0 if h & 0x80000000 else 1.0
+                matrix[row, h % self.dim] += sign * weight
+
+        norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        matrix /= norms
+        return matrix
+
+
+_embedder = None
+_embedder_lock = threading.Lock()
+
+
+def get_embedder():
+    """Instância única do embedder configurado em CHAT_EMBEDDER."""
+    global _embedder
+    if _embedder is None:
+        with _embedder_lock:
+            if _embedder is None:
+                path = getattr(settings, 'CHAT_EMBEDDER', 'apps.chat.embeddings.HashingEmbedder')
+                _embedder = import_string(path)()
+    return _embedder
@@ -1,11 +1,27 @@
-from typing import List, Dict
+from typing import List, Dict, Iterator, AsyncIterator
+import asyncio
+import logging
 import os
-from pathlib import Path
+import weakref
 
-from huggingface_hub import InferenceClient
-from dotenv import load_dotenv
+import httpx
+from django.conf import settings
+from huggingface_hub import AsyncInferenceClient, InferenceClient
 
-from .utils import load_prompt
+from .resilience import (
+    acall_with_retries,
+    aretry_pause,
+    call_with_retries,
+    is_retryable,
+    llm_breaker,
+    record_outcome,
+    retry_pause,
+)
+from .routing import PRIMEIRO_TOKEN, Endpoint, Router
+from .tokens import TokenUsage
+from .utils import load_prompt, load_env
+
+logger = logging.getLogger(__name__)
 
 Message = Dict[str, str]
 
@@ -21,42 +37,139 @@ class ChatEngine:
         temperature: float = 0.3,
         max_tokens: int = 400,
     ) -> None:
-        # Tenta carregar o .env de várias formas para garantir
-        # 1. Do diretório atual
-        load_dotenv()
-        
-        # 2. Do diretório config explicitamente (para garantir no Windows/Caminhos complexos)
-        # Caminho: backend/apps/chat/engine.py -> sobe 3 níveis -> backend/config/.env
-        base_dir = Path(__file__).resolve().parent.parent.parent
-        config_env = base_dir / "config" / ".env"
-        if config_env.exists():
-            load_dotenv(config_env)
+        # Carrega o .env (diretório atual e backend/config/.env)
+        config_env = load_env()
 
         hf_token = os.getenv("HF_TOKEN")
         env_model_id = os.getenv("HF_MODEL_ID")
 
-        if not hf_token:
-            # Mensagem de erro mais descritiva
-            raise RuntimeError(
-                f"HF_TOKEN não encontrado. Verifique se o arquivo existe em: {config_env}"
-            )
+        # Sem timeout, um provedor travado prende o worker indefinidamente
+        timeout = httpx.Timeout(
+            getattr(settings, 'CHAT_LLM_READ_TIMEOUT', 30.0),
+            connect=getattr(settings, 'CHAT_LLM_CONNECT_TIMEOUT', 5.0),
+        )
 
-        self.model_id = model_id or env_model_id
-        if not self.model_id:
-            raise RuntimeError(
-                "HF_MODEL_ID não encontrado no .env e nenhum model_id foi passado."
-            )
+        # Servidor compatível com OpenAI/HF no lugar do Hugging Face
+        # (ex: o 'servidor_llm_falso' para testes de carga)
+        override_url = getattr(settings, 'CHAT_LLM_BASE_URL', None)
+        configured = getattr(settings, 'CHAT_LLM_ENDPOINTS', None) or []
+
+        if configured and not override_url and not model_id:
+            # Vários endpoints em ordem de prioridade, com hedging (ver routing.py)
+            endpoints = [
+                self._configured_endpoint(index, config, hf_token, timeout, config_env)
+                for index, config in enumerate(configured)
+            ]
+        else:
+            base_url = override_url or os.getenv("HF_BASE_URL")
+
+            if not hf_token and not base_url:
+                # Mensagem de erro mais descritiva
+                raise RuntimeError(
+                    f"HF_TOKEN não encontrado. Verifique se o arquivo existe em: {config_env}"
+                )
 
-        self.client = InferenceClient(
-            model=self.model_id,
-            token=hf_token,
+            model = model_id or env_model_id or (base_url and "local")
+            if not model:
+                raise RuntimeError(
+                    "HF_MODEL_ID não encontrado no .env e nenhum model_id foi passado."
+                )
+            endpoints = [self._make_endpoint(base_url or model, model, base_url, hf_token, timeout)]
+
+        self.router = Router(endpoints)
+        self.model_id = endpoints[0].model
+
+        # Um AsyncInferenceClient por event loop e endpoint (ver _shared_async_client)
+        self._async_clients: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, dict[str, AsyncInferenceClient]]" = (
+            weakref.WeakKeyDictionary()
         )
+        # Tasks que fecham esses clients quando o loop termina
+        self._async_closers: set[asyncio.Task] = set()
 
         self.system_prompt: str = load_prompt("system_prompt.txt")
+        self.summary_prompt: str = load_prompt("summary_prompt.txt")
+        self.briefing_prompt: str = load_prompt("briefing_prompt.txt")
         self.history: List[Message] = []
         self.temperature = temperature
         self.max_tokens = max_tokens
 
+    @staticmethod
+    def _make_endpoint(name, model, base_url, token, timeout) -> Endpoint:
+        # O InferenceClient é só configuração: as conexões HTTP (keep-alive)
+        # ficam no httpx.Client global do huggingface_hub, compartilhado pelo
+        # processo inteiro. Criamos um client leve por chamada (ver _open_client)
+        # porque ele acumula as respostas no próprio ExitStack até ser fechado.
+        if base_url:
+            client_kwargs = {"base_url": base_url, "token": token or "local"}
+        else:
+            client_kwargs = {"model": model, "token": token}
+        client_kwargs["timeout"] = timeout
+        return Endpoint(name, model, client_kwargs)
+
+    def _configured_endpoint(self, index, config, hf_token, timeout, config_env) -> Endpoint:
+        """Um item de CHAT_LLM_ENDPOINTS ({"nome", "model", "base_url", "token_env"})."""
+        base_url = config.get("base_url")
+        model = config.get("model") or (base_url and "local")
+        if not model:
+            raise RuntimeError(f"O endpoint {index} de CHAT_LLM_ENDPOINTS não tem 'model' nem 'base_url'.")
+
+        # O token fica no .env: o settings só diz o nome da variável
+        token = os.getenv(config["token_env"]) if config.get("token_env") else hf_token
+        if not token and not base_url:
+            raise RuntimeError(
+                f"Token do endpoint '{config.get('nome') or model}' não encontrado. "
+                f"Verifique o arquivo em: {config_env}"
+            )
+        return self._make_endpoint(config.get("nome") or base_url or model, model, base_url, token, timeout)
+
+    def _open_client(self, endpoint: Endpoint) -> InferenceClient:
+        return InferenceClient(**endpoint.client_kwargs)
+
+    def _open_async_client(self, endpoint: Endpoint) -> AsyncInferenceClient:
+        return AsyncInferenceClient(**endpoint.client_kwargs)
+
+    def _shared_async_client(self, endpoint: Endpoint) -> AsyncInferenceClient:
+        """
+        Client async reaproveitado entre chamadas no mesmo event loop.
+
+        O AsyncInferenceClient abre o próprio httpx.AsyncClient, preso ao
+        loop, e criar um novo custa dezenas de ms de CPU (contexto SSL) com o
+        loop travado. Reaproveitá-lo mantém as conexões abertas (keep-alive).
+        Só serve para chamadas sem streaming: as respostas em streaming ficam
+        no ExitStack do client até ele ser fechado.
+
+        Os clients de um loop são fechados quando ele termina (ver
+        _close_async_clients); sem isso, cada loop que o async_to_sync cria
+        e descarta deixaria seu pool de conexões aberto até o GC.
+        """
+        loop = asyncio.get_running_loop()
+        clients = self._async_clients.get(loop)
+        if clients is None:
+            clients = self._async_clients[loop] = {}
+            closer = loop.create_task(self._close_async_clients(loop, clients))
+            self._async_closers.add(closer)
+            closer.add_done_callback(self._async_closers.discard)
+        client = clients.get(endpoint.name)
+        if client is None:
+            client = clients[endpoint.name] = self._open_async_client(endpoint)
+        return client
+
+    async def _close_async_clients(self, loop, clients) -> None:
+        """
+        Fica parada até o loop terminar: o asyncio.run (usado pelo uvicorn e
+        pelo async_to_sync) cancela as tasks pendentes antes de fechar o
+        loop, e então os clients são fechados.
+        """
+        try:
+            await loop.create_future()
+        finally:
+            self._async_clients.pop(loop, None)
+            for client in clients.values():
+                try:
+                    await client.close()
+                except Exception:
+                    logger.warning("Erro ao fechar o client async do modelo", exc_info=True)
+
     def reset_history(self) -> None:
         self.history.clear()
 
@@ -68,14 +181,295 @@ class ChatEngine:
         messages.append({"role": "user", "content": new_user_message})
         return messages
 
-    def send_message(self, user_input: str, history: List[Message]) -> str:
+    @staticmethod
+    def _fill_usage(usage: TokenUsage | None, reported, messages: List[Message], text: str) -> None:
+        # Sem 'usage' na resposta do provedor, vale a estimativa local
+        if usage is not None and not usage.report(reported):
+            usage.estimate(messages, text)
+
+    def _complete_on(self, endpoint: Endpoint, messages: List[Message], temperature: float, max_tokens: int):
+        with self._open_client(endpoint) as client:
+            response = client.chat_completion(
+                messages=messages,
+                model=endpoint.model,
+                temperature=temperature,
+                max_tokens=max_tokens,
+            )
+
+        return response.choices[0].message["content"].strip(), response.usage
+
+    def _complete_once(
+        self, messages: List[Message], temperature: float, max_tokens: int, usage: TokenUsage | None = None
+    ) -> str:
+        # Melhor endpoint disponível, com hedging e failover (ver routing.py)
+        text, reported = self.router.call(
+            lambda endpoint: self._complete_on(endpoint, messages, temperature, max_tokens)
+        )
+        self._fill_usage(usage, reported, messages, text)
+        return text
+
+    def _complete(
+        self, messages: List[Message], temperature: float, max_tokens: int, usage: TokenUsage | None = None
+    ) -> str:
+        # Retries para erros transitórios + circuit breaker (ver resilience.py)
+        return call_with_retries(
+            lambda: self._complete_once(messages, temperature, max_tokens, usage),
+            breaker=llm_breaker,
+        )
+
+    def send_message(
+        self,
+        user_input: str,
+        history: List[Message],
+        max_tokens: int | None = None,
+        usage: TokenUsage | None = None,
+    ) -> str:
+        """
+        'max_tokens' substitui o limite padrão da resposta (ex: orçamento
+        diário do usuário no fim, ver usage.py) e 'usage', se passado, recebe
+        os tokens gastos.
+        """
         messages = self._build_messages(user_input, history)
+        return self._complete(messages, self.temperature, max_tokens or self.max_tokens, usage)
 
-        response = self.client.chat_completion(
+    def summarize(self, previous_summary: str, history: List[Message], max_tokens: int = 350) -> str:
+        """
+        Integra as mensagens em 'history' ao resumo anterior e devolve
+        o resumo atualizado (usado pelo comando 'resumir_conversas').
+        """
+        transcript = "\n".join(
+            f"{'Paciente' if m['role'] == 'user' else 'Assistente'}: {m['content']}"
+            for m in history
+        )
+        messages: List[Message] = [
+            {"role": "system", "content": self.summary_prompt},
+            {
+                "role": "user",
+                "content": (
+                    f"RESUMO ATUAL:\n{previous_summary or '(vazio)'}\n\n"
+                    f"NOVAS MENSAGENS:\n{transcript}"
+                ),
+            },
+        ]
+        return self._complete(messages, 0.2, max_tokens)
+
+    def daily_briefing(self, rag_context: str, max_tokens: int = 300) -> str:
+        """
+        Mensagem de "bom dia" com a agenda do dia, a partir do contexto RAG
+        (usado pelo comando 'gerar_briefings').
+        """
+        messages: List[Message] = [
+            {"role": "system", "content": self.briefing_prompt},
+            {"role": "user", "content": f"CONTEXTO DO PACIENTE:\n{rag_context}"},
+        ]
+        return self._complete(messages, self.temperature, max_tokens)
+
+    @staticmethod
+    def _deltas(stream, usage: TokenUsage | None = None) -> Iterator[str]:
+        for chunk in stream:
+            # O 'usage' vem no último pedaço (stream_options.include_usage)
+            if usage is not None and chunk.usage:
+                usage.report(chunk.usage)
+            if chunk.choices and chunk.choices[0].delta.content:
+                yield chunk.choices[0].delta.content
+
+    def _open_stream(self, endpoint: Endpoint, messages: List[Message], max_tokens: int):
+        """
+        Abre o streaming e espera o primeiro token: é isso que o hedging
+        compara entre endpoints. Devolve (client, stream, primeiro pedaço);
+        quem recebe lê o resto do stream e fecha o client.
+        """
+        client = self._open_client(endpoint)
+        try:
+            stream = iter(client.chat_completion(
+                messages=messages,
+                model=endpoint.model,
+                temperature=self.temperature,
+                max_tokens=max_tokens,
+                stream=True,
+                stream_options={"include_usage": True},
+            ))
+            return client, stream, next(self._deltas(stream), "")
+        except BaseException:
+            client.close()
+            raise
+
+    def stream_message(
+        self,
+        user_input: str,
+        history: List[Message],
+        max_tokens: int | None = None,
+        usage: TokenUsage | None = None,
+    ) -> Iterator[str]:
+        """
+        Versão em streaming de send_message: devolve os pedaços (tokens) da
+        resposta conforme o modelo os gera, sem esperar a resposta inteira.
+
+        Erros transitórios só são repetidos antes do primeiro token; depois
+        disso o texto parcial já foi enviado ao cliente. 'usage' é preenchido
+        quando o gerador termina ou é fechado.
+        """
+        messages = self._build_messages(user_input, history)
+        max_tokens = max_tokens or self.max_tokens
+        sent: List[str] = []
+        try:
+            yield from self._stream_with_retries(messages, max_tokens, usage, sent)
+        finally:
+            if usage is not None and not usage.total_tokens:
+                usage.estimate(messages, "".join(sent))
+
+    def _stream_with_retries(self, messages, max_tokens, usage, sent) -> Iterator[str]:
+        max_retries = getattr(settings, 'CHAT_LLM_MAX_RETRIES', 2)
+
+        attempt = 0
+        while True:
+            llm_breaker.before_call()
+            started = False
+            try:
+                client, stream, first = self.router.call(
+                    lambda endpoint: self._open_stream(endpoint, messages, max_tokens),
+                    kind=PRIMEIRO_TOKEN,
+                    discard=lambda opened: opened[0].close(),
+                )
+                with client:
+                    if first:
+                        started = True
+                        sent.append(first)
+                        yield first
+                    for delta in self._deltas(stream, usage):
+                        sent.append(delta)
+                        yield delta
+            except GeneratorExit:
+                # Cliente desconectou: o provedor estava respondendo normalmente
+                record_outcome(llm_breaker, None)
+                raise
+            except Exception as e:
+                record_outcome(llm_breaker, e)
+                if started or not is_retryable(e) or attempt >= max_retries:
+                    raise
+                retry_pause(attempt)
+                attempt += 1
+                continue
+
+            record_outcome(llm_breaker, None)
+            return
+
+    # -- versões assíncronas (view async sob ASGI) --------------------------
+
+    async def _acomplete_on(self, endpoint: Endpoint, messages: List[Message], temperature: float, max_tokens: int):
+        response = await self._shared_async_client(endpoint).chat_completion(
             messages=messages,
-            temperature=self.temperature,
-            max_tokens=self.max_tokens,
+            model=endpoint.model,
+            temperature=temperature,
+            max_tokens=max_tokens,
         )
 
-        answer = response.choices[0].message["content"].strip()
-        return answer
\ No newline at end of file
+        return response.choices[0].message["content"].strip(), response.usage
+
+    async def _acomplete_once(
+        self, messages: List[Message], temperature: float, max_tokens: int, usage: TokenUsage | None = None
+    ) -> str:
+        text, reported = await self.router.acall(
+            lambda endpoint: self._acomplete_on(endpoint, messages, temperature, max_tokens)
+        )
+        self._fill_usage(usage, reported, messages, text)
+        return text
+
+    async def asend_message(
+        self,
+        user_input: str,
+        history: List[Message],
+        max_tokens: int | None = None,
+        usage: TokenUsage | None = None,
+    ) -> str:
+        """
+        Versão assíncrona de send_message: enquanto espera o provedor, o
+        event loop segue atendendo outras requisições.
+        """
+        messages = self._build_messages(user_input, history)
+        return await acall_with_retries(
+            lambda: self._acomplete_once(messages, self.temperature, max_tokens or self.max_tokens, usage),
+            breaker=llm_breaker,
+        )
+
+    @staticmethod
+    async def _adeltas(stream, usage: TokenUsage | None = None) -> AsyncIterator[str]:
+        async for chunk in stream:
+            if usage is not None and chunk.usage:
+                usage.report(chunk.usage)
+            if chunk.choices and chunk.choices[0].delta.content:
+                yield chunk.choices[0].delta.content
+
+    async def _aopen_stream(self, endpoint: Endpoint, messages: List[Message], max_tokens: int):
+        """Versão assíncrona de _open_stream."""
+        client = self._open_async_client(endpoint)
+        try:
+            stream = await client.chat_completion(
+                messages=messages,
+                model=endpoint.model,
+                temperature=self.temperature,
+                max_tokens=max_tokens,
+                stream=True,
+                stream_options={"include_usage": True},
+            )
+            return client, stream, await anext(self._adeltas(stream), "")
+        except BaseException:
+            await client.close()
+            raise
+
+    async def astream_message(
+        self,
+        user_input: str,
+        history: List[Message],
+        max_tokens: int | None = None,
+        usage: TokenUsage | None = None,
+    ) -> AsyncIterator[str]:
+        """Versão assíncrona de stream_message (mesma política de retries)."""
+        messages = self._build_messages(user_input, history)
+        max_tokens = max_tokens or self.max_tokens
+        sent: List[str] = []
+        try:
+            async for delta in self._astream_with_retries(messages, max_tokens, usage, sent):
+                yield delta
+        finally:
+            if usage is not None and not usage.total_tokens:
+                usage.estimate(messages, "".join(sent))
+
+    async def _astream_with_retries(self, messages, max_tokens, usage, sent) -> AsyncIterator[str]:
+        max_retries = getattr(settings, 'CHAT_LLM_MAX_RETRIES', 2)
+
+        async def discard(opened):
+            await opened[0].close()
+
+        attempt = 0
+        while True:
+            llm_breaker.before_call()
+            started = False
+            try:
+                client, stream, first = await self.router.acall(
+                    lambda endpoint: self._aopen_stream(endpoint, messages, max_tokens),
+                    kind=PRIMEIRO_TOKEN,
+                    discard=discard,
+                )
+                async with client:
+                    if first:
+                        started = True
+                        sent.append(first)
+                        yield first
+                    async for delta in self._adeltas(stream, usage):
+                        sent.append(delta)
+                        yield delta
+            except (GeneratorExit, asyncio.CancelledError):
+                # Cliente desconectou: o provedor estava respondendo normalmente
+                record_outcome(llm_breaker, None)
+                raise
+            except Exception as e:
+                record_outcome(llm_breaker, e)
+                if started or not is_retryable(e) or attempt >= max_retries:
+                    raise
+                await aretry_pause(attempt)
+                attempt += 1
+                continue
+
+            record_outcome(llm_breaker, None)
+            return
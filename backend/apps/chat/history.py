@@ -0,0 +1,172 @@
+# chat/history.py
+import base64
+from datetime import datetime
+from typing import List
+
+from django.conf import settings
+from django.db.models import Q
+
+from .models import HistoricoChat
+from .sessions import acurrent_session_id, current_session_id, session_filter
+from .tokens import estimate_message_tokens
+from .write_buffer import history_buffer
+
+Message = dict
+
+
+def load_history_window(user, token_budget: int, max_messages: int | None = None) -> List[Message]:
+    """
+    Retorna as mensagens mais recentes da conversa atual do usuário (ver
+    sessions.py) que cabem em 'token_budget', em ordem cronológica
+    (mais antiga -> mais nova).
+
+    A consulta é limitada e em ordem reversa: só lemos as últimas
+    'max_messages' linhas, nunca o histórico inteiro do usuário.
+    """
+    if token_budget <= 0:
+        return []
+
+    if max_messages is None:
+        max_messages = getattr(settings, 'CHAT_HISTORY_MAX_MESSAGES', 200)
+
+    # O turno anterior pode ainda estar no buffer de escrita
+    history_buffer.ensure_persisted(user.pk)
+    rows = (
+        HistoricoChat.objects
+        .filter(usuario=user, **session_filter(current_session_id(user)))
+        .order_by('-timestamp', '-id')
+        .values('role', 'content')[:max_messages]
+    )
+
+    window: List[Message] = []
+    used = 0
+    for row in rows:
+        cost = estimate_message_tokens(row)
+        if used + cost > token_budget:
+            break
+        used += cost
+        window.append({"role": row['role'], "content": row['content']})
+
+    window.reverse()
+    return window
+
+
+async def aload_history_window(user, token_budget: int, max_messages: int | None = None) -> List[Message]:
+    """Versão assíncrona de load_history_window (ORM async)."""
+    if token_budget <= 0:
+        return []
+
+    if max_messages is None:
+        max_messages = getattr(settings, 'CHAT_HISTORY_MAX_MESSAGES', 200)
+
+    await history_buffer.aensure_persisted(user.pk)
+    rows = (
+        HistoricoChat.objects
+        .filter(usuario=user, **session_filter(await acurrent_session_id(user)))
+        .order_by('-timestamp', '-id')
+        .values('role', 'content')[:max_messages]
+    )
+
+    window: List[Message] = []
+    used = 0
+    async for row in rows:
+        cost = estimate_message_tokens(row)
+        if used + cost > token_budget:
+            break
+        used += cost
+        window.append({"role": row['role'], "content": row['content']})
+
+    window.reverse()
+    return window
+
+
+def window_start_id(user, token_budget: int, max_messages: int | None = None) -> int | None:
+    """
+    Id da mensagem mais antiga que ainda cabe na janela recente de
+    'token_budget' tokens da conversa atual. Mensagens com id menor já
+    saíram da janela (inclusive todas as de conversas anteriores).
+    Retorna None se o usuário não tiver histórico.
+    """
+    if max_messages is None:
+        max_messages = getattr(settings, 'CHAT_HISTORY_MAX_MESSAGES', 200)
+
+    history_buffer.ensure_persisted(user.pk)
+    rows = (
+        HistoricoChat.objects
+        .filter(usuario=user, **session_filter(current_session_id(user)))
+        .order_by('-timestamp', '-id')
+        .values('id', 'content')[:max_messages]
+    )
+
+    start_id = None
+    used = 0
+    for row in rows:
+        used += estimate_message_tokens(row)
+        if used > token_budget and start_id is not None:
+            break
+        start_id = row['id']
+
+    if start_id is None:
+        # Conversa atual vazia: as anteriores saíram todas da janela
+        last_id = (
+            HistoricoChat.objects.filter(usuario=user)
+            .order_by('-id').values_list('id', flat=True).first()
+        )
+        if last_id is not None:
+            start_id = last_id + 1
+    return start_id
+
+
+# -- histórico da tela (GET /api/chat/) ---------------------------------------
+
+class InvalidCursor(ValueError):
+    """Cursor de paginação do histórico malformado."""
+
+
+def encode_cursor(row) -> str:
+    """Cursor opaco para a posição (timestamp, id) de uma mensagem."""
+    raw = f"{row['timestamp'].isoformat()}|{row['id']}"
+    return base64.urlsafe_b64encode(raw.encode()).decode()
+
+
+def decode_cursor(cursor: str) -> tuple[datetime, int]:
+    try:
+        timestamp, pk = base64.urlsafe_b64decode(cursor.encode()).decode().split("|")
+        timestamp = datetime.fromisoformat(timestamp)
+        pk = int(pk)
+    except (ValueError, UnicodeError) as exc:
+        raise InvalidCursor(cursor) from exc
+    # encode_cursor sempre gera o horário com fuso
+    if timestamp.tzinfo is None:
+        raise InvalidCursor(cursor)
+    return timestamp, pk
+
+
+def history_page(user, before: str | None = None, limit: int = 50):
+    """
+    Uma página do histórico da conversa atual, para a tela do assistente:
+    as 'limit' mensagens mais novas antes do cursor 'before' (ou as mais
+    novas de todas), em ordem cronológica.
+
+    Paginação por chave (timestamp, id) em vez de OFFSET: cada página é
+    uma busca no índice (usuario, sessao, timestamp) seguida de 'limit'
+    linhas, não importa o tamanho do histórico. Devolve (mensagens,
+    cursor da página anterior ou None). InvalidCursor se 'before' for
+    malformado.
+    """
+    qs = (
+        HistoricoChat.objects
+        .filter(usuario=user, role__in=('user', 'assistant'), **session_filter(current_session_id(user)))
+    )
+    if before:
+        timestamp, pk = decode_cursor(before)
+        qs = qs.filter(Q(timestamp__lt=timestamp) | Q(timestamp=timestamp, id__lt=pk))
+
+    rows = list(
+        qs.order_by('-timestamp', '-id')
+        .values('id', 'role', 'content', 'timestamp')[:limit + 1]
+    )
+    older = encode_cursor(rows[limit - 1]) if len(rows) > limit else None
+    rows = rows[:limit]
+    rows.reverse()
+    return rows, older
@@ -0,0 +1,254 @@
+# chat/intents.py
+"""
+Atalho determinístico para perguntas estruturadas do chat.
+
+Boa parte das mensagens é "o que eu tenho hoje?" ou "quem é meu contato
+de emergência?", e a resposta já está nos lembretes/contatos do paciente.
+Essas perguntas são reconhecidas aqui por regras simples (em português,
+sem acentos e sem pontuação) e respondidas com um texto pronto, sem
+chamar o modelo. Qualquer outra mensagem segue para o ChatEngine.
+
+As regras são de propósito conservadoras: a mensagem inteira precisa ser
+a pergunta (com, no máximo, saudações e "por favor" em volta). Na dúvida,
+quem responde é o modelo.
+
+Os acertos são contados no cache e aparecem em GET /api/chat/status/.
+"""
+import re
+import unicodedata
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import caches
+from django.utils import timezone
+
+from .context import rag_querysets
+
+# Saudações e expressões de cortesia em volta da pergunta
+_FILLER = (
+    r"(?:oi|ola|bom dia|boa tarde|boa noite|guardiao|por favor|porfavor|"
+    r"me diz|me diga|me fala|me fale|me conta|me lembra|me lembre|"
+    r"voce sabe|sabe me dizer|pode me dizer|voce pode me dizer|"
+    r"eu queria saber|queria saber|gostaria de saber|obrigad[oa])"
+)
+_FILLERS_START = re.compile(rf"^(?:{_FILLER} )+")
+_FILLERS_END = re.compile(rf"(?: {_FILLER})+$")
+
+# Mensagem que é só uma saudação ("bom dia!", "oi, tudo bem?")
+_GREETING_WORD = r"(?:oi|ola|bom dia|boa tarde|boa noite|e ai|tudo bem|tudo bom|como vai(?: voce)?|guardiao)"
+_GREETING = re.compile(rf"{_GREETING_WORD}(?: {_GREETING_WORD})*")
+
+INTENT_PATTERNS = {
+    "remedios_hoje": [
+        r"(?:quais|que) (?:sao )?(?:os )?(?:meus )?(?:remedios?|medicamentos?)"
+        r"(?: (?:que )?(?:eu )?(?:tenho que |preciso |devo )?(?:tomar|tomo))?(?: hoje)?",
+        r"(?:eu )?tenho (?:que |de )?tomar (?:algum )?(?:remedio|medicamento)s?(?: hoje)?",
+        r"que horas? (?:eu )?(?:tomo|devo tomar|tenho que tomar) (?:o |os |meu |meus )?"
+        r"(?:remedios?|medicamentos?)(?: hoje)?",
+    ],
+    "proximo_lembrete": [
+        r"(?:qual|o que) (?:e |sera )?(?:o )?(?:meu )?proximo "
+        r"(?:lembrete|compromisso|remedio|medicamento|horario)",
+        r"o que (?:eu )?tenho (?:agora|depois|mais tarde|a seguir|em seguida)",
+    ],
+    "agenda_hoje": [
+        r"(?:o )?que (?:e que )?(?:eu )?(?:tenho|vou fazer|preciso fazer|tenho que fazer)"
+        r"(?: (?:para|pra) fazer)? hoje",
+        r"(?:qual|como) (?:e |esta )?(?:a )?minha agenda(?: (?:de|para|pra) hoje)?",
+        r"(?:minha )?agenda (?:de|para|pra) hoje",
+        r"(?:quais|que) (?:sao )?(?:os |as )?(?:meus |minhas )?"
+        r"(?:lembretes|compromissos|tarefas|atividades)(?: (?:de|para|pra) hoje| (?:eu )?tenho hoje| hoje)?",
+        r"(?:eu )?tenho (?:algum |alguma )?(?:lembrete|compromisso|consulta|tarefa|coisa)s?"
+        r"(?: (?:marcad|agendad)[oa]s?)?(?: (?:para|pra))? hoje",
+    ],
+    "contato_emergencia": [
+        r"(?:quem|qual) (?:e |sao )?(?:o |a |os |as )?(?:meu |minha |meus |minhas )?"
+        r"contatos? de emergencia",
+        r"(?:meus? )?contatos? de emergencia",
+        r"(?:qual (?:e )?o )?(?:numero|telefone) de emergencia",
+        r"(?:para|pra) quem (?:eu )?(?:ligo|devo ligar|posso ligar|telefono)"
+        r"(?: (?:em caso de|numa|em uma) emergencia| se (?:eu )?precisar(?: de ajuda)?)?",
+    ],
+}
+
+_COMPILED = {
+    intent: [re.compile(pattern) for pattern in patterns]
+    for intent, patterns in INTENT_PATTERNS.items()
+}
+
+
+def normalize(text: str) -> str:
+    """Minúsculas, sem acentos, sem pontuação e com espaços simples."""
+    text = unicodedata.normalize("NFD", text.lower())
+    text = "".join(ch for ch in text if unicodedata.category(ch) != "Mn")
+    text = re.sub(r"[^a-z0-9]+", " ", text)
+    return text.strip()
+
+
+def classify(message: str) -> str | None:
+    """Nome da intenção reconhecida, ou None para seguir para o modelo."""
+    core = normalize(message)
+    if not core or len(core.split()) > 16:
+        return None
+    core = _FILLERS_END.sub("", _FILLERS_START.sub("", core)).strip()
+
+    for intent, patterns in _COMPILED.items():
+        if any(pattern.fullmatch(core) for pattern in patterns):
+            return intent
+    return None
+
+
+def is_greeting(message: str) -> bool:
+    """Se a mensagem é apenas uma saudação."""
+    return _GREETING.fullmatch(normalize(message)) is not None
+
+
+# -- respostas --------------------------------------------------------------
+
+def _hora(lembrete) -> str:
+    return timezone.localtime(lembrete.data_hora).strftime('%H:%M')
+
+
+def _lista_lembretes(lembretes, now) -> str:
+    linhas = []
+    for lem in lembretes:
+        linha = f"- {_hora(lem)}: {lem.titulo}"
+        if lem.data_hora < now:
+            linha += " (o horário já passou)"
+        linhas.append(linha)
+    return "\n".join(linhas)
+
+
+def _reply_agenda(lembretes, now) -> str:
+    if not lembretes:
+        return "Hoje você não tem nenhum lembrete pendente. Aproveite o dia com calma!"
+    total = len(lembretes)
+    titulo = "um lembrete" if total == 1 else f"{total} lembretes"
+    return f"Hoje você tem {titulo}:\n{_lista_lembretes(lembretes, now)}"
+
+
+def _reply_remedios(lembretes, now) -> str:
+    remedios = [lem for lem in lembretes if lem.tipo == "medicamento"]
+    if not remedios:
+        return (
+            "Não encontrei nenhum remédio pendente para hoje nos seus lembretes. "
+            "Se tiver dúvida, confirme com um familiar ou cuidador."
+        )
+    return f"Estes são os remédios de hoje:\n{_lista_lembretes(remedios, now)}"
+
+
+def _reply_proximo(lembretes, now) -> str:
+    proximos = [lem for lem in lembretes if lem.data_hora >= now]
+    if not proximos:
+        return "Não há mais lembretes para hoje. Pode descansar com tranquilidade."
+    lem = proximos[0]
+    return f"Seu próximo lembrete é às {_hora(lem)}: {lem.titulo}."
+
+
+def _reply_contato(contatos, now) -> str:
+    if not contatos:
+        return (
+            "Você ainda não tem um contato de emergência cadastrado. "
+            "Peça ajuda a um familiar para cadastrar na tela de Contatos."
+        )
+    if len(contatos) == 1:
+        c = contatos[0]
+        return f"Seu contato de emergência é {c.nome}, telefone {c.telefone}."
+    linhas = "\n".join(f"- {c.nome}: {c.telefone}" for c in contatos)
+    return f"Seus contatos de emergência são:\n{linhas}"
+
+
+REPLIES = {
+    "agenda_hoje": _reply_agenda,
+    "remedios_hoje": _reply_remedios,
+    "proximo_lembrete": _reply_proximo,
+    "contato_emergencia": _reply_contato,
+}
+
+
+def _reply(intent, user, now) -> str:
+    lembretes, contatos, _ = rag_querysets(user, now)
+    if intent == "contato_emergencia":
+        return _reply_contato(list(contatos), now)
+    return REPLIES[intent](list(lembretes), now)
+
+
+async def _areply(intent, user, now) -> str:
+    lembretes, contatos, _ = rag_querysets(user, now)
+    if intent == "contato_emergencia":
+        return _reply_contato([c async for c in contatos], now)
+    return REPLIES[intent]([lem async for lem in lembretes], now)
+
+
+# -- métricas ---------------------------------------------------------------
+
+def _stats_cache():
+    return caches[getattr(settings, 'CHAT_CONTEXT_CACHE_ALIAS', 'default')]
+
+
+def _incr(key: str) -> None:
+    cache = _stats_cache()
+    cache.add(key, 0, timeout=None)
+    try:
+        cache.incr(key)
+    except ValueError:
+        # A chave expirou/foi removida entre o add e o incr
+        cache.set(key, 1, timeout=None)
+
+
+def _record(intent: str | None) -> None:
+    _incr("chat:intents:total")
+    if intent is not None:
+        _incr(f"chat:intents:hit:{intent}")
+
+
+def intent_stats() -> dict:
+    """Turnos avaliados, acertos por intenção e taxa de acerto."""
+    cache = _stats_cache()
+    keys = ["chat:intents:total"] + [f"chat:intents:hit:{i}" for i in INTENT_PATTERNS]
+    values = cache.get_many(keys)
+    total = values.get("chat:intents:total", 0)
+    por_intencao = {i: values.get(f"chat:intents:hit:{i}", 0) for i in INTENT_PATTERNS}
+    acertos = sum(por_intencao.values())
+    return {
+        "turnos": total,
+        "respondidos_sem_modelo": acertos,
+        "taxa_acerto": round(acertos / total, 3) if total else 0.0,
+        "por_intencao": por_intencao,
+    }
+
+
+# -- entrada ----------------------------------------------------------------
+
+def _enabled() -> bool:
+    return getattr(settings, 'CHAT_INTENTS_ENABLED', True)
+
+
+def is_intent(message: str) -> bool:
+    """Se a mensagem será respondida pelo atalho (não conta nas métricas)."""
+    return _enabled() and classify(message) is not None
+
+
+def answer_intent(user, message: str, now=None) -> str | None:
+    """
+    Resposta pronta se a mensagem for uma pergunta estruturada conhecida;
+    None para seguir para o modelo. Não persiste nada.
+    """
+    if not _enabled():
+        return None
+    intent = classify(message)
+    _record(intent)
+    if intent is None:
+        return None
+    return _reply(intent, user, now or timezone.now())
+
+
+async def aanswer_intent(user, message: str, now=None) -> str | None:
+    """Versão assíncrona de answer_intent (ORM async)."""
+    if not _enabled():
+        return None
+    intent = classify(message)
+    await sync_to_async(_record)(intent)
+    if intent is None:
+        return None
+    return await _areply(intent, user, now or timezone.now())
@@ -0,0 +1,232 @@
+# chat/jobs.py
+"""
+Modo assíncrono do chat: fila de turnos no próprio banco (TarefaChat),
+sem precisar de um broker externo.
+
+- A view enfileira o turno e responde 202 com o id da tarefa, sem ocupar
+  o worker WSGI esperando o modelo.
+- Um pool de threads (comando 'processar_tarefas_chat') pega as tarefas,
+  chama ChatEngine.send_message e grava a resposta.
+- O cliente consulta GET /api/chat/tarefas/<id>/, que responde na hora
+  (a espera ali é de no máximo CHAT_JOB_SYNC_MAX_WAIT segundos, para não
+  prender o worker WSGI). O long-polling de verdade (?esperar=N, até
+  CHAT_JOB_MAX_WAIT) é servido pela view async, em
+  GET /api/chat/async/tarefas/<id>/.
+
+Ordem por usuário: só pode ser pega a tarefa mais antiga ainda não
+terminada de cada usuário. Enquanto ela está 'processando', as seguintes
+do mesmo paciente esperam, então cada turno é respondido já vendo o
+anterior no histórico. A posse é tomada com um UPDATE condicional
+(status='pendente'), então dois workers nunca pegam a mesma tarefa.
+"""
+import asyncio
+import logging
+import os
+import socket
+import threading
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import close_old_connections, connection
+from django.db.models import Count, Min
+from django.utils import timezone
+
+from .conversation import build_history, persist_turn, quick_answer
+from .models import TarefaChat
+from .registry import get_engine
+from .resilience import FALLBACK_REPLY, CircuitOpenError, is_retryable
+from .response_cache import response_cache
+from .singleflight import flight_key
+from .tokens import TokenUsage
+from .usage import record_usage, token_plan
+
+logger = logging.getLogger(__name__)
+
+FINISHED = (TarefaChat.CONCLUIDA, TarefaChat.ERRO)
+
+
+def enqueue(user, message: str) -> TarefaChat:
+    """
+    Enfileira o turno. Se o mesmo texto do usuário ainda está na fila (toque
+    duplo, retry do app), devolve a tarefa existente em vez de criar outra.
+    """
+    key = flight_key(user.pk, message)
+    unfinished = (
+        TarefaChat.objects
+        .filter(usuario=user, status__in=[TarefaChat.PENDENTE, TarefaChat.PROCESSANDO])
+        .order_by('-id')
+    )
+    for job in unfinished:
+        if flight_key(user.pk, job.mensagem) == key:
+            return job
+    return TarefaChat.objects.create(usuario=user, mensagem=message)
+
+
+def _claimable():
+    """Tarefas pendentes que são a primeira não terminada do seu usuário."""
+    heads = (
+        TarefaChat.objects
+        .filter(status__in=[TarefaChat.PENDENTE, TarefaChat.PROCESSANDO])
+        .values('usuario')
+        .annotate(primeira=Min('id'))
+        .values('primeira')
+    )
+    return TarefaChat.objects.filter(id__in=heads, status=TarefaChat.PENDENTE).order_by('id')
+
+
+def claim_next(worker_name: str) -> TarefaChat | None:
+    """Pega a próxima tarefa disponível (ou None se a fila está vazia)."""
+    for job_id in _claimable().values_list('id', flat=True)[:10]:
+        claimed = (
+            TarefaChat.objects
+            .filter(pk=job_id, status=TarefaChat.PENDENTE)
+            .update(status=TarefaChat.PROCESSANDO, worker=worker_name, iniciado_em=timezone.now())
+        )
+        if claimed:
+            return TarefaChat.objects.select_related('usuario').get(pk=job_id)
+    return None
+
+
+def requeue_stale(max_age: float | None = None) -> int:
+    """
+    Devolve para a fila tarefas 'processando' há tempo demais (worker que
+    morreu no meio). O turno pode ser respondido de novo: a entrega é
+    "pelo menos uma vez".
+    """
+    if max_age is None:
+        max_age = getattr(settings, 'CHAT_JOB_STALE_AFTER', 300)
+    limit = timezone.now() - timedelta(seconds=max_age)
+    return (
+        TarefaChat.objects
+        .filter(status=TarefaChat.PROCESSANDO, iniciado_em__lt=limit)
+        .update(status=TarefaChat.PENDENTE, worker='', iniciado_em=None)
+    )
+
+
+def process(job: TarefaChat) -> TarefaChat:
+    """Responde um turno enfileirado e grava o resultado na tarefa."""
+    user = job.usuario
+    try:
+        now = timezone.now()
+        answer, cache_key = quick_answer(user, job.mensagem, now)
+        if answer is None:
+            engine = get_engine()
+            plan = token_plan(user, now)
+            history_list = build_history(user, job.mensagem, now, engine.system_prompt, plan.prompt_budget)
+            usage = TokenUsage()
+            answer = engine.send_message(job.mensagem, history_list, plan.max_tokens, usage)
+            record_usage(user, now, usage)
+            response_cache.put(cache_key, answer)
+        persist_turn(user, job.mensagem, answer)
+    except Exception as e:
+        job.status = TarefaChat.ERRO
+        job.erro = f"Erro na IA: {str(e)}"
+        if isinstance(e, CircuitOpenError) or is_retryable(e):
+            job.resposta = FALLBACK_REPLY
+    else:
+        job.status = TarefaChat.CONCLUIDA
+        job.resposta = answer
+
+    job.concluido_em = timezone.now()
+    job.save(update_fields=['status', 'resposta', 'erro', 'concluido_em'])
+    return job
+
+
+def wait_for(job_id: int, user, timeout: float) -> TarefaChat:
+    """
+    Espera até 'timeout' segundos a tarefa terminar, dormindo a thread:
+    só para esperas curtas (ver CHAT_JOB_SYNC_MAX_WAIT).
+    Levanta TarefaChat.DoesNotExist se a tarefa não é do usuário.
+    """
+    deadline = time.monotonic() + timeout
+    while True:
+        job = TarefaChat.objects.get(pk=job_id, usuario=user)
+        if job.status in FINISHED or time.monotonic() >= deadline:
+            return job
+        time.sleep(min(0.25, max(deadline - time.monotonic(), 0)))
+
+
+async def await_for(job_id: int, user, timeout: float) -> TarefaChat:
+    """
+    Long-polling: versão async de wait_for. A espera não ocupa uma
+    thread, então pode durar até CHAT_JOB_MAX_WAIT segundos.
+    """
+    deadline = time.monotonic() + timeout
+    while True:
+        job = await TarefaChat.objects.aget(pk=job_id, usuario=user)
+        if job.status in FINISHED or time.monotonic() >= deadline:
+            return job
+        await asyncio.sleep(min(0.25, max(deadline - time.monotonic(), 0)))
+
+
+def retry_after(job: TarefaChat) -> int | None:
+    """Segundos sugeridos até a próxima consulta (None se a tarefa terminou)."""
+    if job.status in FINISHED:
+        return None
+    return getattr(settings, 'CHAT_JOB_RETRY_AFTER', 1)
+
+
+def queue_stats() -> dict:
+    """Quantidade de tarefas por status, para monitoramento."""
+    counts = dict(
+        TarefaChat.objects.values_list('status').annotate(n=Count('id')).order_by()
+    )
+    return {value: counts.get(value, 0) for value, _ in TarefaChat.STATUS_CHOICES}
+
+
+class WorkerPool:
+    """Threads que consomem a fila de tarefas do chat."""
+
+    def __init__(self, workers: int | None = None, poll_interval: float | None = None) -> None:
+        if workers is None:
+            workers = getattr(settings, 'CHAT_JOB_WORKERS', 4)
+        if poll_interval is None:
+            poll_interval = getattr(settings, 'CHAT_JOB_POLL_INTERVAL', 1.0)
+        self.workers = workers
+        self.poll_interval = poll_interval
+        self._stop = threading.Event()
+        self._threads: list[threading.Thread] = []
+        self.processed = 0
+        self._processed_lock = threading.Lock()
+
+    def start(self) -> None:
+        prefix = f"{socket.gethostname()}:{os.getpid()}"
+        for i in range(self.workers):
+            thread = threading.Thread(
+                target=self._run, args=(f"{prefix}:{i}",),
+                name=f"chat-worker-{i}", daemon=True,
+            )
+            thread.start()
+            self._threads.append(thread)
+
+    def stop(self) -> None:
+        self._stop.set()
+
+    def join(self) -> None:
+        for thread in self._threads:
+            thread.join()
+
+    def _run(self, name: str) -> None:
+        try:
+            while not self._stop.is_set():
+                close_old_connections()
+                try:
+                    job = claim_next(name)
+                except Exception:
+                    logger.exception("Erro ao buscar tarefa do chat")
+                    job = None
+
+                if job is None:
+                    self._stop.wait(self.poll_interval)
+                    continue
+
+                try:
+                    process(job)
+                except Exception:
+                    logger.exception("Erro ao processar a tarefa %s do chat", job.pk)
+                with self._processed_lock:
+                    self.processed += 1
+        finally:
+            # Cada thread tem sua própria conexão com o banco
+            connection.close()
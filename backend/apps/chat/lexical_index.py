@@ -0,0 +1,293 @@
+# chat/lexical_index.py
+"""
+Índice lexical (BM25) local sobre o diário e os lembretes do usuário.
+
+Cada usuário tem um índice invertido em memória, construído sob demanda
+na primeira busca e mantido de forma incremental pelos signals de
+EntradaDiario e Lembrete (ver chat/signals.py). A busca só percorre as
+listas de postings dos termos da pergunta, então continua na casa dos
+milissegundos mesmo com dezenas de milhares de entradas.
+
+Os signals só rodam no processo que fez a escrita. Por isso cada índice
+guarda a versão do contexto do usuário (VersaoContexto, ver
+chat/context.py) com que foi montado, e a busca compara com a versão do
+banco: se outro processo mudou o diário ou os lembretes (ou uma mudança
+chegou enquanto o índice era construído), o índice é refeito.
+
+Não usa nenhum serviço externo de embeddings.
+"""
+import heapq
+import math
+import re
+import threading
+import unicodedata
+from collections import Counter, OrderedDict
+
+from django.conf import settings
+from django.utils import timezone
+
+from apps.diario.models import EntradaDiario
+from apps.lembretes.models import Lembrete
+
+from .context import context_version
+
+# Palavras muito comuns do português que não ajudam a diferenciar textos
+STOPWORDS = frozenset("""
+a ao aos as ate com como da das de dela dele deles depois do dos e ela elas
+ele eles em entre era essa esse esta estava este eu foi fui ha isso isto ja
+la lhe mais mas me meu minha muito na nas nao nem no nos nossa nosso num numa
+o os ou para pela pelo por quais qual quando que quem se sem ser seu sua sao
+tambem te tem tinha tu tua um uma uns umas voce voces vou
+""".split())
+
+_WORD_RE = re.compile(r"\w+")
+
+
+def tokenize(text: str, stopwords=STOPWORDS) -> list[str]:
+    """
+    Normaliza um texto em termos: minúsculo, sem acentos, sem stopwords
+    e com um stemming leve (remove o plural em 's').
+    """
+    if not text:
+        return []
+    normalized = unicodedata.normalize("NFD", text.lower())
+    normalized = "".join(ch for ch in normalized if unicodedata.category(ch) != "Mn")
+
+    terms = []
+    for word in _WORD_RE.findall(normalized):
+        if len(word) < 2 or word in stopwords:
+            continue
+        if len(word) > 3 and word.endswith("s"):
+            word = word[:-1]
+        terms.append(word)
+    return terms
+
+
+def tokenize_all(text: str) -> list[str]:
+    """
+    Como tokenize, mas mantém as stopwords. Para comparar frases inteiras:
+    "eu já tomei" e "eu não tomei" só diferem em stopwords.
+    """
+    return tokenize(text, stopwords=frozenset())
+
+
+class BM25Index:
+    """Índice invertido com ranqueamento BM25 para um único usuário."""
+
+    def __init__(self, k1: float = 1.5, b: float = 0.75) -> None:
+        self.k1 = k1
+        self.b = b
+        self._lock = threading.Lock()
+        # doc_key -> (tamanho, termos, payload)
+        self._docs: dict = {}
+        # termo -> {doc_key: frequência}
+        self._postings: dict[str, dict] = {}
+        self._total_length = 0
+        # Versão do contexto do usuário refletida no índice (ver LexicalIndexRegistry)
+        self.version = None
+
+    def __len__(self) -> int:
+        return len(self._docs)
+
+    def add(self, doc_key, text: str, payload) -> None:
+        """Adiciona (ou substitui) um documento."""
+        terms = Counter(tokenize(text))
+        with self._lock:
+            self._remove_locked(doc_key)
+            if not terms:
+                return
+            length = sum(terms.values())
+            self._docs[doc_key] = (length, terms, payload)
+            self._total_length += length
+            for term, tf in terms.items():
+                self._postings.setdefault(term, {})[doc_key] = tf
+
+    def remove(self, doc_key) -> None:
+        with self._lock:
+            self._remove_locked(doc_key)
+
+    def _remove_locked(self, doc_key) -> None:
+        doc = self._docs.pop(doc_key, None)
+        if doc is None:
+            return
+        length, terms, _ = doc
+        self._total_length -= length
+        for term in terms:
+            postings = self._postings.get(term)
+            if postings is None:
+                continue
+            postings.pop(doc_key, None)
+            if not postings:
+                del self._postings[term]
+
+    def search(self, query: str, k: int = 3) -> list[tuple[float, object]]:
+        """Retorna até k pares (score, payload), do mais relevante ao menos."""
+        query_terms = set(tokenize(query))
+        if not query_terms:
+            return []
+
+        with self._lock:
+            n_docs = len(self._docs)
+            if n_docs == 0:
+                return []
+            avg_length = self._total_length / n_docs
+
+            scores: dict = {}
+            for term in query_terms:
+                postings = self._postings.get(term)
+                if not postings:
+                    continue
+                df = len(postings)
+                idf = math.log(1 + (n_docs - df + 0.5) / (df + 0.5))
+                for doc_key, tf in postings.items():
+                    length = self._docs[doc_key][0]
+                    norm = self.k1 * (1 - self.b + self.b * length / avg_length)
+                    scores[doc_key] = scores.get(doc_key, 0.0) + idf * tf * (self.k1 + 1) / (tf + norm)
+
+            best = heapq.nlargest(k, scores.items(), key=lambda item: item[1])
+            return [(score, self._docs[doc_key][2]) for doc_key, score in best]
+
+
+# Tamanho máximo de cada trecho colocado no contexto do modelo
+SNIPPET_CHARS = 300
+
+
+def snippet(texto: str) -> str:
+    if len(texto) <= SNIPPET_CHARS:
+        return texto
+    return texto[:SNIPPET_CHARS].rstrip() + "..."
+
+
+def _diario_doc(entrada_id, texto, data_criacao):
+    data = timezone.localtime(data_criacao).strftime('%d/%m/%Y')
+    texto = texto or ""
+    return ("diario", entrada_id), texto, f"[Diário {data}] {snippet(texto)}"
+
+
+def _lembrete_doc(lembrete_id, titulo, descricao, data_hora):
+    data = timezone.localtime(data_hora).strftime('%d/%m/%Y %H:%M')
+    texto = f"{titulo}. {descricao}" if descricao else titulo
+    return ("lembrete", lembrete_id), texto, f"[Lembrete {data}] {snippet(texto)}"
+
+
+class LexicalIndexRegistry:
+    """
+    Mantém os índices dos usuários usados recentemente (LRU), para limitar
+    a memória do processo em 'max_users' índices.
+    """
+
+    def __init__(self, max_users: int = 1000) -> None:
+        self.max_users = max_users
+        self._lock = threading.Lock()
+        self._indexes: OrderedDict[int, BM25Index] = OrderedDict()
+
+    def _build(self, user_id) -> BM25Index:
+        index = BM25Index()
+        entradas = (
+            EntradaDiario.objects
+            .filter(usuario_id=user_id)
+            .exclude(texto__isnull=True)
+            .exclude(texto='')
+            .values_list('id', 'texto', 'data_criacao')
+        )
+        for row in entradas.iterator():
+            index.add(*_diario_doc(*row))
+
+        lembretes = (
+            Lembrete.objects
+            .filter(usuario_id=user_id)
+            .values_list('id', 'titulo', 'descricao', 'data_hora')
+        )
+        for row in lembretes.iterator():
+            index.add(*_lembrete_doc(*row))
+        return index
+
+    def get(self, user_id) -> BM25Index:
+        # A versão é lida antes dos dados: uma mudança durante o _build
+        # deixa o índice com a versão antiga, e a próxima busca o refaz.
+        version = context_version(user_id)
+        with self._lock:
+            index = self._indexes.get(user_id)
+            if index is not None and index.version == version:
+                self._indexes.move_to_end(user_id)
+                return index
+
+        index = self._build(user_id)
+        index.version = version
+        with self._lock:
+            # Outra thread pode ter construído o índice enquanto isso
+            current = self._indexes.get(user_id)
+            if current is not None and current.version is not None and current.version >= version:
+                index = current
+            self._indexes[user_id] = index
+            self._indexes.move_to_end(user_id)
+            while len(self._indexes) > self.max_users:
+                self._indexes.popitem(last=False)
+        return index
+
+    def _apply(self, user_id, version, change) -> None:
+        """
+        Aplica uma mudança feita por este processo ao índice carregado, se
+        ele está exatamente uma versão atrás (nenhuma outra escrita no meio).
+        Caso contrário não faz nada: o índice fica com a versão antiga e é
+        reconstruído na próxima busca. Sem índice carregado também não há
+        nada a fazer: ele será construído já com os dados novos.
+        """
+        with self._lock:
+            index = self._indexes.get(user_id)
+            if index is None or index.version is None or index.version != version - 1:
+                return
+            change(index)
+            index.version = version
+
+    # Atualização incremental (chamada pelos signals, com a versão nova do
+    # contexto devolvida por invalidate_rag_context).
+
+    def update_entrada(self, entrada: EntradaDiario, version: int) -> None:
+        doc = _diario_doc(entrada.id, entrada.texto, entrada.data_criacao)
+        self._apply(entrada.usuario_id, version, lambda index: index.add(*doc))
+
+    def remove_entrada(self, entrada: EntradaDiario, version: int) -> None:
+        self._apply(entrada.usuario_id, version, lambda index: index.remove(("diario", entrada.id)))
+
+    def update_lembretes(self, user_id, lembretes: list[Lembrete], version: int) -> None:
+        if not lembretes:
+            # update() em lote sem os objetos: a próxima busca reconstrói
+            return
+        docs = [
+            _lembrete_doc(lembrete.id, lembrete.titulo, lembrete.descricao, lembrete.data_hora)
+            for lembrete in lembretes
+        ]
+
+        def change(index):
+            for doc in docs:
+                index.add(*doc)
+
+        self._apply(user_id, version, change)
+
+    def update_lembrete(self, lembrete: Lembrete, version: int) -> None:
+        self.update_lembretes(lembrete.usuario_id, [lembrete], version)
+
+    def remove_lembrete(self, lembrete: Lembrete, version: int) -> None:
+        self._apply(lembrete.usuario_id, version, lambda index: index.remove(("lembrete", lembrete.id)))
+
+    def clear(self) -> None:
+        with self._lock:
+            self._indexes.clear()
+
+
+lexical_indexes = LexicalIndexRegistry(
+    max_users=getattr(settings, 'CHAT_LEXICAL_INDEX_MAX_USERS', 1000),
+)
+
+
+def search_memories(user, query: str, k: int | None = None) -> list[str]:
+    """
+    Entradas do diário/lembretes mais relevantes para 'query',
+    já formatadas para o contexto do modelo.
+    """
+    if k is None:
+        k = getattr(settings, 'CHAT_MEMORY_TOP_K', 3)
+    if k <= 0:
+        return []
+    return [payload for _, payload in lexical_indexes.get(user.pk).search(query, k)]
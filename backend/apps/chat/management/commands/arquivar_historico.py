@@ -0,0 +1,48 @@
+# chat/management/commands/arquivar_historico.py
+import time
+
+from django.core.management.base import BaseCommand
+
+from apps.chat.archive import archive_all, compact_database, purge_expired
+
+
+class Command(BaseCommand):
+    help = (
+        "Move as mensagens antigas do histórico do chat para segmentos "
+        "comprimidos (ArquivoChat) e expurga os segmentos além do prazo de "
+        "retenção. Via cron ou em modo contínuo com --loop."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--usuario', action='append', help="Processa apenas este username (pode repetir).")
+        parser.add_argument(
+            '--dias', type=int, default=None,
+            help="Arquiva mensagens com mais de N dias (padrão: CHAT_ARCHIVE_AFTER_DAYS).",
+        )
+        parser.add_argument(
+            '--retencao', type=int, default=None,
+            help="Expurga segmentos com mais de N dias (padrão: CHAT_ARCHIVE_RETENTION_DAYS).",
+        )
+        parser.add_argument(
+            '--compactar', action='store_true',
+            help="No SQLite, roda VACUUM ao final para o arquivo do banco encolher.",
+        )
+        parser.add_argument(
+            '--loop', action='store_true',
+            help="Continua rodando, processando novamente a cada --intervalo segundos.",
+        )
+        parser.add_argument('--intervalo', type=int, default=3600)
+
+    def handle(self, *args, **options):
+        while True:
+            stats = archive_all(days=options['dias'], usernames=options['usuario'])
+            purged = purge_expired(retention_days=options['retencao'])
+            self.stdout.write(
+                f"{stats['mensagens']} mensagem(ns) de {stats['usuarios']} usuário(s) arquivada(s), "
+                f"{purged} segmento(s) expurgado(s), {stats['erros']} erro(s)."
+            )
+            if options['compactar'] and (stats['mensagens'] or purged) and compact_database():
+                self.stdout.write("Banco compactado (VACUUM).")
+            if not options['loop']:
+                break
+            time.sleep(options['intervalo'])
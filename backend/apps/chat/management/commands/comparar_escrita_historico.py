@@ -0,0 +1,108 @@
+# chat/management/commands/comparar_escrita_historico.py
+"""
+Compara a vazão de escrita do histórico do chat com e sem o buffer de
+gravação adiada (CHAT_HISTORY_WRITE_BEHIND, ver chat/write_buffer.py).
+
+Várias threads (como os workers de um servidor) gravam turnos com
+persist_turn para usuários sintéticos, no banco configurado:
+
+- direto: cada turno é uma transação (INSERT + COMMIT);
+- buffer: os turnos entram na fila e são gravados em lote. O tempo medido
+  inclui o flush final, ou seja, todos os turnos já estão no banco.
+
+Exemplo:
+    python manage.py comparar_escrita_historico --threads 16 --turnos 100 --limpar
+"""
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.test.utils import override_settings
+
+from apps.chat.conversation import persist_turn
+from apps.chat.models import HistoricoChat
+from apps.chat.write_buffer import history_buffer
+
+from .teste_carga_chat import MENSAGENS, PREFIXO_USUARIO, prepare_users
+
+RESPOSTA = "Claro! Estou aqui para ajudar. " * 4
+
+
+class Command(BaseCommand):
+    help = (
+        "Benchmark de escrita do histórico do chat: um COMMIT por turno x "
+        "buffer de gravação adiada (lotes numa transação)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--threads', type=int, default=16,
+            help="Threads gravando ao mesmo tempo (um usuário sintético cada).",
+        )
+        parser.add_argument(
+            '--turnos', type=int, default=100,
+            help="Turnos gravados por thread.",
+        )
+        parser.add_argument('--lote', type=int, default=100, help="CHAT_HISTORY_BUFFER_MAX_TURNS.")
+        parser.add_argument('--atraso', type=float, default=0.5, help="CHAT_HISTORY_BUFFER_MAX_DELAY (s).")
+        parser.add_argument(
+            '--limpar', action='store_true',
+            help="Remove os usuários sintéticos (e seus dados) ao final.",
+        )
+
+    def handle(self, *args, **options):
+        prepare_users(options['threads'])
+        users = list(
+            User.objects.filter(username__startswith=PREFIXO_USUARIO)
+            .order_by('username')[:options['threads']]
+        )
+        self.stdout.write(
+            f"{len(users)} thread(s) x {options['turnos']} turno(s) "
+            f"({len(users) * options['turnos'] * 2} mensagens por rodada)."
+        )
+
+        try:
+            with override_settings(CHAT_HISTORY_WRITE_BEHIND=False):
+                self._report("Direto (um COMMIT por turno)", *self._run(users, options))
+
+            with override_settings(
+                CHAT_HISTORY_WRITE_BEHIND=True,
+                CHAT_HISTORY_BUFFER_MAX_TURNS=options['lote'],
+                CHAT_HISTORY_BUFFER_MAX_DELAY=options['atraso'],
+            ):
+                before = history_buffer.snapshot()
+                results = self._run(users, options)
+                after = history_buffer.snapshot()
+                self._report(
+                    f"Buffer (lotes de até {options['lote']} turnos / {options['atraso']}s)", *results,
+                    lotes=after['lotes'] - before['lotes'],
+                )
+        finally:
+            if options['limpar']:
+                User.objects.filter(username__startswith=PREFIXO_USUARIO).delete()
+
+    def _run(self, users, options):
+        def run_user(user):
+            try:
+                for i in range(options['turnos']):
+                    persist_turn(user, MENSAGENS[i % len(MENSAGENS)], RESPOSTA)
+            finally:
+                connection.close()
+
+        start_count = HistoricoChat.objects.filter(usuario__in=users).count()
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=len(users) or 1) as pool:
+            list(pool.map(run_user, users))
+        history_buffer.flush()
+        wall = time.perf_counter() - start
+        written = HistoricoChat.objects.filter(usuario__in=users).count() - start_count
+        return len(users) * options['turnos'], written, wall
+
+    def _report(self, label, turns, written, wall, lotes=None):
+        self.stdout.write("")
+        self.stdout.write(self.style.MIGRATE_HEADING(label))
+        self.stdout.write(f"  Turnos: {turns}  |  Mensagens gravadas: {written}")
+        self.stdout.write(f"  Duração total: {wall:.2f}s  |  Vazão: {turns / wall:.0f} turnos/s")
+        self.stdout.write(f"  Transações: {turns if lotes is None else lotes}")
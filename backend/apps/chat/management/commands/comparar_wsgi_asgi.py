@@ -0,0 +1,184 @@
+# chat/management/commands/comparar_wsgi_asgi.py
+"""
+Compara quantas conversas simultâneas um único processo aguenta no
+caminho WSGI (ChatAPIView, síncrono) e no caminho ASGI (AsyncChatView),
+contra um LLM falso local.
+
+- WSGI: o app WSGI do Django atende com no máximo --threads-wsgi
+  requisições ao mesmo tempo (como um worker do gunicorn com N threads);
+  o resto espera na fila.
+- ASGI: o app ASGI roda num único event loop; cada conversa esperando o
+  modelo é só uma corrotina pendente.
+
+Ambos rodam dentro deste processo (httpx WSGITransport/ASGITransport), sem
+servidor HTTP na frente, então a diferença medida é só o modelo de
+concorrência das views. O pico de chamadas simultâneas que chegam ao LLM
+falso mostra a capacidade de cada caminho.
+
+Exemplo:
+    python manage.py comparar_wsgi_asgi --concorrencia 200 --latencia 1000
+"""
+import asyncio
+import statistics
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import httpx
+from django.contrib.auth.models import User
+from django.core.asgi import get_asgi_application
+from django.core.management.base import BaseCommand
+from django.core.wsgi import get_wsgi_application
+from django.test.utils import override_settings
+
+from apps.chat.registry import engine_registry
+
+from .servidor_llm_falso import FakeLLMHandler, make_server
+from .teste_carga_chat import MENSAGENS, PREFIXO_USUARIO, percentile, prepare_users
+
+BASE_URL = "http://127.0.0.1"
+
+
+class Command(BaseCommand):
+    help = (
+        "Benchmark de concorrência do chat: caminho WSGI (view síncrona) x "
+        "caminho ASGI (view async), contra um LLM falso local."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--concorrencia', type=int, default=100,
+            help="Clientes simultâneos (um usuário sintético cada).",
+        )
+        parser.add_argument(
+            '--mensagens', type=int, default=2,
+            help="Mensagens enviadas (em sequência) por cliente.",
+        )
+        parser.add_argument(
+            '--threads-wsgi', type=int, default=8,
+            help="Requisições atendidas ao mesmo tempo no caminho WSGI (padrão: 8).",
+        )
+        parser.add_argument(
+            '--latencia', type=float, default=1000,
+            help="Tempo (ms) até o primeiro token no LLM falso (padrão: 1000).",
+        )
+        parser.add_argument('--tokens', type=int, default=40)
+        parser.add_argument('--tokens-por-segundo', type=float, default=200)
+        parser.add_argument(
+            '--limpar', action='store_true',
+            help="Remove os usuários sintéticos (e seus dados) ao final.",
+        )
+
+    def handle(self, *args, **options):
+        server = make_server({
+            "host": "127.0.0.1",
+            "porta": 0,
+            "latencia": options['latencia'],
+            "tokens_por_segundo": options['tokens_por_segundo'],
+            "tokens": options['tokens'],
+        })
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        llm_url = f"http://127.0.0.1:{server.server_address[1]}/v1"
+
+        tokens = prepare_users(options['concorrencia'])
+        self.stdout.write(
+            f"{len(tokens)} cliente(s) x {options['mensagens']} mensagem(ns), "
+            f"LLM falso com {options['latencia']:.0f}ms até o 1º token."
+        )
+
+        try:
+            # Sem o atalho de intenções, sem o cache de respostas, sem o
+            # orçamento de tokens e sem limites de admissão: todas as
+            # mensagens chegam iguais ao modelo
+            with override_settings(
+                CHAT_LLM_BASE_URL=llm_url,
+                CHAT_INTENTS_ENABLED=False,
+                CHAT_RESPONSE_CACHE_TTL=0,
+                CHAT_DAILY_TOKEN_BUDGET=0,
+                CHAT_THROTTLE_RATE=None,
+                CHAT_MAX_CONCURRENT_LLM_CALLS=options['concorrencia'],
+            ):
+                engine_registry.reload()
+
+                FakeLLMHandler.reset_stats()
+                results, wall = self._run_wsgi(tokens, options)
+                self._report(
+                    f"WSGI ({options['threads_wsgi']} threads)", results, wall,
+                    FakeLLMHandler.peak_in_flight,
+                )
+
+                FakeLLMHandler.reset_stats()
+                results, wall = asyncio.run(self._run_asgi(tokens, options))
+                self._report("ASGI (1 event loop)", results, wall, FakeLLMHandler.peak_in_flight)
+        finally:
+            engine_registry.reload()
+            server.shutdown()
+            server.server_close()
+            if options['limpar']:
+                User.objects.filter(username__startswith=PREFIXO_USUARIO).delete()
+
+    def _run_wsgi(self, tokens, options):
+        app = get_wsgi_application()
+        # Limita o app WSGI a N requisições simultâneas, como um worker real
+        slots = threading.BoundedSemaphore(options['threads_wsgi'])
+        results = []
+        lock = threading.Lock()
+
+        def run_user(token):
+            headers = {"Authorization": f"Token {token}"}
+            transport = httpx.WSGITransport(app=app)
+            with httpx.Client(transport=transport, base_url=BASE_URL, headers=headers, timeout=None) as client:
+                for i in range(options['mensagens']):
+                    body = {"message": MENSAGENS[i % len(MENSAGENS)]}
+                    start = time.perf_counter()
+                    with slots:
+                        resp = client.post("/api/chat/", json=body)
+                    with lock:
+                        results.append((resp.status_code == 200, resp.status_code, time.perf_counter() - start))
+
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=len(tokens) or 1) as pool:
+            list(pool.map(run_user, tokens))
+        return results, time.perf_counter() - start
+
+    async def _run_asgi(self, tokens, options):
+        transport = httpx.ASGITransport(app=get_asgi_application())
+        results = []
+
+        async def run_user(token):
+            headers = {"Authorization": f"Token {token}"}
+            async with httpx.AsyncClient(
+                transport=transport, base_url=BASE_URL, headers=headers, timeout=None,
+            ) as client:
+                for i in range(options['mensagens']):
+                    body = {"message": MENSAGENS[i % len(MENSAGENS)]}
+                    start = time.perf_counter()
+                    resp = await client.post("/api/chat/async/", json=body)
+                    results.append((resp.status_code == 200, resp.status_code, time.perf_counter() - start))
+
+        start = time.perf_counter()
+        await asyncio.gather(*(run_user(token) for token in tokens))
+        return results, time.perf_counter() - start
+
+    def _report(self, label, results, wall, peak):
+        ok = sorted(r[2] for r in results if r[0])
+        errors = {}
+        for r in results:
+            if not r[0]:
+                errors[r[1]] = errors.get(r[1], 0) + 1
+
+        self.stdout.write("")
+        self.stdout.write(self.style.MIGRATE_HEADING(label))
+        self.stdout.write(f"  Requisições: {len(results)}  (ok: {len(ok)}, erros: {sum(errors.values())})")
+        self.stdout.write(f"  Duração total: {wall:.2f}s  |  Vazão: {len(ok) / wall:.2f} req/s")
+        self.stdout.write(f"  Pico de chamadas simultâneas ao LLM: {peak}")
+        if ok:
+            self.stdout.write(
+                "  Latência (ms): "
+                f"p50={percentile(ok, 50) * 1000:.0f}  "
+                f"p95={percentile(ok, 95) * 1000:.0f}  "
+                f"p99={percentile(ok, 99) * 1000:.0f}  "
+                f"média={statistics.fmean(ok) * 1000:.0f}"
+            )
+        if errors:
+            self.stdout.write(f"  Erros por status: {errors}")
@@ -0,0 +1,85 @@
+# chat/management/commands/gerar_briefings.py
+"""
+Gera o briefing diário ("bom dia" + agenda do dia) de todos os usuários,
+com um pool de threads limitado (ver chat/briefing.py).
+
+Retomável: cada briefing é salvo assim que fica pronto, e rodar de novo
+só processa quem ainda não tem o do dia.
+
+Exemplos:
+    python manage.py gerar_briefings                  # uma passada (ex: via cron às 5h)
+    python manage.py gerar_briefings --loop           # roda todo dia a partir de CHAT_BRIEFING_HOUR
+    python manage.py gerar_briefings --desatualizados # refaz os que tiveram o contexto alterado
+"""
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from apps.chat.briefing import ATUAL, ERRO, GERADO, generate_all
+from apps.chat.registry import get_engine
+
+
+class Command(BaseCommand):
+    help = (
+        "Gera em lote o briefing diário de cada usuário (saudação + agenda do dia), "
+        "servido na hora pelo dashboard e pela primeira saudação do dia no chat."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--usuario', action='append',
+            help="Processa apenas este username (pode repetir).",
+        )
+        parser.add_argument(
+            '--workers', type=int, default=None,
+            help="Chamadas simultâneas ao modelo (padrão: CHAT_BRIEFING_WORKERS).",
+        )
+        parser.add_argument(
+            '--lote', type=int, default=500,
+            help="Usuários lidos do banco por vez (padrão: 500).",
+        )
+        parser.add_argument(
+            '--desatualizados', action='store_true',
+            help="Refaz também os briefings de hoje cujo contexto (lembretes/contatos) mudou.",
+        )
+        parser.add_argument(
+            '--loop', action='store_true',
+            help="Continua rodando: a cada --intervalo segundos, gera o que faltar do dia.",
+        )
+        parser.add_argument('--intervalo', type=int, default=600)
+
+    def handle(self, *args, **options):
+        engine = get_engine()
+        hour = getattr(settings, 'CHAT_BRIEFING_HOUR', 5)
+
+        while True:
+            now = timezone.now()
+            if not options['loop'] or timezone.localtime(now).hour >= hour:
+                self.run_once(engine, now, options)
+            if not options['loop']:
+                break
+            time.sleep(options['intervalo'])
+
+    def run_once(self, engine, now, options):
+        start = time.perf_counter()
+        stats = generate_all(
+            engine,
+            now=now,
+            workers=options['workers'],
+            page_size=options['lote'],
+            only_stale=options['desatualizados'],
+            usernames=options['usuario'],
+        )
+        elapsed = time.perf_counter() - start
+
+        self.stdout.write(
+            f"{stats[GERADO]} briefing(s) gerado(s), {stats[ATUAL]} já atualizado(s), "
+            f"{stats[ERRO]} erro(s) em {elapsed:.1f}s."
+        )
+        if stats["interrompido"]:
+            self.stderr.write(
+                "Provedor do modelo indisponível (circuito aberto): geração interrompida. "
+                "Rode de novo para continuar de onde parou."
+            )
@@ -0,0 +1,27 @@
+# chat/management/commands/indexar_memorias.py
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+
+from apps.chat.vector_index import vector_index
+
+
+class Command(BaseCommand):
+    help = (
+        "(Re)constrói o índice vetorial (busca semântica) do diário e das "
+        "mensagens do chat. Útil após trocar o CHAT_EMBEDDER ou para evitar "
+        "que o índice seja construído na primeira mensagem do usuário."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--usuario', help="Reconstrói apenas o índice deste username.")
+
+    def handle(self, *args, **options):
+        users = User.objects.all()
+        if options['usuario']:
+            users = users.filter(username=options['usuario'])
+
+        total = 0
+        for user_id in users.values_list('id', flat=True).iterator():
+            vector_index.build(user_id)
+            total += 1
+        self.stdout.write(f"{total} índice(s) reconstruído(s).")
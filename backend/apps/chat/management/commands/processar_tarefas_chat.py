@@ -0,0 +1,61 @@
+# chat/management/commands/processar_tarefas_chat.py
+"""
+Workers do modo assíncrono do chat: consomem a fila TarefaChat (no banco)
+com um pool de threads, respeitando a ordem dos turnos de cada usuário.
+
+Exemplo:
+    python manage.py processar_tarefas_chat --workers 8
+"""
+import time
+
+from django.core.management.base import BaseCommand
+
+from apps.chat.jobs import WorkerPool, queue_stats, requeue_stale
+from apps.chat.models import TarefaChat
+
+
+class Command(BaseCommand):
+    help = (
+        "Processa as tarefas do chat enfileiradas no modo assíncrono "
+        "(POST /api/chat/?async=1) com um pool de threads."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--workers', type=int, default=None,
+            help="Quantidade de threads (padrão: CHAT_JOB_WORKERS).",
+        )
+        parser.add_argument(
+            '--intervalo', type=float, default=None,
+            help="Segundos entre consultas à fila quando ela está vazia (padrão: CHAT_JOB_POLL_INTERVAL).",
+        )
+        parser.add_argument(
+            '--esvaziar', action='store_true',
+            help="Processa o que está na fila e termina (em vez de rodar continuamente).",
+        )
+
+    def handle(self, *args, **options):
+        requeued = requeue_stale()
+        if requeued:
+            self.stdout.write(f"{requeued} tarefa(s) presas devolvidas para a fila.")
+
+        pool = WorkerPool(options['workers'], options['intervalo'])
+        pool.start()
+        self.stdout.write(f"{pool.workers} worker(s) processando a fila do chat. Ctrl+C para sair.")
+
+        try:
+            while True:
+                time.sleep(pool.poll_interval)
+                if options['esvaziar'] and not TarefaChat.objects.filter(
+                    status__in=[TarefaChat.PENDENTE, TarefaChat.PROCESSANDO]
+                ).exists():
+                    break
+                requeue_stale()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            # Termina as tarefas em andamento antes de sair
+            pool.stop()
+            pool.join()
+
+        self.stdout.write(f"{pool.processed} tarefa(s) processada(s). Fila: {queue_stats()}")
@@ -0,0 +1,83 @@
+# chat/management/commands/resumir_conversas.py
+import time
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+
+from apps.chat.history import window_start_id
+from apps.chat.models import HistoricoChat, ResumoConversa
+from apps.chat.registry import get_engine
+
+
+class Command(BaseCommand):
+    help = (
+        "Atualiza de forma incremental o resumo das conversas antigas de cada "
+        "usuário (mensagens que já saíram da janela recente do histórico). "
+        "Roda fora da requisição: via cron ou em modo contínuo com --loop."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--usuario', help="Processa apenas este username.")
+        parser.add_argument(
+            '--lote', type=int, default=40,
+            help="Máximo de mensagens enviadas ao modelo por chamada (padrão: 40).",
+        )
+        parser.add_argument(
+            '--loop', action='store_true',
+            help="Continua rodando, processando novamente a cada --intervalo segundos.",
+        )
+        parser.add_argument('--intervalo', type=int, default=300)
+
+    def handle(self, *args, **options):
+        while True:
+            total = self.run_once(options['usuario'], options['lote'])
+            self.stdout.write(f"{total} mensagem(ns) incorporada(s) aos resumos.")
+            if not options['loop']:
+                break
+            time.sleep(options['intervalo'])
+
+    def run_once(self, username, batch_size):
+        users = User.objects.filter(historico_chat__isnull=False).distinct()
+        if username:
+            users = users.filter(username=username)
+
+        window_tokens = getattr(settings, 'CHAT_SUMMARY_WINDOW_TOKENS', 1000)
+        engine = get_engine()
+
+        total = 0
+        for user in users.iterator():
+            start_id = window_start_id(user, window_tokens)
+            if start_id is None:
+                continue
+
+            resumo, _ = ResumoConversa.objects.get_or_create(usuario=user)
+
+            # Incorpora as mensagens pendentes em lotes; cada lote é salvo
+            # logo em seguida, então o comando pode ser interrompido e
+            # retomado sem reprocessar nada.
+            while True:
+                pending = list(
+                    HistoricoChat.objects
+                    .filter(
+                        usuario=user,
+                        id__gt=resumo.ultima_mensagem_id,
+                        id__lt=start_id,
+                    )
+                    .order_by('id')
+                    .values('id', 'role', 'content')[:batch_size]
+                )
+                if not pending:
+                    break
+
+                try:
+                    resumo.conteudo = engine.summarize(resumo.conteudo, pending)
+                except Exception as e:
+                    self.stderr.write(f"Erro ao resumir conversas de {user.username}: {e}")
+                    break
+
+                resumo.ultima_mensagem_id = pending[-1]['id']
+                resumo.save(update_fields=['conteudo', 'ultima_mensagem_id', 'atualizado_em'])
+                total += len(pending)
+
+        return total
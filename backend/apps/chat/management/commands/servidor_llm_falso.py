@@ -0,0 +1,209 @@
+# chat/management/commands/servidor_llm_falso.py
+"""
+Servidor local que imita a API de chat completion (formato OpenAI / HF),
+para medir a sobrecarga do próprio backend e rodar testes de carga sem
+depender (nem pagar) do provedor real.
+
+Uso:
+    python manage.py servidor_llm_falso --porta 8001 --latencia 300 --tokens-por-segundo 40
+
+E no backend/config/.env:
+    HF_BASE_URL=http://127.0.0.1:8001/v1
+"""
+import json
+import random
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from django.core.management.base import BaseCommand
+
+from apps.chat.tokens import estimate_tokens
+
+FRASES = [
+    "Tudo bem, vamos ver isso juntos.",
+    "Hoje é um bom dia para descansar um pouco.",
+    "Lembre-se de tomar água ao longo do dia.",
+    "Se precisar, posso repetir com calma.",
+    "Você está indo muito bem.",
+]
+
+
+class FakeLLMHandler(BaseHTTPRequestHandler):
+    # Preenchido pelo comando (ver handle)
+    config: dict = {}
+
+    protocol_version = "HTTP/1.1"
+
+    # Requisições em andamento (e o pico), para medir quantas chamadas ao
+    # "provedor" o backend consegue manter ao mesmo tempo
+    stats_lock = threading.Lock()
+    in_flight = 0
+    peak_in_flight = 0
+
+    @classmethod
+    def reset_stats(cls):
+        with cls.stats_lock:
+            cls.in_flight = 0
+            cls.peak_in_flight = 0
+
+    def log_message(self, format, *args):
+        if self.config.get("verbose"):
+            super().log_message(format, *args)
+
+    def _send_json(self, status, data):
+        body = json.dumps(data).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _answer_tokens(self, max_tokens):
+        n_tokens = min(self.config["tokens"], max_tokens or self.config["tokens"])
+        words = " ".join(random.choice(FRASES) for _ in range(n_tokens // 6 + 1)).split()
+        return [f" {w}" if i else w for i, w in enumerate(words[:n_tokens])]
+
+    def do_POST(self):
+        cls = type(self)
+        with cls.stats_lock:
+            cls.in_flight += 1
+            cls.peak_in_flight = max(cls.peak_in_flight, cls.in_flight)
+        try:
+            self._handle_completion()
+        finally:
+            with cls.stats_lock:
+                cls.in_flight -= 1
+
+    def _handle_completion(self):
+        if not self.path.rstrip("/").endswith("/chat/completions"):
+            self._send_json(404, {"error": f"Rota desconhecida: {self.path}"})
+            return
+
+        length = int(self.headers.get("Content-Length") or 0)
+        payload = json.loads(self.rfile.read(length) or b"{}")
+
+        # Latência até o primeiro token (fila + prefill do provedor)
+        time.sleep(self.config["latencia"] / 1000)
+
+        if random.random() < self.config["taxa_erro"]:
+            self._send_json(503, {"error": "Falha simulada do provedor."})
+            return
+
+        tokens = self._answer_tokens(payload.get("max_tokens"))
+        prompt_tokens = sum(
+            estimate_tokens(m.get("content") or "") for m in payload.get("messages", [])
+        )
+        usage = {
+            "prompt_tokens": prompt_tokens,
+            "completion_tokens": len(tokens),
+            "total_tokens": prompt_tokens + len(tokens),
+        }
+        common = {
+            "id": f"chatcmpl-{uuid.uuid4().hex}",
+            "created": int(time.time()),
+            "model": payload.get("model") or "fake-llm",
+            "system_fingerprint": "fake-llm",
+        }
+        delay = 1 / self.config["tokens_por_segundo"]
+
+        if not payload.get("stream"):
+            time.sleep(delay * len(tokens))
+            self._send_json(200, {
+                **common,
+                "object": "chat.completion",
+                "choices": [{
+                    "index": 0,
+                    "message": {"role": "assistant", "content": "".join(tokens)},
+                    "finish_reason": "stop",
+                }],
+                "usage": usage,
+            })
+            return
+
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Cache-Control", "no-cache")
+        self.send_header("Connection", "close")
+        self.end_headers()
+        self.close_connection = True
+
+        for i, token in enumerate(tokens):
+            last = i == len(tokens) - 1
+            chunk = {
+                **common,
+                "object": "chat.completion.chunk",
+                "choices": [{
+                    "index": 0,
+                    "delta": {"role": "assistant", "content": token},
+                    "finish_reason": "stop" if last else None,
+                }],
+            }
+            if last:
+                chunk["usage"] = usage
+            self.wfile.write(f"data: {json.dumps(chunk)}\n\n".encode("utf-8"))
+            self.wfile.flush()
+            time.sleep(delay)
+        self.wfile.write(b"data: [DONE]\n\n")
+        self.wfile.flush()
+
+
+class FakeLLMServer(ThreadingHTTPServer):
+    daemon_threads = True
+    # Fila de conexões maior que o padrão (5), para testes com muitos clientes
+    request_queue_size = 1024
+
+
+def make_server(options) -> ThreadingHTTPServer:
+    """Cria o servidor falso (ainda sem iniciar) com as opções do comando."""
+    FakeLLMHandler.config = {
+        "latencia": options['latencia'],
+        "tokens_por_segundo": options['tokens_por_segundo'],
+        "tokens": options['tokens'],
+        "taxa_erro": options.get('taxa_erro', 0.0),
+        "verbose": options.get('verbose', False),
+    }
+    return FakeLLMServer((options['host'], options['porta']), FakeLLMHandler)
+
+
+class Command(BaseCommand):
+    help = (
+        "Inicia um servidor LLM falso (compatível com /v1/chat/completions) com "
+        "latência, velocidade de geração e taxa de erro configuráveis."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--host', default='127.0.0.1')
+        parser.add_argument('--porta', type=int, default=8001)
+        parser.add_argument(
+            '--latencia', type=float, default=300,
+            help="Tempo (ms) até o primeiro token (padrão: 300).",
+        )
+        parser.add_argument(
+            '--tokens-por-segundo', type=float, default=50,
+            help="Velocidade de geração após o primeiro token (padrão: 50).",
+        )
+        parser.add_argument(
+            '--tokens', type=int, default=120,
+            help="Tamanho das respostas, em tokens (limitado pelo max_tokens do pedido).",
+        )
+        parser.add_argument(
+            '--taxa-erro', type=float, default=0.0,
+            help="Fração (0 a 1) das requisições que falham com 503.",
+        )
+        parser.add_argument('--verbose', action='store_true')
+
+    def handle(self, *args, **options):
+        server = make_server(options)
+
+        self.stdout.write(
+            f"LLM falso em http://{options['host']}:{options['porta']}/v1 "
+            f"(use HF_BASE_URL com esse endereço). Ctrl+C para sair."
+        )
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            server.server_close()
@@ -0,0 +1,164 @@
+# chat/management/commands/teste_carga_chat.py
+"""
+Gerador de carga para o endpoint do chat.
+
+Cria usuários sintéticos (com token) no banco configurado, dispara
+mensagens em paralelo contra um backend já rodando e reporta latência
+(p50/p95/p99), vazão e erros. Combine com o 'servidor_llm_falso' para
+medir só a sobrecarga do backend, sem o provedor real.
+
+Exemplo:
+    python manage.py servidor_llm_falso --latencia 300 &
+    HF_BASE_URL=http://127.0.0.1:8001/v1 python manage.py runserver &
+    python manage.py teste_carga_chat --usuarios 50 --mensagens 10
+"""
+import statistics
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import httpx
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from rest_framework.authtoken.models import Token
+
+PREFIXO_USUARIO = "cargasintetica"
+
+MENSAGENS = [
+    "Bom dia! O que eu tenho para fazer hoje?",
+    "Você lembra quando meu neto veio me visitar?",
+    "Que horas eu tomo o remédio da pressão?",
+    "Estou me sentindo um pouco confuso hoje.",
+    "Quem é meu contato de emergência?",
+    "Me conta uma coisa boa que aconteceu essa semana.",
+]
+
+
+def percentile(values, pct):
+    """Percentil por interpolação linear (values já ordenados)."""
+    if not values:
+        return 0.0
+    if len(values) == 1:
+        return values[0]
+    pos = (len(values) - 1) * pct / 100
+    low = int(pos)
+    high = min(low + 1, len(values) - 1)
+    return values[low] + (values[high] - values[low]) * (pos - low)
+
+
+def prepare_users(n):
+    """Cria (ou reaproveita) n usuários sintéticos e devolve seus tokens."""
+    tokens = []
+    for i in range(n):
+        user, created = User.objects.get_or_create(username=f"{PREFIXO_USUARIO}{i:05d}")
+        if created:
+            user.set_unusable_password()
+            user.save(update_fields=['password'])
+        token, _ = Token.objects.get_or_create(user=user)
+        tokens.append(token.key)
+    return tokens
+
+
+class Command(BaseCommand):
+    help = (
+        "Teste de carga do chat: vários usuários sintéticos conversando ao mesmo "
+        "tempo; reporta p50/p95/p99 de latência e vazão."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--url', default='http://127.0.0.1:8000')
+        parser.add_argument('--caminho', default='/api/chat/')
+        parser.add_argument('--usuarios', type=int, default=20)
+        parser.add_argument(
+            '--mensagens', type=int, default=5,
+            help="Mensagens enviadas (em sequência) por usuário.",
+        )
+        parser.add_argument(
+            '--stream', action='store_true',
+            help="Usa o modo SSE e mede também o tempo até o primeiro token.",
+        )
+        parser.add_argument('--timeout', type=float, default=120)
+        parser.add_argument(
+            '--limpar', action='store_true',
+            help="Remove os usuários sintéticos (e seus dados) ao final.",
+        )
+
+    def _run_user(self, token, options, results, lock):
+        url = options['url'].rstrip('/') + options['caminho']
+        params = {"stream": "1"} if options['stream'] else None
+        headers = {"Authorization": f"Token {token}"}
+
+        with httpx.Client(timeout=options['timeout'], headers=headers) as client:
+            for i in range(options['mensagens']):
+                body = {"message": MENSAGENS[i % len(MENSAGENS)]}
+                start = time.perf_counter()
+                first_token = None
+                try:
+                    if options['stream']:
+                        with client.stream("POST", url, json=body, params=params) as resp:
+                            ok = resp.status_code == 200
+                            for line in resp.iter_lines():
+                                if first_token is None and line.startswith("event: token"):
+                                    first_token = time.perf_counter() - start
+                                if line.startswith("event: error"):
+                                    ok = False
+                    else:
+                        resp = client.post(url, json=body)
+                        ok = resp.status_code == 200
+                    status = resp.status_code
+                except httpx.HTTPError as e:
+                    ok, status = False, type(e).__name__
+                elapsed = time.perf_counter() - start
+
+                with lock:
+                    results.append((ok, status, elapsed, first_token))
+
+    def handle(self, *args, **options):
+        tokens = prepare_users(options['usuarios'])
+        self.stdout.write(
+            f"{len(tokens)} usuário(s) x {options['mensagens']} mensagem(ns) "
+            f"contra {options['url']}{options['caminho']}..."
+        )
+
+        results = []
+        lock = threading.Lock()
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=len(tokens) or 1) as pool:
+            for token in tokens:
+                pool.submit(self._run_user, token, options, results, lock)
+        wall = time.perf_counter() - start
+
+        self._report(results, wall)
+
+        if options['limpar']:
+            User.objects.filter(username__startswith=PREFIXO_USUARIO).delete()
+
+    def _report(self, results, wall):
+        ok = sorted(r[2] for r in results if r[0])
+        errors = [r for r in results if not r[0]]
+        ttft = sorted(r[3] for r in results if r[0] and r[3] is not None)
+
+        self.stdout.write("")
+        self.stdout.write(f"Requisições: {len(results)}  (ok: {len(ok)}, erros: {len(errors)})")
+        self.stdout.write(f"Duração total: {wall:.2f}s  |  Vazão: {len(ok) / wall:.2f} req/s")
+        if ok:
+            self.stdout.write(
+                "Latência (ms): "
+                f"p50={percentile(ok, 50) * 1000:.0f}  "
+                f"p95={percentile(ok, 95) * 1000:.0f}  "
+                f"p99={percentile(ok, 99) * 1000:.0f}  "
+                f"média={statistics.fmean(ok) * 1000:.0f}  "
+                f"máx={ok[-1] * 1000:.0f}"
+            )
+        if ttft:
+            self.stdout.write(
+                "Primeiro token (ms): "
+                f"p50={percentile(ttft, 50) * 1000:.0f}  "
+                f"p95={percentile(ttft, 95) * 1000:.0f}  "
+                f"p99={percentile(ttft, 99) * 1000:.0f}"
+            )
+        if errors:
+            by_status = {}
+            for r in errors:
+                by_status[r[1]] = by_status.get(r[1], 0) + 1
+            self.stdout.write(f"Erros por status: {by_status}")
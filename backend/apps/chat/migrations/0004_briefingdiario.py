@@ -0,0 +1,31 @@
+# Generated by Django 5.2.8 on 2026-10-18 09:18
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('chat', '0003_tarefachat'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='BriefingDiario',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('data', models.DateField()),
+                ('conteudo', models.TextField()),
+                ('contexto_hash', models.CharField(blank=True, default='', max_length=16)),
+                ('gerado_em', models.DateTimeField(auto_now=True)),
+                ('usuario', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='briefings', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'ordering': ['-data'],
+                'constraints': [models.UniqueConstraint(fields=('usuario', 'data'), name='briefing_usuario_data')],
+            },
+        ),
+    ]
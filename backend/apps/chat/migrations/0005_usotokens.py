@@ -0,0 +1,33 @@
+# Generated by Django 5.2.8 on 2026-10-18 09:33
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('chat', '0004_briefingdiario'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='UsoTokens',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('data', models.DateField()),
+                ('tokens_prompt', models.PositiveIntegerField(default=0)),
+                ('tokens_resposta', models.PositiveIntegerField(default=0)),
+                ('chamadas', models.PositiveIntegerField(default=0)),
+                ('chamadas_estimadas', models.PositiveIntegerField(default=0)),
+                ('atualizado_em', models.DateTimeField(auto_now=True)),
+                ('usuario', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='uso_tokens', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'ordering': ['-data'],
+                'constraints': [models.UniqueConstraint(fields=('usuario', 'data'), name='usotokens_usuario_data')],
+            },
+        ),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 5.2.8 on 2026-10-18 09:47
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('chat', '0006_sessaochat'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='historicochat',
+            index=models.Index(fields=['usuario', 'timestamp', 'id'], name='historico_usuario_timestamp'),
+        ),
+    ]
@@ -0,0 +1,35 @@
+# Generated by Django 5.2.8 on 2026-10-18 09:49
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('chat', '0007_historico_usuario_timestamp'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ArquivoChat',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('primeira_mensagem_id', models.BigIntegerField()),
+                ('ultima_mensagem_id', models.BigIntegerField()),
+                ('inicio', models.DateTimeField()),
+                ('fim', models.DateTimeField()),
+                ('mensagens', models.PositiveIntegerField()),
+                ('dados', models.BinaryField()),
+                ('tamanho_original', models.PositiveIntegerField()),
+                ('criado_em', models.DateTimeField(auto_now_add=True)),
+                ('usuario', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='arquivos_chat', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'ordering': ['-id'],
+                'indexes': [models.Index(fields=['usuario', 'fim'], name='arquivo_usuario_fim')],
+            },
+        ),
+    ]
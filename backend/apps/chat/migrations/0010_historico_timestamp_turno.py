@@ -0,0 +1,19 @@
+# Generated by Django 5.2.8 on 2026-10-18 10:20
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('chat', '0009_versaocontexto'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='historicochat',
+            name='timestamp',
+            field=models.DateTimeField(default=django.utils.timezone.now),
+        ),
+    ]
@@ -1,25 +1,251 @@
 from django.db import models
 from django.contrib.auth.models import User
+from django.utils import timezone
+
+class SessaoChat(models.Model):
+    """
+    Uma conversa do paciente com o assistente. "Nova conversa" só cria
+    uma sessão: o prompt e o histórico da tela passam a usar apenas as
+    mensagens dela, sem apagar nem ler as antigas (ver chat/sessions.py).
+    Mensagens anteriores às sessões (sessao nula) formam a conversa
+    inicial do usuário.
+    """
+    usuario = models.ForeignKey(User, on_delete=models.CASCADE, related_name='sessoes_chat')
+
+    iniciada_em = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ['-id']
+
+    def __str__(self):
+        return f"Sessão {self.id} de {self.usuario.username}"
+
 
 class HistoricoChat(models.Model):
     # O usuário dono desta mensagem
     usuario = models.ForeignKey(User, on_delete=models.CASCADE, related_name='historico_chat')
 
+    # A conversa a que a mensagem pertence (nula: conversa inicial)
+    sessao = models.ForeignKey(
+        SessaoChat, on_delete=models.CASCADE, null=True, blank=True, related_name='mensagens'
+    )
+
     # O "papel": 'user' (para mensagem do usuário) ou 'assistant' (para resposta da IA)
     role = models.CharField(max_length=10, choices=[('user', 'User'), ('assistant', 'Assistant')])
 
     # O conteúdo da mensagem
     content = models.TextField()
 
-    timestamp = models.DateTimeField(auto_now_add=True)
+    # Horário do turno. Não é auto_now_add: o buffer de gravação adiada
+    # (ver chat/write_buffer.py) informa o horário em que o turno aconteceu
+    timestamp = models.DateTimeField(default=timezone.now)
 
     class Meta:
         # Ordena as mensagens da mais antiga para a mais nova
         ordering = ['timestamp']
+        indexes = [
+            # Janela recente da conversa atual (ver chat/history.py)
+            models.Index(fields=['usuario', 'sessao', 'timestamp'], name='historico_usuario_sessao'),
+            # Mensagens de um usuário por data (briefing do dia, páginas do histórico)
+            models.Index(fields=['usuario', 'timestamp', 'id'], name='historico_usuario_timestamp'),
+        ]
 
     def __str__(self):
         return f"{self.usuario.username} ({self.role}): {self.content[:30]}..."
 
     def to_dict(self):
         """Converte o objeto para o formato que a IA espera."""
-        return {"role": self.role, "content": self.content}
\ No newline at end of file
+        return {"role": self.role, "content": self.content}
+
+
+class ResumoConversa(models.Model):
+    """
+    Resumo acumulado das conversas antigas de um usuário.
+
+    É atualizado fora da requisição (comando 'resumir_conversas') conforme
+    as mensagens saem da janela recente do histórico, e injetado no
+    prompt como mensagem de sistema para não perder memórias antigas.
+    """
+    usuario = models.OneToOneField(User, on_delete=models.CASCADE, related_name='resumo_conversa')
+
+    conteudo = models.TextField(blank=True, default='')
+
+    # Id da última mensagem do HistoricoChat já incorporada ao resumo
+    ultima_mensagem_id = models.BigIntegerField(default=0)
+
+    atualizado_em = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"Resumo de {self.usuario.username}: {self.conteudo[:30]}..."
+
+
+class VersaoContexto(models.Model):
+    """
+    Versão do contexto RAG de um usuário (ver chat/context.py).
+
+    Os signals de Lembrete, Contato, PerfilPaciente e EntradaDiario
+    incrementam a versão no banco, e ela faz parte da chave do cache: assim
+    uma mudança feita em um processo invalida o contexto em cache (e os
+    índices BM25 em memória) de todos os outros (workers, 'gerar_briefings
+    --loop'), mesmo com um cache local a cada processo como o LocMemCache.
+    """
+    usuario = models.OneToOneField(User, on_delete=models.CASCADE, related_name='versao_contexto')
+
+    versao = models.PositiveBigIntegerField(default=0)
+
+    def __str__(self):
+        return f"Contexto de {self.usuario.username}: versão {self.versao}"
+
+
+class TarefaChat(models.Model):
+    """
+    Turno do chat enfileirado no modo assíncrono (fila no próprio banco).
+
+    A view só cria a tarefa e devolve o id; os workers do comando
+    'processar_tarefas_chat' chamam o modelo e gravam a resposta, e o
+    cliente consulta (ou espera, com long-polling) o resultado.
+    As tarefas de um mesmo usuário são respondidas em ordem.
+    """
+    PENDENTE = 'pendente'
+    PROCESSANDO = 'processando'
+    CONCLUIDA = 'concluida'
+    ERRO = 'erro'
+    STATUS_CHOICES = [
+        (PENDENTE, 'Pendente'),
+        (PROCESSANDO, 'Processando'),
+        (CONCLUIDA, 'Concluída'),
+        (ERRO, 'Erro'),
+    ]
+
+    usuario = models.ForeignKey(User, on_delete=models.CASCADE, related_name='tarefas_chat')
+
+    mensagem = models.TextField()
+
+    status = models.CharField(max_length=12, choices=STATUS_CHOICES, default=PENDENTE)
+
+    resposta = models.TextField(blank=True, default='')
+
+    erro = models.TextField(blank=True, default='')
+
+    # Identifica o worker que pegou a tarefa (processo/thread)
+    worker = models.CharField(max_length=100, blank=True, default='')
+
+    criado_em = models.DateTimeField(auto_now_add=True)
+    iniciado_em = models.DateTimeField(null=True, blank=True)
+    concluido_em = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ['id']
+        indexes = [
+            models.Index(fields=['status', 'usuario'], name='tarefachat_status_usuario'),
+        ]
+
+    def __str__(self):
+        return f"Tarefa {self.id} de {self.usuario.username} ({self.status})"
+
+
+class BriefingDiario(models.Model):
+    """
+    Mensagem de "bom dia" do paciente para um dia: saudação + agenda do
+    dia, gerada em lote de madrugada (comando 'gerar_briefings').
+
+    Servida na hora pelo dashboard (GET /api/chat/briefing/) e como
+    resposta à primeira saudação do dia no chat, sem esperar o modelo.
+    """
+    usuario = models.ForeignKey(User, on_delete=models.CASCADE, related_name='briefings')
+
+    data = models.DateField()
+
+    conteudo = models.TextField()
+
+    # Hash do contexto RAG usado na geração (ver chat/context.py): se os
+    # lembretes/contatos mudarem depois, o briefing fica desatualizado
+    contexto_hash = models.CharField(max_length=16, blank=True, default='')
+
+    gerado_em = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        ordering = ['-data']
+        constraints = [
+            models.UniqueConstraint(fields=['usuario', 'data'], name='briefing_usuario_data'),
+        ]
+
+    def __str__(self):
+        return f"Briefing de {self.usuario.username} ({self.data})"
+
+
+class UsoTokens(models.Model):
+    """
+    Tokens gastos com o modelo por usuário e por dia (agregado).
+
+    Cada turno do chat soma aqui o 'usage' devolvido pelo provedor (ou a
+    estimativa local, quando ele não vem). É a base do orçamento diário
+    de tokens (ver chat/usage.py) e do endpoint GET /api/chat/uso/.
+    """
+    usuario = models.ForeignKey(User, on_delete=models.CASCADE, related_name='uso_tokens')
+
+    data = models.DateField()
+
+    tokens_prompt = models.PositiveIntegerField(default=0)
+
+    tokens_resposta = models.PositiveIntegerField(default=0)
+
+    chamadas = models.PositiveIntegerField(default=0)
+
+    # Chamadas em que o provedor não informou o uso (valor estimado)
+    chamadas_estimadas = models.PositiveIntegerField(default=0)
+
+    atualizado_em = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        ordering = ['-data']
+        constraints = [
+            models.UniqueConstraint(fields=['usuario', 'data'], name='usotokens_usuario_data'),
+        ]
+
+    @property
+    def tokens_total(self) -> int:
+        return self.tokens_prompt + self.tokens_resposta
+
+    def __str__(self):
+        return f"Uso de {self.usuario.username} em {self.data}: {self.tokens_total} tokens"
+
+
+class ArquivoChat(models.Model):
+    """
+    Segmento arquivado do histórico do chat (armazenamento frio).
+
+    Mensagens mais antigas que CHAT_ARCHIVE_AFTER_DAYS saem do
+    HistoricoChat e vêm para cá em blocos de até
+    CHAT_ARCHIVE_SEGMENT_MESSAGES mensagens, como NDJSON comprimido com
+    zlib (ver chat/archive.py). A tabela do histórico fica pequena não
+    importa a idade da conta; os segmentos são lidos sob demanda em
+    GET /api/chat/arquivo/.
+    """
+    usuario = models.ForeignKey(User, on_delete=models.CASCADE, related_name='arquivos_chat')
+
+    # Intervalo de mensagens (ids e datas do HistoricoChat) do segmento
+    primeira_mensagem_id = models.BigIntegerField()
+    ultima_mensagem_id = models.BigIntegerField()
+    inicio = models.DateTimeField()
+    fim = models.DateTimeField()
+
+    mensagens = models.PositiveIntegerField()
+
+    # NDJSON (uma mensagem por linha) comprimido com zlib
+    dados = models.BinaryField()
+
+    # Tamanho do NDJSON antes da compressão (bytes)
+    tamanho_original = models.PositiveIntegerField()
+
+    criado_em = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ['-id']
+        indexes = [
+            # Segmentos de um usuário e expurgo por idade
+            models.Index(fields=['usuario', 'fim'], name='arquivo_usuario_fim'),
+        ]
+
+    def __str__(self):
+        return f"Arquivo de {self.usuario.username}: {self.mensagens} mensagens até {self.fim:%d/%m/%Y}"
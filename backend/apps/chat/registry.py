@@ -0,0 +1,113 @@
+# chat/registry.py
+"""
+Registro de ChatEngines compartilhados pelo processo.
+
+O DRF cria uma instância nova da view a cada requisição, então guardar o
+engine em 'self' não evita recriá-lo. Aqui mantemos um engine por
+configuração (model_id, temperature, max_tokens), criado uma vez e
+reaproveitado por todas as requisições/threads.
+
+Se um dos prompts (sistema, resumo, briefing) ou o .env mudarem em disco,
+os engines são recriados na próxima chamada (recarregamento a quente).
+"""
+import logging
+import threading
+import time
+
+from django.conf import settings
+
+from .engine import ChatEngine
+from .utils import get_env_path, get_prompt_path, load_env
+
+logger = logging.getLogger(__name__)
+
+
+def _mtime(path):
+    try:
+        return path.stat().st_mtime_ns
+    except OSError:
+        return None
+
+
+class EngineRegistry:
+    def __init__(self, reload_interval: float = 5.0) -> None:
+        self._lock = threading.Lock()
+        self._engines: dict[tuple, ChatEngine] = {}
+        self._watched = [
+            get_prompt_path("system_prompt.txt"),
+            get_prompt_path("summary_prompt.txt"),
+            get_prompt_path("briefing_prompt.txt"),
+            get_env_path(),
+        ]
+        self._fingerprint = self._current_fingerprint()
+        self._reload_interval = reload_interval
+        self._last_check = time.monotonic()
+
+    def _current_fingerprint(self):
+        return tuple(_mtime(p) for p in self._watched)
+
+    def _check_reload(self) -> None:
+        """
+        Verifica (no máximo a cada 'reload_interval' segundos) se os arquivos
+        observados mudaram; se sim, descarta os engines para que sejam recriados.
+        """
+        now = time.monotonic()
+        if now - self._last_check < self._reload_interval:
+            return
+        self._last_check = now
+
+        fingerprint = self._current_fingerprint()
+        if fingerprint != self._fingerprint:
+            self._fingerprint = fingerprint
+            logger.info("Prompt ou .env alterados: recarregando ChatEngines.")
+            load_env(override=True)
+            self._engines.clear()
+
+    def get(
+        self,
+        model_id: str | None = None,
+        temperature: float = 0.3,
+        max_tokens: int = 400,
+    ) -> ChatEngine:
+        key = (model_id, temperature, max_tokens)
+        with self._lock:
+            self._check_reload()
+            engine = self._engines.get(key)
+            if engine is None:
+                engine = ChatEngine(
+                    model_id=model_id,
+                    temperature=temperature,
+                    max_tokens=max_tokens,
+                )
+                self._engines[key] = engine
+            return engine
+
+    def reload(self) -> None:
+        """Força a recriação de todos os engines na próxima chamada."""
+        with self._lock:
+            load_env(override=True)
+            self._fingerprint = self._current_fingerprint()
+            self._engines.clear()
+
+    def warm_up(self) -> None:
+        """
+        Cria o engine padrão antecipadamente. Chamado só pelos pontos de
+        entrada do servidor (wsgi.py / asgi.py, inclusive o runserver):
+        'migrate', 'test' e os demais comandos criam o engine sob demanda,
+        se precisarem. Se o .env ainda não estiver configurado, apenas
+        registra o aviso: o erro aparece de novo na primeira chamada.
+        """
+        try:
+            self.get()
+        except RuntimeError as e:
+            logger.info("ChatEngine não pré-carregado: %s", e)
+
+
+engine_registry = EngineRegistry(
+    reload_interval=getattr(settings, 'CHAT_ENGINE_RELOAD_INTERVAL', 5.0),
+)
+
+
+def get_engine(**kwargs) -> ChatEngine:
+    """Atalho para engine_registry.get()."""
+    return engine_registry.get(**kwargs)
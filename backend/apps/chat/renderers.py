@@ -0,0 +1,32 @@
+# chat/renderers.py
+import json
+
+from rest_framework.renderers import BaseRenderer
+
+
+def format_sse(event: str, data) -> str:
+    """
+    Formata um evento no padrão Server-Sent Events.
+    O payload vai sempre em JSON para que quebras de linha não
+    quebrem o protocolo.
+    """
+    payload = json.dumps(data, ensure_ascii=False, default=str)
+    return f"event: {event}\ndata: {payload}\n\n"
+
+
+class EventStreamRenderer(BaseRenderer):
+    """
+    Permite que o DRF aceite 'Accept: text/event-stream'.
+
+    O corpo do streaming é gerado pela própria view (StreamingHttpResponse);
+    este renderer só é usado quando a view devolve um Response comum
+    (ex: erro de validação), que vira um único evento 'error'.
+    """
+    media_type = 'text/event-stream'
+    format = 'sse'
+    charset = 'utf-8'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        return format_sse('error', data).encode(self.charset)
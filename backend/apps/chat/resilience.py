@@ -0,0 +1,214 @@
+# chat/resilience.py
+"""
+Proteções em volta das chamadas ao provedor do modelo:
+
+- retries limitados, com backoff exponencial e jitter, só para erros
+  transitórios (timeout, conexão, 429, 5xx);
+- circuit breaker: depois de várias falhas seguidas, as chamadas falham
+  na hora (sem ocupar um worker esperando o provedor) até passar o tempo
+  de recuperação, quando uma chamada de teste decide se o circuito fecha.
+"""
+import asyncio
+import random
+import threading
+import time
+
+import httpx
+from django.conf import settings
+from huggingface_hub.errors import HfHubHTTPError
+
+RETRYABLE_STATUS = {408, 425, 429, 500, 502, 503, 504}
+
+# Mensagem mostrada ao paciente quando o assistente está indisponível
+FALLBACK_REPLY = (
+    "Desculpe, estou com dificuldade para pensar agora. "
+    "Vamos tentar de novo daqui a pouquinho? "
+    "Se precisar de algo urgente, fale com um familiar ou cuidador."
+)
+
+
+class CircuitOpenError(Exception):
+    """O circuito está aberto: o provedor foi considerado fora do ar."""
+
+    def __init__(self, retry_after: float) -> None:
+        self.retry_after = retry_after
+        super().__init__(
+            f"Provedor do modelo indisponível. Nova tentativa em {retry_after:.0f}s."
+        )
+
+
+def is_retryable(exc: BaseException) -> bool:
+    """Erros transitórios, que valem uma nova tentativa."""
+    if isinstance(exc, HfHubHTTPError):
+        response = getattr(exc, "response", None)
+        return response is not None and response.status_code in RETRYABLE_STATUS
+    # Timeouts (inclusive InferenceTimeoutError) e falhas de conexão/rede
+    return isinstance(exc, (httpx.TimeoutException, httpx.TransportError, TimeoutError))
+
+
+class CircuitBreaker:
+    CLOSED = "fechado"
+    OPEN = "aberto"
+    HALF_OPEN = "meio_aberto"
+
+    def __init__(self, failure_threshold: int = 5, recovery_timeout: float = 30.0) -> None:
+        self.failure_threshold = failure_threshold
+        self.recovery_timeout = recovery_timeout
+        self._lock = threading.Lock()
+        self._state = self.CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+        self._probe_in_flight = False
+        self._total_failures = 0
+        self._total_rejected = 0
+
+    def before_call(self) -> None:
+        """Levanta CircuitOpenError se a chamada não deve ser feita agora."""
+        with self._lock:
+            if self._state == self.CLOSED:
+                return
+            elapsed = time.monotonic() - self._opened_at
+            if self._state == self.OPEN and elapsed >= self.recovery_timeout:
+                # Deixa passar uma única chamada de teste
+                self._state = self.HALF_OPEN
+            if self._state == self.HALF_OPEN and not self._probe_in_flight:
+                self._probe_in_flight = True
+                return
+            self._total_rejected += 1
+            raise CircuitOpenError(max(self.recovery_timeout - elapsed, 1.0))
+
+    def is_open(self) -> bool:
+        """True se as chamadas estão sendo rejeitadas agora (sem consumir a chamada de teste)."""
+        with self._lock:
+            return (
+                self._state == self.OPEN
+                and time.monotonic() - self._opened_at < self.recovery_timeout
+            )
+
+    def retry_after(self) -> float:
+        """Segundos até o circuito aceitar uma nova chamada de teste."""
+        with self._lock:
+            if self._state != self.OPEN:
+                return 0.0
+            return max(self.recovery_timeout - (time.monotonic() - self._opened_at), 0.0)
+
+    def record_success(self) -> None:
+        with self._lock:
+            self._state = self.CLOSED
+            self._failures = 0
+            self._probe_in_flight = False
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self._failures += 1
+            self._total_failures += 1
+            self._probe_in_flight = False
+            if self._state == self.HALF_OPEN or self._failures >= self.failure_threshold:
+                self._state = self.OPEN
+                self._opened_at = time.monotonic()
+
+    def snapshot(self) -> dict:
+        """Estado atual, para monitoramento."""
+        with self._lock:
+            retry_after = 0.0
+            if self._state == self.OPEN:
+                retry_after = max(self.recovery_timeout - (time.monotonic() - self._opened_at), 0.0)
+            return {
+                "estado": self._state,
+                "falhas_seguidas": self._failures,
+                "falhas_total": self._total_failures,
+                "rejeitadas_total": self._total_rejected,
+                "reabre_em_segundos": round(retry_after, 1),
+            }
+
+
+def backoff_delay(attempt: int, base: float, maximum: float) -> float:
+    """Backoff exponencial com 'full jitter' (attempt começa em 0)."""
+    return random.uniform(0, min(maximum, base * (2 ** attempt)))
+
+
+def _retry_delay(attempt: int) -> float:
+    return backoff_delay(
+        attempt,
+        getattr(settings, 'CHAT_LLM_RETRY_BASE_DELAY', 0.5),
+        getattr(settings, 'CHAT_LLM_RETRY_MAX_DELAY', 4.0),
+    )
+
+
+def retry_pause(attempt: int) -> None:
+    """Espera antes da nova tentativa 'attempt' (começa em 0)."""
+    time.sleep(_retry_delay(attempt))
+
+
+async def aretry_pause(attempt: int) -> None:
+    """Versão assíncrona de retry_pause (não bloqueia o event loop)."""
+    await asyncio.sleep(_retry_delay(attempt))
+
+
+def record_outcome(breaker: CircuitBreaker | None, exc: BaseException | None) -> None:
+    """
+    Registra o resultado de uma chamada no breaker. Erros não transitórios
+    (ex: 400, 401) mostram que o provedor está respondendo, então contam
+    como sucesso para o circuito.
+    """
+    if breaker is None:
+        return
+    if exc is not None and is_retryable(exc):
+        breaker.record_failure()
+    else:
+        breaker.record_success()
+
+
+def call_with_retries(fn, breaker: CircuitBreaker | None = None, max_retries: int | None = None):
+    """
+    Executa fn() com retries para erros transitórios e registra o
+    resultado no circuit breaker.
+    """
+    if max_retries is None:
+        max_retries = getattr(settings, 'CHAT_LLM_MAX_RETRIES', 2)
+
+    attempt = 0
+    while True:
+        if breaker is not None:
+            breaker.before_call()
+        try:
+            result = fn()
+        except Exception as e:
+            record_outcome(breaker, e)
+            if not is_retryable(e) or attempt >= max_retries:
+                raise
+            retry_pause(attempt)
+            attempt += 1
+            continue
+
+        record_outcome(breaker, None)
+        return result
+
+
+async def acall_with_retries(fn, breaker: CircuitBreaker | None = None, max_retries: int | None = None):
+    """Versão assíncrona de call_with_retries: fn() devolve uma corrotina."""
+    if max_retries is None:
+        max_retries = getattr(settings, 'CHAT_LLM_MAX_RETRIES', 2)
+
+    attempt = 0
+    while True:
+        if breaker is not None:
+            breaker.before_call()
+        try:
+            result = await fn()
+        except Exception as e:
+            record_outcome(breaker, e)
+            if not is_retryable(e) or attempt >= max_retries:
+                raise
+            await aretry_pause(attempt)
+            attempt += 1
+            continue
+
+        record_outcome(breaker, None)
+        return result
+
+
+llm_breaker = CircuitBreaker(
+    failure_threshold=getattr(settings, 'CHAT_BREAKER_FAILURE_THRESHOLD', 5),
+    recovery_timeout=getattr(settings, 'CHAT_BREAKER_RECOVERY_TIMEOUT', 30.0),
+)
@@ -0,0 +1,230 @@
+# chat/response_cache.py
+"""
+Cache de respostas do chat para perguntas repetidas.
+
+Pacientes com perda de memória fazem a mesma pergunta várias vezes por
+hora. Uma resposta do modelo fica guardada por CHAT_RESPONSE_CACHE_TTL
+segundos, com a chave:
+
+    (usuário, contexto, mensagem normalizada)
+
+em que o contexto junta o hash do contexto RAG estruturado (ver
+context.rag_fingerprint; muda com os lembretes do dia, contatos e perfil),
+a versão do contexto no banco (muda também com o diário, de onde vêm as
+memórias do prompt) e a sessão atual do chat. Uma mudança em qualquer
+processo ou uma "nova conversa" fazem as respostas antigas deixarem de
+valer sozinhas.
+
+Por padrão só a mesma mensagem (normalizada) reaproveita a resposta. Com
+CHAT_RESPONSE_CACHE_SIMILARITY < 1, a pergunta guardada mais parecida
+também vale quando a similaridade de cosseno passa do limite. Essa
+comparação usa o texto inteiro, com as stopwords (tokenize_all), e exige
+as mesmas negações: "eu já tomei o remédio" e "eu não tomei o remédio"
+nunca dividem a resposta.
+
+Não entram no cache:
+- mensagens curtas ("e depois?", "sim"), que dependem da conversa;
+- perguntas relativas ao relógio ("o que eu tenho agora?", "já passou a
+  hora?"), cuja resposta muda com o tempo e não com o contexto.
+
+O cache é por processo (como os índices em memória), limitado a
+CHAT_RESPONSE_CACHE_MAX_ENTRIES respostas com descarte LRU.
+"""
+import threading
+import time
+from collections import OrderedDict
+
+import numpy as np
+from django.conf import settings
+
+from .context import acontext_version, aget_rag_data, context_version, get_rag_data, rag_fingerprint
+from .embeddings import HashingEmbedder
+from .intents import normalize
+from .lexical_index import tokenize_all
+from .sessions import acurrent_session_id, current_session_id
+
+# Palavras que invertem o sentido da frase: precisam ser as mesmas
+_NEGATIONS = frozenset("nao nem nunca jamais nada nenhum nenhuma ninguem sem".split())
+
+# Perguntas com estas palavras dependem da hora atual
+_TIME_WORDS = frozenset("""
+agora hoje amanha ontem ja ainda depois antes logo cedo tarde daqui
+proximo proxima ultimo ultima hora horas horario minutos
+""".split())
+
+
+def _negations(text: str) -> frozenset:
+    return _NEGATIONS.intersection(text.split())
+
+
+class _Entry:
+    __slots__ = ("answer", "vector", "expires_at")
+
+    def __init__(self, answer, vector, expires_at) -> None:
+        self.answer = answer
+        self.vector = vector
+        self.expires_at = expires_at
+
+
+class ResponseCache:
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        # (user_id, contexto, mensagem) -> _Entry, do menos para o mais recente
+        self._entries: OrderedDict[tuple, _Entry] = OrderedDict()
+        # (user_id, contexto) -> mensagens guardadas (para a busca por similaridade)
+        self._buckets: dict[tuple, set[str]] = {}
+        self.hits = 0
+        self.similar_hits = 0
+        self.misses = 0
+        # Embedder próprio: o da busca semântica descarta as stopwords
+        self._embedder = HashingEmbedder(tokenizer=tokenize_all)
+
+    # -- configuração -----------------------------------------------------
+
+    @property
+    def ttl(self) -> float:
+        return getattr(settings, 'CHAT_RESPONSE_CACHE_TTL', 600)
+
+    @property
+    def max_entries(self) -> int:
+        return getattr(settings, 'CHAT_RESPONSE_CACHE_MAX_ENTRIES', 2048)
+
+    @property
+    def similarity(self) -> float | None:
+        """Limite da busca por perguntas parecidas (None: só a mesma mensagem)."""
+        threshold = getattr(settings, 'CHAT_RESPONSE_CACHE_SIMILARITY', None)
+        if not threshold or threshold >= 1.0:
+            return None
+        return threshold
+
+    def _cacheable(self, message: str) -> str | None:
+        if self.ttl <= 0:
+            return None
+        text = normalize(message)
+        words = text.split()
+        if len(words) < getattr(settings, 'CHAT_RESPONSE_CACHE_MIN_WORDS', 3):
+            return None
+        if _TIME_WORDS.intersection(words):
+            return None
+        return text
+
+    # -- chaves -----------------------------------------------------------
+
+    def key_for(self, user, message: str, now) -> tuple | None:
+        """Chave da mensagem no contexto atual, ou None se não deve ser cacheada."""
+        text = self._cacheable(message)
+        if text is None:
+            return None
+        context = (
+            rag_fingerprint(get_rag_data(user, now)),
+            context_version(user.pk),
+            current_session_id(user),
+        )
+        return (user.pk, context, text)
+
+    async def akey_for(self, user, message: str, now) -> tuple | None:
+        """Versão assíncrona de key_for."""
+        text = self._cacheable(message)
+        if text is None:
+            return None
+        context = (
+            rag_fingerprint(await aget_rag_data(user, now)),
+            await acontext_version(user.pk),
+            await acurrent_session_id(user),
+        )
+        return (user.pk, context, text)
+
+    # -- leitura / escrita ------------------------------------------------
+
+    def _remove_locked(self, key) -> None:
+        self._entries.pop(key, None)
+        bucket = self._buckets.get(key[:2])
+        if bucket is not None:
+            bucket.discard(key[2])
+            if not bucket:
+                del self._buckets[key[:2]]
+
+    def _similar_locked(self, key, vector, now_ts):
+        threshold = self.similarity
+        bucket = self._buckets.get(key[:2])
+        if not threshold or not bucket:
+            return None
+
+        negations = _negations(key[2])
+        candidates = []
+        for text in list(bucket):
+            entry = self._entries.get(key[:2] + (text,))
+            if entry is None or entry.expires_at <= now_ts:
+                self._remove_locked(key[:2] + (text,))
+                continue
+            if _negations(text) == negations:
+                candidates.append((text, entry))
+        if not candidates:
+            return None
+
+        scores = np.stack([entry.vector for _, entry in candidates]) @ vector
+        best = int(np.argmax(scores))
+        if scores[best] < threshold:
+            return None
+        return key[:2] + (candidates[best][0],)
+
+    def get(self, key) -> str | None:
+        """Resposta guardada para a chave (ou para uma pergunta parecida)."""
+        if key is None:
+            return None
+        now_ts = time.monotonic()
+        vector = None
+        if self.similarity:
+            # Vetoriza fora do lock
+            vector = self._embedder.embed([key[2]])[0]
+
+        with self._lock:
+            found = key
+            entry = self._entries.get(key)
+            if entry is not None and entry.expires_at <= now_ts:
+                self._remove_locked(key)
+                entry = None
+            if entry is None and vector is not None:
+                found = self._similar_locked(key, vector, now_ts)
+                entry = self._entries.get(found) if found is not None else None
+
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(found)
+            if found == key:
+                self.hits += 1
+            else:
+                self.similar_hits += 1
+            return entry.answer
+
+    def put(self, key, answer: str) -> None:
+        if key is None or not answer:
+            return
+        vector = self._embedder.embed([key[2]])[0] if self.similarity else None
+        with self._lock:
+            self._entries[key] = _Entry(answer, vector, time.monotonic() + self.ttl)
+            self._entries.move_to_end(key)
+            self._buckets.setdefault(key[:2], set()).add(key[2])
+            while len(self._entries) > self.max_entries:
+                oldest = next(iter(self._entries))
+                self._remove_locked(oldest)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._buckets.clear()
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            total = self.hits + self.similar_hits + self.misses
+            return {
+                "entradas": len(self._entries),
+                "acertos": self.hits,
+                "acertos_similares": self.similar_hits,
+                "falhas": self.misses,
+                "taxa_acerto": round((self.hits + self.similar_hits) / total, 3) if total else 0.0,
+            }
+
+
+response_cache = ResponseCache()
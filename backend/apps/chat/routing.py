@@ -0,0 +1,504 @@
+# chat/routing.py
+"""
+Roteamento das chamadas ao modelo entre vários endpoints, com hedging.
+
+CHAT_LLM_ENDPOINTS lista os endpoints em ordem de prioridade. Cada chamada
+vai para o primeiro endpoint saudável; se ele não responder (ou não
+mandar o primeiro token, no streaming) dentro do percentil
+CHAT_HEDGE_PERCENTILE das suas latências recentes, uma segunda chamada
+("hedge") é disparada no próximo endpoint e vale a que responder
+primeiro. A perdedora é cancelada (na versão async) ou descartada (na
+síncrona, em que a thread não pode ser interrompida no meio do request).
+Um erro passa direto para o próximo endpoint, sem esperar o atraso.
+
+Uma perdedora cancelada no meio não diz quanto o endpoint levaria: ela é
+contada como "censurada" e fica fora das janelas de percentis (que
+decidem o atraso do hedge e o rebaixamento). Usar o tempo até o
+cancelamento puxaria o p50/p90 para baixo e esconderia um endpoint lento.
+
+Endpoints cuja taxa de erro ou latência piora são rebaixados (vão para o
+fim da fila) por CHAT_ENDPOINT_DEMOTION_SECONDS e depois voltam à
+prioridade original.
+
+Latências (histograma + percentis), rebaixamentos e as últimas decisões
+de roteamento aparecem em GET /api/chat/status/ ("roteamento"). Os
+números ficam neste módulo, por nome de endpoint, então sobrevivem à
+recriação dos engines (ver registry.py).
+
+Com um único endpoint (o padrão), as chamadas são feitas direto na
+thread/corrotina de quem chamou, sem hedging.
+"""
+import asyncio
+import logging
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+from django.conf import settings
+from django.utils import timezone
+
+logger = logging.getLogger(__name__)
+
+# Tipos de latência medidos
+COMPLETA = 'completa'                 # resposta inteira (sem streaming)
+PRIMEIRO_TOKEN = 'primeiro_token'     # tempo até o primeiro token (streaming)
+
+# Limites (ms) das faixas do histograma de latência
+BUCKETS_MS = (50, 100, 250, 500, 1000, 2500, 5000, 10000, 30000)
+
+
+def _setting(name, default):
+    return getattr(settings, name, default)
+
+
+class Endpoint:
+    """Um provedor/réplica do modelo."""
+    __slots__ = ("name", "model", "client_kwargs")
+
+    def __init__(self, name: str, model: str, client_kwargs: dict) -> None:
+        self.name = name
+        # Passado em chat_completion(model=...)
+        self.model = model
+        # Argumentos do InferenceClient/AsyncInferenceClient
+        self.client_kwargs = client_kwargs
+
+    def __repr__(self) -> str:
+        return f"Endpoint({self.name!r})"
+
+
+# -- métricas por endpoint --------------------------------------------------
+
+def _percentile(values, p):
+    if not values:
+        return None
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, round(p / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+class _LatencySeries:
+    def __init__(self, window: int) -> None:
+        self.recent: deque[float] = deque(maxlen=window)
+        self.buckets = [0] * (len(BUCKETS_MS) + 1)
+        self.count = 0
+
+    def add(self, seconds: float) -> None:
+        self.recent.append(seconds)
+        self.count += 1
+        ms = seconds * 1000
+        for i, limit in enumerate(BUCKETS_MS):
+            if ms <= limit:
+                self.buckets[i] += 1
+                return
+        self.buckets[-1] += 1
+
+    def percentile(self, p: float) -> float | None:
+        return _percentile(list(self.recent), p)
+
+    def snapshot(self) -> dict:
+        def ms(value):
+            return None if value is None else round(value * 1000)
+
+        histogram = {f"<={limit}ms": n for limit, n in zip(BUCKETS_MS, self.buckets)}
+        histogram[f">{BUCKETS_MS[-1]}ms"] = self.buckets[-1]
+        return {
+            "amostras": self.count,
+            "p50_ms": ms(self.percentile(50)),
+            "p95_ms": ms(self.percentile(95)),
+            "p99_ms": ms(self.percentile(99)),
+            "histograma": histogram,
+        }
+
+
+class EndpointStats:
+    def __init__(self, window: int) -> None:
+        self.latency = {COMPLETA: _LatencySeries(window), PRIMEIRO_TOKEN: _LatencySeries(window)}
+        # True = sucesso, False = erro (janela usada no rebaixamento)
+        self.outcomes: deque[bool] = deque(maxlen=window)
+        self.requests = 0
+        self.errors = 0
+        self.wins = 0
+        self.hedges = 0
+        self.discarded = 0
+        # Perdedoras canceladas no meio (sem amostra de latência)
+        self.censored = 0
+        self.demoted_until: float | None = None
+        self.demotion_reason = ""
+
+    def error_rate(self) -> float:
+        if not self.outcomes:
+            return 0.0
+        return 1 - sum(self.outcomes) / len(self.outcomes)
+
+    def snapshot(self, now: float) -> dict:
+        demoted = self.demoted_until is not None and self.demoted_until > now
+        return {
+            "requisicoes": self.requests,
+            "erros": self.errors,
+            "taxa_erro_recente": round(self.error_rate(), 3),
+            "vitorias": self.wins,
+            "hedges": self.hedges,
+            "descartadas": self.discarded,
+            "censuradas": self.censored,
+            "rebaixado": demoted,
+            "rebaixado_por_segundos": round(self.demoted_until - now, 1) if demoted else 0,
+            "motivo_rebaixamento": self.demotion_reason if demoted else "",
+            "latencia": {kind: series.snapshot() for kind, series in self.latency.items()},
+        }
+
+
+_lock = threading.Lock()
+_stats: dict[str, EndpointStats] = {}
+_decisions: deque = deque(maxlen=50)
+_decision_counts = {"primario": 0, "hedge": 0, "failover": 0, "erro": 0}
+
+
+def _stats_for(name: str) -> EndpointStats:
+    stats = _stats.get(name)
+    if stats is None:
+        stats = _stats[name] = EndpointStats(_setting('CHAT_ROUTING_WINDOW', 200))
+    return stats
+
+
+def routing_snapshot() -> dict:
+    """Métricas por endpoint e últimas decisões de roteamento, para monitoramento."""
+    now = time.monotonic()
+    with _lock:
+        return {
+            "endpoints": {name: stats.snapshot(now) for name, stats in _stats.items()},
+            "decisoes": dict(_decision_counts),
+            "ultimas_decisoes": list(_decisions),
+        }
+
+
+def reset_routing_stats() -> None:
+    with _lock:
+        _stats.clear()
+        _decisions.clear()
+        for key in _decision_counts:
+            _decision_counts[key] = 0
+
+
+# -- execução ---------------------------------------------------------------
+
+_executor: ThreadPoolExecutor | None = None
+_executor_lock = threading.Lock()
+
+
+def _get_executor() -> ThreadPoolExecutor:
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                _executor = ThreadPoolExecutor(
+                    max_workers=_setting('CHAT_HEDGE_THREADS', 64),
+                    thread_name_prefix="llm-hedge",
+                )
+    return _executor
+
+
+class Router:
+    def __init__(self, endpoints: list[Endpoint]) -> None:
+        if not endpoints:
+            raise ValueError("Nenhum endpoint do modelo configurado.")
+        self.endpoints = endpoints
+        with _lock:
+            for endpoint in endpoints:
+                _stats_for(endpoint.name)
+
+    def ordered(self) -> list[Endpoint]:
+        """Endpoints saudáveis por prioridade, seguidos dos rebaixados."""
+        now = time.monotonic()
+        healthy, demoted = [], []
+        with _lock:
+            for endpoint in self.endpoints:
+                stats = _stats_for(endpoint.name)
+                if stats.demoted_until is not None and stats.demoted_until <= now:
+                    self._promote_locked(endpoint, stats)
+                (demoted if stats.demoted_until is not None else healthy).append(endpoint)
+        return healthy + demoted
+
+    def _hedging(self) -> bool:
+        return len(self.endpoints) > 1 and _setting('CHAT_HEDGE_ENABLED', True)
+
+    def hedge_delay(self, endpoint: Endpoint, kind: str) -> float:
+        """Espera antes do hedge: percentil das latências recentes do endpoint."""
+        with _lock:
+            series = _stats_for(endpoint.name).latency[kind]
+            enough = len(series.recent) >= _setting('CHAT_ROUTING_MIN_SAMPLES', 20)
+            value = series.percentile(_setting('CHAT_HEDGE_PERCENTILE', 90)) if enough else None
+        if value is None:
+            value = _setting('CHAT_HEDGE_DELAY', 2.0)
+        return max(value, _setting('CHAT_HEDGE_MIN_DELAY', 0.2))
+
+    # -- registro de resultados --------------------------------------------
+
+    def _record(self, endpoint, kind, elapsed, ok, hedge=False) -> None:
+        with _lock:
+            stats = _stats_for(endpoint.name)
+            stats.requests += 1
+            stats.hedges += int(hedge)
+            stats.outcomes.append(ok)
+            if ok:
+                stats.latency[kind].add(elapsed)
+            else:
+                stats.errors += 1
+            self._evaluate_locked(endpoint, stats, kind)
+
+    def _record_discarded(self, endpoint, kind, elapsed=None, hedge=False, censored=False) -> None:
+        # Perdeu a corrida. 'elapsed' é a latência real (a chamada terminou);
+        # None quando não diz nada sobre o endpoint. Canceladas no meio são
+        # 'censored': contam, mas não viram amostra de latência
+        with _lock:
+            stats = _stats_for(endpoint.name)
+            stats.requests += 1
+            stats.hedges += int(hedge)
+            stats.discarded += 1
+            stats.censored += int(censored)
+            if elapsed is not None:
+                stats.latency[kind].add(elapsed)
+                self._evaluate_locked(endpoint, stats, kind)
+
+    def _record_decision(self, motivo, tried, winner) -> None:
+        with _lock:
+            _decision_counts[motivo] += 1
+            if winner is not None:
+                _stats_for(winner.name).wins += 1
+            _decisions.append({
+                "quando": timezone.now().isoformat(timespec='seconds'),
+                "motivo": motivo,
+                "tentativas": [e.name for e in tried],
+                "vencedor": winner.name if winner is not None else None,
+            })
+
+    # -- rebaixamento --------------------------------------------------------
+
+    def _demote_locked(self, endpoint, stats, reason) -> None:
+        stats.demoted_until = time.monotonic() + _setting('CHAT_ENDPOINT_DEMOTION_SECONDS', 60)
+        stats.demotion_reason = reason
+        logger.warning("Endpoint do modelo '%s' rebaixado: %s", endpoint.name, reason)
+
+    def _promote_locked(self, endpoint, stats) -> None:
+        stats.demoted_until = None
+        stats.demotion_reason = ""
+        # Recomeça a avaliação do zero, sem as amostras ruins de antes
+        stats.outcomes.clear()
+        for series in stats.latency.values():
+            series.recent.clear()
+        logger.info("Endpoint do modelo '%s' voltou à prioridade normal.", endpoint.name)
+
+    def _evaluate_locked(self, endpoint, stats, kind) -> None:
+        if len(self.endpoints) < 2 or stats.demoted_until is not None:
+            return
+        min_samples = _setting('CHAT_ROUTING_MIN_SAMPLES', 20)
+
+        if len(stats.outcomes) >= min_samples:
+            rate = stats.error_rate()
+            if rate >= _setting('CHAT_ENDPOINT_MAX_ERROR_RATE', 0.5):
+                self._demote_locked(endpoint, stats, f"taxa de erro de {rate:.0%}")
+                return
+
+        series = stats.latency[kind]
+        if len(series.recent) < min_samples:
+            return
+        others = [
+            _stats_for(other.name).latency[kind]
+            for other in self.endpoints
+            if other is not endpoint and _stats_for(other.name).demoted_until is None
+        ]
+        others = [s.percentile(50) for s in others if len(s.recent) >= min_samples]
+        if not others:
+            return
+        mine, best = series.percentile(50), min(others)
+        if mine > best * _setting('CHAT_ENDPOINT_SLOW_FACTOR', 2.0):
+            self._demote_locked(
+                endpoint, stats,
+                f"p50 de {mine * 1000:.0f}ms contra {best * 1000:.0f}ms do melhor endpoint",
+            )
+
+    # -- chamada síncrona ----------------------------------------------------
+
+    def _run(self, endpoint, fn, kind, hedge=False):
+        start = time.perf_counter()
+        try:
+            result = fn(endpoint)
+        except Exception:
+            self._record(endpoint, kind, time.perf_counter() - start, ok=False, hedge=hedge)
+            raise
+        return result, time.perf_counter() - start
+
+    def call(self, fn, kind: str = COMPLETA, discard=None):
+        """
+        Executa fn(endpoint) no melhor endpoint, com hedging e failover.
+        'discard(resultado)' libera o resultado de uma chamada perdedora
+        (ex: fechar um stream já aberto).
+        """
+        order = self.ordered()
+        if not self._hedging():
+            endpoint = order[0]
+            try:
+                result, elapsed = self._run(endpoint, fn, kind)
+            except Exception:
+                self._record_decision("erro", [endpoint], None)
+                raise
+            self._record(endpoint, kind, elapsed, ok=True)
+            self._record_decision("primario", [endpoint], endpoint)
+            return result
+
+        executor = _get_executor()
+        delay = self.hedge_delay(order[0], kind)
+        max_hedges = _setting('CHAT_HEDGE_MAX_EXTRA', 1)
+        pending = {}
+        tried = []
+        hedges = 0
+        last_error = None
+        winner = None
+
+        def launch(hedge=False):
+            endpoint = order[len(tried)]
+            tried.append(endpoint)
+            future = executor.submit(self._run, endpoint, fn, kind, hedge)
+            pending[future] = (endpoint, hedge, time.perf_counter())
+
+        launch()
+        try:
+            while pending:
+                can_hedge = hedges < max_hedges and len(tried) < len(order)
+                done, _ = wait(pending, timeout=delay if can_hedge else None, return_when=FIRST_COMPLETED)
+                if not done:
+                    # O endpoint não respondeu a tempo: dispara o hedge
+                    hedges += 1
+                    launch(hedge=True)
+                    continue
+
+                for future in done:
+                    endpoint, hedge, _ = pending.pop(future)
+                    if winner is not None:
+                        self._discard_future(future, endpoint, kind, hedge, discard)
+                        continue
+                    try:
+                        result, elapsed = future.result()
+                    except Exception as e:
+                        last_error = e
+                        continue
+                    self._record(endpoint, kind, elapsed, ok=True, hedge=hedge)
+                    winner = (endpoint, result)
+
+                if winner is not None:
+                    endpoint, result = winner
+                    motivo = "primario" if endpoint is tried[0] else ("failover" if last_error else "hedge")
+                    self._record_decision(motivo, tried, endpoint)
+                    return result
+
+                if not pending and len(tried) < len(order):
+                    # Erro: passa direto para o próximo endpoint
+                    launch()
+
+            self._record_decision("erro", tried, None)
+            raise last_error
+        finally:
+            # Perdedoras ainda em andamento: o resultado é descartado quando chegar
+            for future, (endpoint, hedge, _) in pending.items():
+                future.add_done_callback(
+                    lambda f, e=endpoint, h=hedge: self._discard_future(f, e, kind, h, discard)
+                )
+
+    def _discard_future(self, future, endpoint, kind, hedge, discard) -> None:
+        try:
+            result, elapsed = future.result()
+        except Exception:
+            return  # o erro já foi registrado em _run
+        self._record_discarded(endpoint, kind, elapsed, hedge=hedge)
+        if discard is not None:
+            try:
+                discard(result)
+            except Exception:
+                logger.debug("Erro ao descartar resposta de '%s'", endpoint.name, exc_info=True)
+
+    # -- chamada assíncrona ------------------------------------------------
+
+    async def acall(self, fn, kind: str = COMPLETA, discard=None):
+        """
+        Versão assíncrona de call: fn(endpoint) devolve uma corrotina e as
+        chamadas perdedoras são canceladas. 'discard' também é uma corrotina.
+        """
+        order = self.ordered()
+        if not self._hedging():
+            endpoint = order[0]
+            start = time.perf_counter()
+            try:
+                result = await fn(endpoint)
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                self._record(endpoint, kind, time.perf_counter() - start, ok=False)
+                self._record_decision("erro", [endpoint], None)
+                raise
+            self._record(endpoint, kind, time.perf_counter() - start, ok=True)
+            self._record_decision("primario", [endpoint], endpoint)
+            return result
+
+        delay = self.hedge_delay(order[0], kind)
+        max_hedges = _setting('CHAT_HEDGE_MAX_EXTRA', 1)
+        pending = {}
+        tried = []
+        hedges = 0
+        last_error = None
+
+        def launch(hedge=False):
+            endpoint = order[len(tried)]
+            tried.append(endpoint)
+            task = asyncio.ensure_future(fn(endpoint))
+            pending[task] = (endpoint, hedge, time.perf_counter())
+
+        launch()
+        try:
+            while pending:
+                can_hedge = hedges < max_hedges and len(tried) < len(order)
+                done, _ = await asyncio.wait(
+                    pending, timeout=delay if can_hedge else None, return_when=asyncio.FIRST_COMPLETED
+                )
+                if not done:
+                    hedges += 1
+                    launch(hedge=True)
+                    continue
+
+                winner = None
+                for task in done:
+                    endpoint, hedge, started = pending.pop(task)
+                    elapsed = time.perf_counter() - started
+                    if task.exception() is not None:
+                        self._record(endpoint, kind, elapsed, ok=False, hedge=hedge)
+                        last_error = task.exception()
+                    elif winner is None:
+                        self._record(endpoint, kind, elapsed, ok=True, hedge=hedge)
+                        winner = (endpoint, task.result())
+                    else:
+                        # Empate: as duas terminaram juntas
+                        self._record_discarded(endpoint, kind, elapsed, hedge=hedge)
+                        if discard is not None:
+                            await discard(task.result())
+
+                if winner is not None:
+                    endpoint, result = winner
+                    motivo = "primario" if endpoint is tried[0] else ("failover" if last_error else "hedge")
+                    self._record_decision(motivo, tried, endpoint)
+                    return result
+
+                if not pending and len(tried) < len(order):
+                    launch()
+
+            self._record_decision("erro", tried, None)
+            raise last_error
+        finally:
+            # Cancela as perdedoras (e também todas, se quem chamou foi cancelado)
+            for task in pending:
+                task.cancel()
+            if pending:
+                await asyncio.gather(*pending, return_exceptions=True)
+            for task, (endpoint, hedge, _) in pending.items():
+                # Cancelada no meio: a latência real é desconhecida (censurada)
+                self._record_discarded(endpoint, kind, hedge=hedge, censored=task.cancelled())
+                if discard is not None and not task.cancelled() and task.exception() is None:
+                    await discard(task.result())
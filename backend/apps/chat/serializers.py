@@ -1,4 +1,44 @@
 from rest_framework import serializers
 
+from .models import ArquivoChat, BriefingDiario, SessaoChat, TarefaChat, UsoTokens
+
 class ChatInputSerializer(serializers.Serializer):
-    message = serializers.CharField(trim_whitespace=False)
\ No newline at end of file
+    message = serializers.CharField(trim_whitespace=False)
+
+
+class TarefaChatSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = TarefaChat
+        fields = ['id', 'status', 'mensagem', 'resposta', 'erro', 'criado_em', 'concluido_em']
+
+
+class SessaoChatSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = SessaoChat
+        fields = ['id', 'iniciada_em']
+
+
+class BriefingDiarioSerializer(serializers.ModelSerializer):
+    # False se os lembretes/contatos mudaram depois da geração
+    atualizado = serializers.SerializerMethodField()
+
+    class Meta:
+        model = BriefingDiario
+        fields = ['data', 'conteudo', 'gerado_em', 'atualizado']
+
+    def get_atualizado(self, obj) -> bool:
+        return obj.contexto_hash == self.context.get('contexto_hash')
+
+
+class UsoTokensSerializer(serializers.ModelSerializer):
+    tokens_total = serializers.IntegerField(read_only=True)
+
+    class Meta:
+        model = UsoTokens
+        fields = ['data', 'tokens_prompt', 'tokens_resposta', 'tokens_total', 'chamadas', 'chamadas_estimadas']
+
+
+class ArquivoChatSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = ArquivoChat
+        fields = ['id', 'inicio', 'fim', 'mensagens']
@@ -0,0 +1,51 @@
+# chat/sessions.py
+"""
+Sessões do chat ("nova conversa").
+
+A sessão atual de um usuário é a SessaoChat mais recente dele; sem
+nenhuma, vale a conversa inicial (mensagens com sessao nula). Começar
+uma conversa nova é um único INSERT, não importa o tamanho do
+histórico: nada é apagado nem lido. O prompt (history.py) e o
+histórico da tela só enxergam as mensagens da sessão atual; as
+anteriores continuam valendo como memória de longo prazo (resumo e
+busca semântica).
+
+O id da sessão atual é lido do banco a cada uso (uma consulta pelo
+índice do usuário, sem cache por processo): depois de uma "nova
+conversa", todos os workers usam a sessão nova já no turno seguinte.
+"""
+from .models import SessaoChat
+
+# Conversa inicial (antes da primeira "nova conversa")
+INITIAL_SESSION = 0
+
+
+def _latest_qs(user):
+    return SessaoChat.objects.filter(usuario=user).order_by('-id').values_list('id', flat=True)
+
+
+def current_session_id(user) -> int:
+    """Id da sessão atual do usuário (INITIAL_SESSION se nunca reiniciou)."""
+    return _latest_qs(user).first() or INITIAL_SESSION
+
+
+async def acurrent_session_id(user) -> int:
+    """Versão assíncrona de current_session_id."""
+    return await _latest_qs(user).afirst() or INITIAL_SESSION
+
+
+def start_session(user) -> SessaoChat:
+    """Começa uma conversa nova: as próximas mensagens vão para ela."""
+    return SessaoChat.objects.create(usuario=user)
+
+
+def session_filter(session_id: int) -> dict:
+    """Filtro do HistoricoChat para as mensagens de uma sessão."""
+    if session_id == INITIAL_SESSION:
+        return {"sessao__isnull": True}
+    return {"sessao_id": session_id}
+
+
+def session_value(session_id: int) -> int | None:
+    """Valor de HistoricoChat.sessao_id para mensagens novas da sessão."""
+    return None if session_id == INITIAL_SESSION else session_id
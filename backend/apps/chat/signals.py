@@ -0,0 +1,83 @@
+# chat/signals.py
+from django.contrib.auth.models import User
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from apps.contatos.models import Contato
+from apps.core.models import PerfilPaciente
+from apps.core.signals import bulk_saved
+from apps.diario.models import EntradaDiario
+from apps.lembretes.models import Lembrete
+
+from .context import invalidate_rag_context
+from .lexical_index import lexical_indexes
+from .vector_index import SOURCE_DIARIO, vector_index
+
+
+def _removendo_usuario(origin) -> bool:
+    """
+    Exclusão em cascata a partir do próprio usuário: não há contexto a
+    invalidar (e incrementar a versão recriaria a linha de VersaoContexto
+    de um usuário que está sendo apagado).
+    """
+    return getattr(origin, 'model', type(origin)) is User
+
+
+@receiver([post_save, post_delete], sender=Contato)
+@receiver([post_save, post_delete], sender=PerfilPaciente)
+def invalidar_contexto_rag(sender, instance, origin=None, **kwargs):
+    """
+    Qualquer mudança em contatos ou no perfil do paciente descarta o
+    contexto RAG em cache do usuário dono do objeto.
+    """
+    if not _removendo_usuario(origin):
+        invalidate_rag_context(instance.usuario_id)
+
+
+@receiver(bulk_saved, sender=Contato)
+def invalidar_contexto_rag_lote(sender, usuario_id, instances, **kwargs):
+    """Mesma invalidação, para criações/edições em lote (sem post_save)."""
+    invalidate_rag_context(usuario_id)
+
+
+# Diário e lembretes também invalidam o contexto (a versão nova vale para
+# os índices BM25 de todos os processos) e atualizam os índices deste.
+
+@receiver(post_save, sender=EntradaDiario)
+def indexar_entrada_diario(sender, instance, created, **kwargs):
+    lexical_indexes.update_entrada(instance, invalidate_rag_context(instance.usuario_id))
+
+    # Edição: a linha antiga do índice vetorial é descartada
+    if not created:
+        vector_index.remove(instance.usuario_id, SOURCE_DIARIO, [instance.id])
+    vector_index.add(instance.usuario_id, SOURCE_DIARIO, [(instance.id, instance.texto)])
+
+
+@receiver(post_delete, sender=EntradaDiario)
+def remover_entrada_diario(sender, instance, origin=None, **kwargs):
+    if _removendo_usuario(origin):
+        # Os índices do usuário saem inteiros (ver remover_indice_vetorial)
+        return
+    lexical_indexes.remove_entrada(instance, invalidate_rag_context(instance.usuario_id))
+    vector_index.remove(instance.usuario_id, SOURCE_DIARIO, [instance.id])
+
+
+@receiver(post_save, sender=Lembrete)
+def indexar_lembrete(sender, instance, **kwargs):
+    lexical_indexes.update_lembrete(instance, invalidate_rag_context(instance.usuario_id))
+
+
+@receiver(bulk_saved, sender=Lembrete)
+def indexar_lembretes_lote(sender, usuario_id, instances, **kwargs):
+    lexical_indexes.update_lembretes(usuario_id, instances, invalidate_rag_context(usuario_id))
+
+
+@receiver(post_delete, sender=Lembrete)
+def remover_lembrete(sender, instance, origin=None, **kwargs):
+    if not _removendo_usuario(origin):
+        lexical_indexes.remove_lembrete(instance, invalidate_rag_context(instance.usuario_id))
+
+
+@receiver(post_delete, sender=User)
+def remover_indice_vetorial(sender, instance, **kwargs):
+    vector_index.drop(instance.pk)
@@ -0,0 +1,250 @@
+# chat/singleflight.py
+"""
+Coalescência ("single-flight") dos turnos do chat por usuário.
+
+- Turnos idênticos do mesmo usuário em andamento ao mesmo tempo (toque
+  duplo em "enviar", retry do frontend com Wi-Fi instável) compartilham
+  uma única chamada ao modelo e um único registro no histórico: quem
+  chega depois só espera a resposta do primeiro.
+- Uma repetição que chega logo depois do fim do turno (até
+  CHAT_DEDUP_WINDOW segundos, e só se nada mais foi dito nesse meio-tempo)
+  recebe a mesma resposta.
+- Turnos diferentes do mesmo usuário são serializados: o segundo só monta
+  o prompt depois que o primeiro foi salvo, então o histórico nunca fica
+  intercalado.
+
+Vale dentro de um processo (threads das views síncronas, ou o event loop
+da view async). Com vários processos, a fila do modo assíncrono
+(chat/jobs.py) é quem garante a ordem por usuário.
+"""
+import asyncio
+import threading
+import time
+import weakref
+from contextlib import asynccontextmanager, contextmanager, nullcontext
+
+from django.conf import settings
+
+
+def flight_key(user_id, message: str) -> tuple:
+    # Espaços extras não fazem duas mensagens diferentes
+    return (user_id, " ".join(message.split()))
+
+
+class _Flight:
+    __slots__ = ("done", "result", "error", "finished_at")
+
+    def __init__(self, done) -> None:
+        self.done = done
+        self.result = None
+        self.error: BaseException | None = None
+        self.finished_at: float | None = None
+
+
+class _FlightTable:
+    """
+    Parte comum às versões com threads e com asyncio, que diferem no tipo
+    de evento usado para acordar quem espera (event_factory).
+    """
+
+    def __init__(self, event_factory, dedup_window: float | None = None) -> None:
+        self._event_factory = event_factory
+        self._dedup_window = dedup_window
+        self._flights: dict[tuple, _Flight] = {}
+        self.leaders = 0
+        self.shared = 0
+
+    @property
+    def dedup_window(self) -> float:
+        if self._dedup_window is not None:
+            return self._dedup_window
+        return getattr(settings, 'CHAT_DEDUP_WINDOW', 3.0)
+
+    def _begin_locked(self, user_id, message) -> tuple[_Flight, bool]:
+        key = flight_key(user_id, message)
+        now = time.monotonic()
+        window = self.dedup_window
+
+        # Turnos já terminados só valem enquanto forem o último do usuário
+        # e estiverem dentro da janela
+        for other_key, other in list(self._flights.items()):
+            if other.finished_at is None:
+                continue
+            expired = now - other.finished_at > window
+            superseded = other_key[0] == user_id and other_key != key
+            if expired or superseded:
+                del self._flights[other_key]
+
+        flight = self._flights.get(key)
+        if flight is not None:
+            self.shared += 1
+            return flight, False
+
+        flight = self._flights[key] = _Flight(self._event_factory())
+        self.leaders += 1
+        return flight, True
+
+    def _finish_locked(self, user_id, message, flight, result=None, error=None) -> None:
+        flight.result = result
+        flight.error = error
+        flight.finished_at = time.monotonic()
+
+        key = flight_key(user_id, message)
+        # Turnos do usuário que terminaram antes deste deixam de ser o último
+        for other_key, other in list(self._flights.items()):
+            if other_key[0] == user_id and other_key != key and other.finished_at is not None:
+                del self._flights[other_key]
+        if error is not None:
+            # Falhas não ficam guardadas: a próxima tentativa chama o modelo
+            self._flights.pop(key, None)
+
+    def snapshot(self) -> dict:
+        return {
+            "turnos_executados": self.leaders,
+            "turnos_compartilhados": self.shared,
+            "em_andamento": sum(1 for f in list(self._flights.values()) if f.finished_at is None),
+        }
+
+
+class SingleFlight(_FlightTable):
+    """Versão para as views síncronas (threads)."""
+
+    def __init__(self, dedup_window: float | None = None) -> None:
+        super().__init__(threading.Event, dedup_window)
+        self._lock = threading.Lock()
+        self._user_locks: dict = {}
+
+    def begin(self, user_id, message) -> tuple[_Flight, bool]:
+        """Registra o turno; devolve (flight, True) se este é o primeiro."""
+        with self._lock:
+            return self._begin_locked(user_id, message)
+
+    def finish(self, user_id, message, flight, result=None, error=None) -> None:
+        with self._lock:
+            self._finish_locked(user_id, message, flight, result, error)
+        flight.done.set()
+
+    def wait(self, flight):
+        """Espera o turno original terminar e devolve a mesma resposta (ou erro)."""
+        flight.done.wait()
+        if flight.error is not None:
+            raise flight.error
+        return flight.result
+
+    @contextmanager
+    def user_turn(self, user_id):
+        """Um turno por vez para cada usuário."""
+        with self._lock:
+            entry = self._user_locks.setdefault(user_id, [threading.Lock(), 0])
+            entry[1] += 1
+        try:
+            with entry[0]:
+                yield
+        finally:
+            with self._lock:
+                entry[1] -= 1
+                if entry[1] == 0:
+                    self._user_locks.pop(user_id, None)
+
+    def do(self, user_id, message, fn, slot=None):
+        """
+        Executa fn() (chamar o modelo e salvar o turno) uma única vez para
+        turnos idênticos simultâneos. Devolve (resultado, compartilhado).
+
+        'slot' (ex: chat_admission.slot()) é obtido antes da vez do usuário:
+        um turno recusado por falta de vaga não chega a segurar a fila dos
+        outros turnos dele.
+        """
+        flight, leader = self.begin(user_id, message)
+        if not leader:
+            return self.wait(flight), True
+
+        try:
+            with slot or nullcontext(), self.user_turn(user_id):
+                result = fn()
+        except BaseException as e:
+            self.finish(user_id, message, flight, error=e)
+            raise
+        self.finish(user_id, message, flight, result=result)
+        return result, False
+
+
+class AsyncSingleFlight(_FlightTable):
+    """
+    Versão para a view async, uma por event loop (ver get_async_flights).
+    Sob ASGI todos os turnos do processo passam pelo mesmo loop, então não
+    há disputa entre threads aqui.
+    """
+
+    def __init__(self, dedup_window: float | None = None) -> None:
+        super().__init__(asyncio.Event, dedup_window)
+        self._user_locks: dict = {}
+
+    def begin(self, user_id, message) -> tuple[_Flight, bool]:
+        return self._begin_locked(user_id, message)
+
+    def finish(self, user_id, message, flight, result=None, error=None) -> None:
+        self._finish_locked(user_id, message, flight, result, error)
+        flight.done.set()
+
+    async def wait(self, flight):
+        await flight.done.wait()
+        if flight.error is not None:
+            raise flight.error
+        return flight.result
+
+    @asynccontextmanager
+    async def user_turn(self, user_id):
+        entry = self._user_locks.setdefault(user_id, [asyncio.Lock(), 0])
+        entry[1] += 1
+        try:
+            async with entry[0]:
+                yield
+        finally:
+            entry[1] -= 1
+            if entry[1] == 0:
+                self._user_locks.pop(user_id, None)
+
+    async def do(self, user_id, message, fn, slot=None):
+        """Como SingleFlight.do, com fn() devolvendo uma corrotina (e 'slot' async)."""
+        flight, leader = self.begin(user_id, message)
+        if not leader:
+            return await self.wait(flight), True
+
+        try:
+            async with slot or nullcontext(), self.user_turn(user_id):
+                result = await fn()
+        except BaseException as e:
+            self.finish(user_id, message, flight, error=e)
+            raise
+        self.finish(user_id, message, flight, result=result)
+        return result, False
+
+
+chat_flights = SingleFlight()
+
+_async_flights: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, AsyncSingleFlight]" = (
+    weakref.WeakKeyDictionary()
+)
+
+
+def get_async_flights() -> AsyncSingleFlight:
+    """
+    Tabela do event loop atual. Os primitivos do asyncio ficam presos ao
+    loop em que foram usados; fora do ASGI (um loop por requisição) cada
+    requisição tem a sua, e não há coalescência.
+    """
+    loop = asyncio.get_running_loop()
+    flights = _async_flights.get(loop)
+    if flights is None:
+        flights = _async_flights[loop] = AsyncSingleFlight()
+    return flights
+
+
+def flights_snapshot() -> dict:
+    """Números somados das views síncronas e async, para monitoramento."""
+    total = chat_flights.snapshot()
+    for flights in list(_async_flights.values()):
+        for name, value in flights.snapshot().items():
+            total[name] += value
+    return total
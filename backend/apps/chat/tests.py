@@ -1,3 +1,1037 @@
-from django.test import TestCase
+import asyncio
+import base64
+import json
+import threading
+import time
+from datetime import timedelta
+from pathlib import Path
+from types import SimpleNamespace
+from unittest import mock, skipUnless
 
-# Create your tests here.
+import httpx
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from apps.contatos.models import Contato
+from apps.diario.models import EntradaDiario
+from apps.lembretes.models import Lembrete
+
+from . import briefing, jobs, views
+from .briefing import _first_turn_qs
+from .conversation import persist_turn
+from .engine import ChatEngine
+from .archive import FIELDS, archive_cutoff, archive_user, read_segment
+from .admission import BUSY_REPLY, AdmissionGate, ChatSaturatedError, chat_admission
+from .context import get_rag_data, rag_querysets
+from .history import history_page
+from .intents import answer_intent, classify
+from .lexical_index import LexicalIndexRegistry, lexical_indexes
+from .models import ArquivoChat, HistoricoChat, ResumoConversa, SessaoChat, TarefaChat, VersaoContexto
+from .resilience import CircuitBreaker, CircuitOpenError, call_with_retries, llm_breaker
+from .response_cache import response_cache
+from .sessions import INITIAL_SESSION, current_session_id
+from .vector_index import semantic_memories, vector_index
+from .singleflight import SingleFlight, chat_flights
+from .tokens import TokenUsage
+from .usage import ESGOTADO, NORMAL, REDUZIDO, record_usage, token_plan
+from .write_buffer import history_buffer
+from .routing import COMPLETA, Endpoint, Router, reset_routing_stats, routing_snapshot
+
+
+@skipUnless(connection.vendor == 'sqlite', "EXPLAIN QUERY PLAN do SQLite")
+class PlanoDeConsultaTests(TestCase):
+    """
+    As consultas de todo turno do chat e das listagens usam os índices
+    compostos (e não varrem a tabela nem ordenam em memória).
+    """
+
+    def setUp(self):
+        cache.clear()
+        self.usuario = User.objects.create_user("paciente", password="senha")
+        self.now = timezone.now()
+
+    def plano(self, consulta) -> str:
+        if isinstance(consulta, str):
+            with connection.cursor() as cursor:
+                cursor.execute(f"EXPLAIN QUERY PLAN {consulta}")
+                return "\n".join(str(linha[-1]) for linha in cursor.fetchall())
+        return consulta.explain()
+
+    def assertUsaIndice(self, consulta, tabela, indice):
+        plano = self.plano(consulta)
+        self.assertRegex(plano, rf"SEARCH {tabela} USING (COVERING )?INDEX {indice}\b", plano)
+        self.assertNotRegex(plano, rf"SCAN {tabela}\b", plano)
+        self.assertNotIn("TEMP B-TREE", plano)
+
+    def test_lembretes_de_hoje(self):
+        lembretes, _, _ = rag_querysets(self.usuario, self.now)
+        self.assertNotIn("django_datetime_cast_date", str(lembretes.query))
+        self.assertUsaIndice(lembretes, "lembretes_lembrete", "lembrete_usuario_pendente")
+
+    def test_contatos_de_emergencia(self):
+        _, contatos, _ = rag_querysets(self.usuario, self.now)
+        self.assertUsaIndice(contatos, "contatos_contato", "contato_usuario_emergencia")
+
+    def test_listagem_do_diario(self):
+        EntradaDiario.objects.create(usuario=self.usuario, texto="Passeio no parque")
+        client = APIClient()
+        client.force_authenticate(self.usuario)
+        with CaptureQueriesContext(connection) as consultas:
+            client.get("/api/diario/")
+        self.assertEqual(len(consultas), 1)
+        self.assertUsaIndice(consultas[0]["sql"], "diario_entradadiario", "diario_usuario_data")
+
+    def test_historico_do_chat(self):
+        HistoricoChat.objects.create(usuario=self.usuario, role="user", content="Bom dia")
+        with CaptureQueriesContext(connection) as consultas:
+            history_page(self.usuario, limit=20)
+        self.assertUsaIndice(consultas[-1]["sql"], "chat_historicochat", "historico_usuario_sessao")
+
+    def test_primeiro_turno_do_dia(self):
+        self.assertUsaIndice(
+            _first_turn_qs(self.usuario, self.now), "chat_historicochat", "historico_usuario_timestamp"
+        )
+
+
+OUTRO_PROCESSO = {
+    'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'guardiao'},
+    'outro_processo': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'outro'},
+}
+
+
+@override_settings(CACHES=OUTRO_PROCESSO)
+class CacheDoContextoTests(TestCase):
+    """O contexto RAG em cache é invalidado em todos os processos (chat/context.py)."""
+
+    def setUp(self):
+        self.usuario = User.objects.create_user("paciente", password="senha")
+        self.now = timezone.now()
+
+    def test_leitura_em_cache_consulta_so_a_versao(self):
+        get_rag_data(self.usuario, self.now)
+        with self.assertNumQueries(1):
+            get_rag_data(self.usuario, self.now)
+        # Ler nunca grava: a linha da versão só nasce na primeira mudança
+        self.assertFalse(VersaoContexto.objects.filter(usuario=self.usuario).exists())
+
+    def test_excluir_o_usuario_nao_recria_a_versao(self):
+        Lembrete.objects.create(usuario=self.usuario, titulo="Losartana", data_hora=self.now)
+        EntradaDiario.objects.create(usuario=self.usuario, texto="Fui ao parque")
+        self.usuario.delete()
+        self.assertFalse(VersaoContexto.objects.exists())
+        connection.check_constraints()
+
+    def test_mudanca_vale_para_o_cache_de_outro_processo(self):
+        with override_settings(CHAT_CONTEXT_CACHE_ALIAS='outro_processo'):
+            self.assertNotIn("Losartana", get_rag_data(self.usuario, self.now)["corpo"])
+
+        # A mudança chega por este processo; o cache do outro não é tocado
+        Lembrete.objects.create(usuario=self.usuario, titulo="Losartana", data_hora=self.now)
+
+        with override_settings(CHAT_CONTEXT_CACHE_ALIAS='outro_processo'):
+            self.assertIn("Losartana", get_rag_data(self.usuario, self.now)["corpo"])
+
+
+class IndiceLexicoTests(TestCase):
+    """Os índices BM25 em memória acompanham o banco (chat/lexical_index.py)."""
+
+    def setUp(self):
+        lexical_indexes.clear()
+        self.addCleanup(lexical_indexes.clear)
+        self.usuario = User.objects.create_user("paciente", password="senha")
+        # Registro de um segundo processo: os signals daqui nunca o atualizam
+        self.outro_processo = LexicalIndexRegistry()
+
+    def buscar(self, registro, consulta):
+        return [memoria for _, memoria in registro.get(self.usuario.pk).search(consulta)]
+
+    def test_escrita_de_outro_processo_refaz_o_indice(self):
+        EntradaDiario.objects.create(usuario=self.usuario, texto="Fui ao parque com a Maria")
+        self.assertEqual(len(self.buscar(self.outro_processo, "parque")), 1)
+
+        entrada = EntradaDiario.objects.create(usuario=self.usuario, texto="Almocei com o Joaquim")
+        Lembrete.objects.create(usuario=self.usuario, titulo="Consulta no cardiologista", data_hora=timezone.now())
+        self.assertEqual(len(self.buscar(self.outro_processo, "joaquim")), 1)
+        self.assertEqual(len(self.buscar(self.outro_processo, "cardiologista")), 1)
+
+        entrada.delete()
+        self.assertEqual(self.buscar(self.outro_processo, "joaquim"), [])
+
+    def test_signal_atualiza_o_indice_deste_processo_sem_reconstruir(self):
+        lexical_indexes.get(self.usuario.pk)
+        EntradaDiario.objects.create(usuario=self.usuario, texto="Fui ao parque com a Maria")
+
+        with mock.patch.object(lexical_indexes, "_build", side_effect=AssertionError("reconstruiu")):
+            self.assertEqual(len(self.buscar(lexical_indexes, "parque")), 1)
+
+    def test_escrita_durante_a_construcao_nao_se_perde(self):
+        construir = self.outro_processo._build
+
+        def construir_com_escrita_no_meio(user_id):
+            index = construir(user_id)
+            EntradaDiario.objects.create(usuario=self.usuario, texto="Almocei com o Joaquim")
+            return index
+
+        with mock.patch.object(self.outro_processo, "_build", side_effect=construir_com_escrita_no_meio):
+            self.assertEqual(self.buscar(self.outro_processo, "joaquim"), [])
+        self.assertEqual(len(self.buscar(self.outro_processo, "joaquim")), 1)
+
+
+class IndiceVetorialTests(TestCase):
+    """Os testes nunca tocam os índices vetoriais de verdade (chat/vector_index.py)."""
+
+    def arquivos(self, pasta):
+        return {p: p.stat().st_mtime_ns for p in pasta.rglob("*")} if pasta.exists() else {}
+
+    def test_entrada_do_diario_nao_toca_a_pasta_real(self):
+        pasta_real = Path(settings.BASE_DIR) / "indices"
+        pasta_teste = Path(settings.CHAT_VECTOR_INDEX_DIR)
+        self.assertNotEqual(pasta_teste, pasta_real)
+        antes = self.arquivos(pasta_real)
+
+        usuario = User.objects.create_user("paciente", password="senha")
+        # Os ids dos usuários se repetem entre os testes; a pasta não
+        vector_index.drop(usuario.pk)
+        EntradaDiario.objects.create(usuario=usuario, texto="Fui ao parque com a Maria")
+        self.assertEqual(len(semantic_memories(usuario, "parque com a Maria")), 1)
+        EntradaDiario.objects.create(usuario=usuario, texto="Almocei com o Joaquim")
+        pasta_usuario = pasta_teste / str(usuario.pk)
+        self.assertTrue((pasta_usuario / "meta.json").exists())
+        usuario.delete()
+
+        self.assertFalse(pasta_usuario.exists())
+        self.assertEqual(self.arquivos(pasta_real), antes)
+
+
+class ModeloFalso:
+    system_prompt = "Você é um assistente."
+
+    def send_message(self, message, history, max_tokens=None, usage=None):
+        return f"Resposta para: {message}"
+
+    def daily_briefing(self, context):
+        return f"Bom dia!\n{context}"
+
+
+@mock.patch.object(jobs, 'get_engine', return_value=ModeloFalso())
+class FilaDeTarefasTests(TestCase):
+    """Modo assíncrono do chat: fila de tarefas no banco (chat/jobs.py)."""
+
+    def setUp(self):
+        cache.clear()
+        self.ana = User.objects.create_user("ana", password="senha")
+        self.bia = User.objects.create_user("bia", password="senha")
+
+    def test_pega_e_conclui_a_tarefa(self, _):
+        tarefa = jobs.enqueue(self.ana, "Que remédio eu tomo à noite?")
+        self.assertEqual(jobs.enqueue(self.ana, "Que remédio eu tomo à noite?"), tarefa)
+
+        pega = jobs.claim_next("worker-1")
+        self.assertEqual(pega.pk, tarefa.pk)
+        self.assertEqual(pega.status, TarefaChat.PROCESSANDO)
+        self.assertIsNone(jobs.claim_next("worker-2"))
+
+        jobs.process(pega)
+        tarefa.refresh_from_db()
+        self.assertEqual(tarefa.status, TarefaChat.CONCLUIDA)
+        self.assertEqual(tarefa.resposta, "Resposta para: Que remédio eu tomo à noite?")
+        self.assertEqual(HistoricoChat.objects.filter(usuario=self.ana).count(), 2)
+
+    def test_tarefas_de_um_usuario_saem_em_ordem(self, _):
+        primeira = jobs.enqueue(self.ana, "Primeira pergunta")
+        segunda = jobs.enqueue(self.ana, "Segunda pergunta")
+        da_bia = jobs.enqueue(self.bia, "Pergunta da Bia")
+
+        # Enquanto a primeira da Ana está em andamento, só a da Bia pode ser pega
+        self.assertEqual(jobs.claim_next("w").pk, primeira.pk)
+        self.assertEqual(jobs.claim_next("w").pk, da_bia.pk)
+        self.assertIsNone(jobs.claim_next("w"))
+
+        jobs.process(TarefaChat.objects.get(pk=primeira.pk))
+        self.assertEqual(jobs.claim_next("w").pk, segunda.pk)
+
+    @override_settings(CHAT_JOB_SYNC_MAX_WAIT=0)
+    def test_consulta_sincrona_responde_na_hora(self, _):
+        tarefa = jobs.enqueue(self.ana, "Oi, tudo bem?")
+        client = APIClient()
+        client.force_authenticate(self.ana)
+
+        resposta = client.get(f"/api/chat/tarefas/{tarefa.pk}/?esperar=25")
+        self.assertEqual(resposta.json()["status"], TarefaChat.PENDENTE)
+        self.assertEqual(resposta["Retry-After"], "1")
+
+        client.force_authenticate(self.bia)
+        self.assertEqual(client.get(f"/api/chat/tarefas/{tarefa.pk}/").status_code, 404)
+
+
+@mock.patch.object(views, 'get_engine', return_value=ModeloFalso())
+class NovaConversaTests(TestCase):
+    """"Nova conversa" vale no turno seguinte, em qualquer processo (chat/sessions.py)."""
+
+    def setUp(self):
+        cache.clear()
+        self.usuario = User.objects.create_user("paciente", password="senha")
+        self.client = APIClient()
+        self.client.force_authenticate(self.usuario)
+
+    def conversa(self):
+        return [m["content"] for m in self.client.get("/api/chat/").json()["mensagens"]]
+
+    def test_turno_e_historico_usam_a_sessao_nova(self, _):
+        self.client.post("/api/chat/", {"message": "Meu neto se chama Pedro"}, format="json")
+        self.assertEqual(current_session_id(self.usuario), INITIAL_SESSION)
+
+        sessao = self.client.post("/api/chat/sessao/").json()
+        self.assertEqual(self.conversa(), [])
+
+        self.client.post("/api/chat/", {"message": "Qual é o nome do meu neto?"}, format="json")
+        self.assertEqual(
+            self.conversa(), ["Qual é o nome do meu neto?", "Resposta para: Qual é o nome do meu neto?"]
+        )
+        self.assertEqual(
+            set(HistoricoChat.objects.filter(usuario=self.usuario).values_list("sessao_id", flat=True)),
+            {None, sessao["id"]},
+        )
+
+    def test_sessao_criada_por_outro_processo_vale_na_hora(self, _):
+        self.client.post("/api/chat/", {"message": "Meu neto se chama Pedro"}, format="json")
+        # Outro worker atendeu a "nova conversa": nada mudou neste processo
+        sessao = SessaoChat.objects.create(usuario=self.usuario)
+
+        self.assertEqual(self.conversa(), [])
+        self.client.post("/api/chat/", {"message": "Qual é o nome do meu neto?"}, format="json")
+        self.assertEqual(
+            list(HistoricoChat.objects.filter(sessao=sessao).values_list("role", flat=True)),
+            ["user", "assistant"],
+        )
+
+
+@mock.patch.object(views, 'get_engine', return_value=ModeloFalso())
+class TurnosDoUsuarioTests(TestCase):
+    """Turnos simultâneos do mesmo usuário (chat/singleflight.py)."""
+
+    def setUp(self):
+        cache.clear()
+        self.usuario = User.objects.create_user("paciente", password="senha")
+        self.client = APIClient()
+        self.client.force_authenticate(self.usuario)
+
+    @override_settings(CHAT_MAX_CONCURRENT_LLM_CALLS=1, CHAT_ADMISSION_QUEUE_SIZE=0)
+    def test_turno_sem_vaga_nao_pega_a_vez_do_usuario(self, _):
+        chat_admission.acquire()
+        self.addCleanup(chat_admission.release)
+
+        with mock.patch.object(chat_flights, "user_turn", wraps=chat_flights.user_turn) as vez:
+            resposta = self.client.post("/api/chat/", {"message": "Meu neto se chama Pedro"}, format="json")
+
+        self.assertEqual(resposta.status_code, 503)
+        vez.assert_not_called()
+
+    def em_paralelo(self, *alvos):
+        threads = [threading.Thread(target=alvo) for alvo in alvos]
+        for thread in threads:
+            thread.start()
+        return threads
+
+    def esperar(self, condicao):
+        limite = time.monotonic() + 5
+        while not condicao():
+            self.assertLess(time.monotonic(), limite, "a condição não ocorreu a tempo")
+            time.sleep(0.005)
+
+    def test_turnos_identicos_chamam_o_modelo_uma_vez(self, _):
+        flights = SingleFlight(dedup_window=0)
+        liberar = threading.Event()
+        chamadas, resultados = [], []
+
+        def turno():
+            chamadas.append(1)
+            liberar.wait(5)
+            return "Resposta"
+
+        primeiro = self.em_paralelo(lambda: resultados.append(flights.do(1, "Oi, tudo bem?", turno)))
+        self.esperar(lambda: chamadas)
+        # Toque duplo em "enviar": espaços extras não fazem outra mensagem
+        segundo = self.em_paralelo(lambda: resultados.append(flights.do(1, "Oi,  tudo bem? ", turno)))
+        self.esperar(lambda: flights.snapshot()["turnos_compartilhados"])
+        liberar.set()
+        for thread in primeiro + segundo:
+            thread.join(5)
+
+        self.assertEqual(len(chamadas), 1)
+        self.assertCountEqual(resultados, [("Resposta", False), ("Resposta", True)])
+
+    def test_turnos_diferentes_do_usuario_sao_serializados(self, _):
+        flights = SingleFlight(dedup_window=0)
+        liberar = threading.Event()
+        eventos = []
+
+        def turno(nome, esperar=False):
+            def fn():
+                eventos.append(f"início {nome}")
+                if esperar:
+                    liberar.wait(5)
+                eventos.append(f"fim {nome}")
+            return lambda: flights.do(nome[:3], nome, fn)
+
+        threads = self.em_paralelo(turno("ana 1", esperar=True))
+        self.esperar(lambda: eventos)
+        threads += self.em_paralelo(turno("ana 2"), turno("bia 1"))
+
+        # O turno da Bia não espera o da Ana; o segundo da Ana, sim
+        self.esperar(lambda: "fim bia 1" in eventos)
+        self.assertNotIn("início ana 2", eventos)
+        liberar.set()
+        for thread in threads:
+            thread.join(5)
+
+        ana = [evento for evento in eventos if "ana" in evento]
+        self.assertEqual(ana, ["início ana 1", "fim ana 1", "início ana 2", "fim ana 2"])
+
+    def test_resposta_cortada_por_erro_nao_e_compartilhada(self, _):
+        chamadas = []
+
+        class ModeloQueCaiNoMeio(ModeloFalso):
+            def stream_message(self, message, history, max_tokens=None, usage=None):
+                chamadas.append(message)
+                yield "Que bom,"
+                raise httpx.ReadTimeout("lento")
+
+        with mock.patch.object(views, 'get_engine', return_value=ModeloQueCaiNoMeio()):
+            for _ in range(2):
+                resposta = self.client.post("/api/chat/stream/", {"message": "Vou ao médico na terça"}, format="json")
+                self.assertIn("event: error", b"".join(resposta.streaming_content).decode())
+
+        # A repetição logo em seguida chama o modelo de novo
+        self.assertEqual(len(chamadas), 2)
+
+
+class AtalhosDeIntencaoTests(TestCase):
+    """Perguntas estruturadas respondidas direto do banco (chat/intents.py)."""
+
+    def setUp(self):
+        cache.clear()
+        self.usuario = User.objects.create_user("paciente", password="senha")
+
+    def test_perguntas_reconhecidas(self):
+        perguntas = {
+            "Quais remédios eu tomo hoje?": "remedios_hoje",
+            "Bom dia! O que eu tenho hoje?": "agenda_hoje",
+            "qual é o meu próximo lembrete": "proximo_lembrete",
+            "Quem é meu contato de emergência, por favor?": "contato_emergencia",
+        }
+        for pergunta, intencao in perguntas.items():
+            with self.subTest(pergunta):
+                self.assertEqual(classify(pergunta), intencao)
+
+    def test_frases_parecidas_vao_para_o_modelo(self):
+        # Só a pergunta inteira vale: o resto da frase pode mudar o sentido
+        for mensagem in (
+            "Eu já tomei o remédio hoje?",
+            "Não quero tomar remédio hoje",
+            "Quais remédios a minha filha toma?",
+            "Meu contato de emergência mudou de telefone",
+            "O que eu tenho hoje, estou tão cansada",
+            "Bom dia!",
+        ):
+            with self.subTest(mensagem):
+                self.assertIsNone(classify(mensagem))
+                self.assertIsNone(answer_intent(self.usuario, mensagem))
+
+    def test_resposta_usa_os_lembretes_do_dia(self):
+        agora = timezone.localtime().replace(hour=9, minute=0, second=0, microsecond=0)
+        Lembrete.objects.create(
+            usuario=self.usuario, titulo="Vitamina D", tipo="medicamento",
+            data_hora=agora - timedelta(hours=1),
+        )
+        Lembrete.objects.create(
+            usuario=self.usuario, titulo="Losartana", tipo="medicamento",
+            data_hora=agora + timedelta(hours=3),
+        )
+        Lembrete.objects.create(
+            usuario=self.usuario, titulo="Almoço", tipo="refeicao",
+            data_hora=agora + timedelta(hours=3, minutes=30),
+        )
+
+        self.assertEqual(
+            answer_intent(self.usuario, "Qual é o meu próximo lembrete?", agora),
+            "Seu próximo lembrete é às 12:00: Losartana.",
+        )
+        self.assertEqual(
+            answer_intent(self.usuario, "Quais remédios eu tomo hoje?", agora),
+            "Estes são os remédios de hoje:\n"
+            "- 08:00: Vitamina D (o horário já passou)\n"
+            "- 12:00: Losartana",
+        )
+
+    @mock.patch.object(ModeloFalso, 'send_message')
+    def test_atalho_nao_chama_o_modelo(self, send_message):
+        Contato.objects.create(usuario=self.usuario, nome="Marta", telefone="11 99999-0000", is_emergencia=True)
+        client = APIClient()
+        client.force_authenticate(self.usuario)
+
+        with mock.patch.object(views, 'get_engine', return_value=ModeloFalso()):
+            resposta = client.post("/api/chat/", {"message": "Quem é meu contato de emergência?"}, format="json")
+
+        self.assertEqual(resposta.json()["resposta"], "Seu contato de emergência é Marta, telefone 11 99999-0000.")
+        send_message.assert_not_called()
+
+
+@override_settings(
+    CHAT_MAX_CONCURRENT_LLM_CALLS=1, CHAT_ADMISSION_QUEUE_SIZE=1,
+    CHAT_ADMISSION_WAIT=5, CHAT_ADMISSION_RETRY_AFTER=2,
+)
+class PortaoDeAdmissaoTests(TestCase):
+    """Limite de chamadas simultâneas ao modelo (chat/admission.py)."""
+
+    def test_vaga_liberada_vai_para_o_primeiro_da_fila(self):
+        portao = AdmissionGate()
+        portao.acquire()
+        na_fila = threading.Thread(target=portao.acquire)
+        na_fila.start()
+        limite = time.monotonic() + 5
+        while portao.snapshot()["na_fila"] == 0 and time.monotonic() < limite:
+            time.sleep(0.005)
+
+        # Vaga ocupada e fila cheia: recusa na hora, sem esperar
+        with self.assertRaises(ChatSaturatedError) as recusa:
+            portao.acquire()
+        self.assertEqual(recusa.exception.retry_after, 2)
+
+        portao.release()
+        na_fila.join(5)
+        self.assertFalse(na_fila.is_alive())
+        snapshot = portao.snapshot()
+        self.assertEqual((snapshot["em_andamento"], snapshot["na_fila"]), (1, 0))
+        self.assertEqual((snapshot["admitidas"], snapshot["esperaram_na_fila"], snapshot["recusadas"]), (2, 1, 1))
+
+    @override_settings(CHAT_ADMISSION_QUEUE_SIZE=0)
+    @mock.patch.object(views, 'get_engine', return_value=ModeloFalso())
+    def test_portao_cheio_responde_503_com_retry_after(self, _):
+        cache.clear()
+        usuario = User.objects.create_user("paciente", password="senha")
+        client = APIClient()
+        client.force_authenticate(usuario)
+        chat_admission.acquire()
+        self.addCleanup(chat_admission.release)
+        recusadas = chat_admission.snapshot()["recusadas"]
+
+        for url in ("/api/chat/", "/api/chat/stream/"):
+            with self.subTest(url):
+                resposta = client.post(url, {"message": "Meu neto vem no domingo"}, format="json")
+                self.assertEqual(resposta.status_code, 503)
+                self.assertEqual(resposta["Retry-After"], "2")
+                self.assertEqual(resposta.json()["resposta"], BUSY_REPLY)
+
+        self.assertEqual(chat_admission.snapshot()["recusadas"], recusadas + 2)
+        self.assertFalse(HistoricoChat.objects.filter(usuario=usuario).exists())
+
+        # Perguntas do atalho não dependem do modelo: passam mesmo sem vaga
+        resposta = client.post("/api/chat/", {"message": "O que eu tenho hoje?"}, format="json")
+        self.assertEqual(resposta.status_code, 200)
+
+
+@override_settings(CHAT_DAILY_TOKEN_BUDGET=1000, CHAT_TOKEN_BUDGET_SOFT_LIMIT=0.8)
+class OrcamentoDeTokensTests(TestCase):
+    """Orçamento diário de tokens por usuário (chat/usage.py)."""
+
+    def setUp(self):
+        cache.clear()
+        self.usuario = User.objects.create_user("paciente", password="senha")
+        self.agora = timezone.now()
+
+    def gastar(self, tokens):
+        usage = TokenUsage()
+        usage.prompt_tokens, usage.completion_tokens = tokens - tokens // 4, tokens // 4
+        record_usage(self.usuario, self.agora, usage)
+
+    def test_turnos_ficam_mais_baratos_perto_do_limite(self):
+        self.gastar(700)
+        self.assertEqual(token_plan(self.usuario, self.agora).nivel, NORMAL)
+
+        self.gastar(100)
+        plano = token_plan(self.usuario, self.agora)
+        self.assertEqual((plano.nivel, plano.max_tokens, plano.prompt_budget), (REDUZIDO, 250, 1500))
+
+        self.gastar(300)
+        plano = token_plan(self.usuario, self.agora)
+        self.assertEqual((plano.nivel, plano.max_tokens, plano.prompt_budget), (ESGOTADO, 120, 800))
+        self.assertEqual(plano.snapshot()["restantes"], 0)
+
+    @mock.patch.object(ModeloFalso, 'send_message', return_value="Pode deixar.")
+    def test_orcamento_esgotado_nao_recusa_o_turno(self, send_message):
+        # O orçamento nunca bloqueia o chat: a resposta só fica mais curta
+        self.gastar(1500)
+        client = APIClient()
+        client.force_authenticate(self.usuario)
+
+        with mock.patch.object(views, 'get_engine', return_value=ModeloFalso()):
+            resposta = client.post("/api/chat/", {"message": "Minha filha liga amanhã"}, format="json")
+
+        self.assertEqual(resposta.status_code, 200)
+        self.assertEqual(resposta.json()["resposta"], "Pode deixar.")
+        _, _, max_tokens, _ = send_message.call_args.args
+        self.assertEqual(max_tokens, 120)
+
+    @override_settings(CHAT_DAILY_TOKEN_BUDGET=0)
+    def test_sem_orcamento_so_contabiliza(self):
+        self.gastar(10 ** 6)
+        plano = token_plan(self.usuario, self.agora)
+        self.assertEqual((plano.nivel, plano.max_tokens), (NORMAL, None))
+        self.assertEqual(plano.usados, 10 ** 6)
+
+
+@override_settings(CHAT_RESPONSE_CACHE_TTL=600)
+class CacheDeRespostasTests(TestCase):
+    """Respostas do modelo reaproveitadas para perguntas repetidas (chat/response_cache.py)."""
+
+    def setUp(self):
+        cache.clear()
+        response_cache.clear()
+        self.addCleanup(response_cache.clear)
+        self.usuario = User.objects.create_user("paciente", password="senha")
+        self.now = timezone.now()
+
+    def guardar(self, mensagem, resposta):
+        response_cache.put(response_cache.key_for(self.usuario, mensagem, self.now), resposta)
+
+    def buscar(self, mensagem):
+        return response_cache.get(response_cache.key_for(self.usuario, mensagem, self.now))
+
+    def test_por_padrao_so_a_mesma_pergunta(self):
+        self.guardar("Eu tomei o remédio da pressão", "Que bom! Continue assim.")
+        self.assertEqual(self.buscar("eu tomei o remedio da pressao?"), "Que bom! Continue assim.")
+        self.assertIsNone(self.buscar("Eu tomei meu remédio da pressão"))
+
+    @override_settings(CHAT_RESPONSE_CACHE_SIMILARITY=0.8)
+    def test_negacao_nunca_divide_a_resposta(self):
+        self.guardar("Eu tomei o remédio da pressão", "Que bom! Continue assim.")
+        self.assertEqual(self.buscar("Eu tomei meu remédio da pressão"), "Que bom! Continue assim.")
+        self.assertIsNone(self.buscar("Eu não tomei o remédio da pressão"))
+        self.assertIsNone(self.buscar("Eu nunca tomei o remédio da pressão"))
+
+        self.guardar("Eu não tomei o remédio da pressão", "Tome agora, com água.")
+        self.assertEqual(self.buscar("Eu não tomei meu remédio da pressão"), "Tome agora, com água.")
+
+    def test_mudanca_no_diario_descarta_a_resposta(self):
+        self.guardar("O que eu escrevi no diário", "Você foi ao parque com a Maria.")
+        self.assertEqual(self.buscar("O que eu escrevi no diário"), "Você foi ao parque com a Maria.")
+
+        EntradaDiario.objects.create(usuario=self.usuario, texto="Almocei com o Joaquim")
+        self.assertIsNone(self.buscar("O que eu escrevi no diário"))
+
+    def test_nova_conversa_descarta_a_resposta(self):
+        self.guardar("Qual é o nome do meu neto", "O nome dele é Pedro.")
+        SessaoChat.objects.create(usuario=self.usuario)
+        self.assertIsNone(self.buscar("Qual é o nome do meu neto"))
+
+    def test_perguntas_relativas_ao_relogio_nao_entram(self):
+        for mensagem in ["Eu já tomei o remédio da pressão hoje", "O que eu tenho agora à tarde?"]:
+            self.assertIsNone(response_cache.key_for(self.usuario, mensagem, self.now))
+
+
+class BriefingDesatualizadoTests(TestCase):
+    """'gerar_briefings --desatualizados' compara com o contexto do banco (chat/briefing.py)."""
+
+    def test_mudanca_sem_passar_pelo_cache_refaz_o_briefing(self):
+        cache.clear()
+        usuario = User.objects.create_user("paciente", password="senha")
+        now = timezone.now()
+        lembrete = Lembrete.objects.create(usuario=usuario, titulo="Losartana", data_hora=now)
+
+        self.assertEqual(briefing.generate_for_user(ModeloFalso(), usuario.pk, now), briefing.GERADO)
+        self.assertEqual(
+            briefing.generate_for_user(ModeloFalso(), usuario.pk, now, only_stale=True), briefing.ATUAL
+        )
+
+        # Edição que este processo não viu (o cache do contexto continua o antigo)
+        get_rag_data(usuario, now)
+        Lembrete.objects.filter(pk=lembrete.pk).update(titulo="Metformina")
+
+        self.assertEqual(
+            briefing.generate_for_user(ModeloFalso(), usuario.pk, now, only_stale=True), briefing.GERADO
+        )
+        self.assertIn("Metformina", usuario.briefings.get().conteudo)
+
+
+@override_settings(
+    CHAT_HEDGE_DELAY=0.05, CHAT_HEDGE_MIN_DELAY=0.01,
+    CHAT_ROUTING_MIN_SAMPLES=3, CHAT_ENDPOINT_DEMOTION_SECONDS=60,
+)
+class RoteamentoTests(TestCase):
+    """Hedging e rebaixamento entre endpoints do modelo (chat/routing.py)."""
+
+    def setUp(self):
+        reset_routing_stats()
+        self.addCleanup(reset_routing_stats)
+        self.lento = Endpoint("lento", "modelo", {})
+        self.rapido = Endpoint("rapido", "modelo", {})
+        self.router = Router([self.lento, self.rapido])
+
+    def endpoint(self, nome):
+        return routing_snapshot()["endpoints"][nome]
+
+    def test_hedge_cancela_a_perdedora_sem_amostra_de_latencia(self):
+        async def chamar(endpoint):
+            await asyncio.sleep(1.0 if endpoint is self.lento else 0.01)
+            return endpoint.name
+
+        self.assertEqual(asyncio.run(self.router.acall(chamar)), "rapido")
+        self.assertEqual(routing_snapshot()["decisoes"]["hedge"], 1)
+
+        lento = self.endpoint("lento")
+        self.assertEqual((lento["requisicoes"], lento["censuradas"]), (1, 1))
+        self.assertEqual(lento["latencia"][COMPLETA]["amostras"], 0)
+        self.assertEqual(self.endpoint("rapido")["latencia"][COMPLETA]["amostras"], 1)
+
+    def test_endpoint_com_erros_e_rebaixado(self):
+        def chamar(endpoint):
+            if endpoint is self.lento:
+                raise ConnectionError("fora do ar")
+            return endpoint.name
+
+        for _ in range(3):
+            self.assertEqual(self.router.call(chamar), "rapido")
+
+        self.assertTrue(self.endpoint("lento")["rebaixado"])
+        self.assertEqual(self.router.ordered(), [self.rapido, self.lento])
+        self.assertEqual(routing_snapshot()["decisoes"]["failover"], 3)
+
+
+@override_settings(CHAT_HISTORY_WRITE_BEHIND=True, CHAT_HISTORY_BUFFER_MAX_DELAY=60)
+class GravacaoAdiadaTests(TestCase):
+    """Turnos gravados em lote pelo buffer (chat/write_buffer.py)."""
+
+    def test_mensagens_guardam_o_horario_do_turno(self):
+        usuario = User.objects.create_user("paciente", password="senha")
+        antes = timezone.now()
+        persist_turn(usuario, "Bom dia", "Bom dia! Como você está?")
+        depois = timezone.now()
+        self.assertFalse(HistoricoChat.objects.filter(usuario=usuario).exists())
+
+        with mock.patch("django.utils.timezone.now", return_value=depois + timedelta(minutes=5)):
+            history_buffer.flush()
+
+        horarios = list(HistoricoChat.objects.filter(usuario=usuario).values_list("timestamp", flat=True))
+        self.assertEqual(len(horarios), 2)
+        for horario in horarios:
+            self.assertTrue(antes <= horario <= depois)
+
+
+class HistoricoPaginadoTests(TestCase):
+    """GET /api/chat/: páginas por cursor (timestamp, id) (chat/history.py)."""
+
+    def setUp(self):
+        cache.clear()
+        self.usuario = User.objects.create_user("paciente", password="senha")
+        self.client = APIClient()
+        self.client.force_authenticate(self.usuario)
+
+    def test_paginas_cobrem_mensagens_com_o_mesmo_horario(self):
+        agora = timezone.now()
+        HistoricoChat.objects.bulk_create([
+            HistoricoChat(
+                usuario=self.usuario, role="user" if i % 2 == 0 else "assistant",
+                content=f"Mensagem {i}", timestamp=agora if i < 5 else agora + timedelta(seconds=1),
+            )
+            for i in range(7)
+        ])
+
+        paginas, url = [], "/api/chat/?limite=2"
+        while url:
+            dados = self.client.get(url).json()
+            paginas.insert(0, [m["content"] for m in dados["mensagens"]])
+            url = dados["anteriores"] and f"/api/chat/?limite=2&antes={dados['anteriores']}"
+
+        self.assertEqual(paginas[-1], ["Mensagem 5", "Mensagem 6"])
+        self.assertEqual(sum(paginas, []), [f"Mensagem {i}" for i in range(7)])
+
+    def test_cursor_invalido(self):
+        for cursor in ["nao-e-um-cursor", base64.urlsafe_b64encode(b"2026-01-01T10:00:00|abc").decode(),
+                       base64.urlsafe_b64encode(b"2026-01-01T10:00:00|1").decode()]:
+            resposta = self.client.get("/api/chat/", {"antes": cursor})
+            self.assertEqual(resposta.status_code, 400, cursor)
+            self.assertIn("antes", resposta.json())
+
+
+class ArquivoDoHistoricoTests(TestCase):
+    """Histórico antigo em segmentos comprimidos (chat/archive.py)."""
+
+    def setUp(self):
+        cache.clear()
+        self.usuario = User.objects.create_user("paciente", password="senha")
+        self.client = APIClient()
+        self.client.force_authenticate(self.usuario)
+
+        agora = timezone.now()
+        antigas = [
+            HistoricoChat.objects.create(
+                usuario=self.usuario, role="user" if i % 2 == 0 else "assistant",
+                content=f"Antiga {i}", timestamp=agora - timedelta(days=200, minutes=10 - i),
+            )
+            for i in range(7)
+        ]
+        for i in range(2):
+            HistoricoChat.objects.create(
+                usuario=self.usuario, role="user", content=f"Recente {i}", timestamp=agora - timedelta(minutes=2 - i),
+            )
+        # A última mensagem antiga ainda não entrou no resumo: fica na tabela
+        ResumoConversa.objects.create(usuario=self.usuario, conteudo="Resumo", ultima_mensagem_id=antigas[5].pk)
+        self.arquivadas = [
+            {**linha, "timestamp": linha["timestamp"].isoformat()}
+            for linha in HistoricoChat.objects.filter(pk__lte=antigas[5].pk).order_by("id").values(*FIELDS)
+        ]
+
+    def test_segmentos_guardam_as_mensagens(self):
+        self.assertEqual(archive_user(self.usuario.pk, archive_cutoff(), segment_size=4), 6)
+
+        segmentos = list(ArquivoChat.objects.filter(usuario=self.usuario).order_by("id"))
+        self.assertEqual([s.mensagens for s in segmentos], [4, 2])
+        self.assertEqual(sum((read_segment(s) for s in segmentos), []), self.arquivadas)
+        self.assertEqual(
+            list(HistoricoChat.objects.filter(usuario=self.usuario).order_by("id").values_list("content", flat=True)),
+            ["Antiga 6", "Recente 0", "Recente 1"],
+        )
+
+    @override_settings(CHAT_ARCHIVE_PAGE_SIZE=1)
+    def test_cursor_percorre_o_arquivo_e_o_historico_vivo(self):
+        archive_user(self.usuario.pk, archive_cutoff(), segment_size=2)
+
+        paginas, url = [], "/api/chat/arquivo/"
+        while url:
+            dados = self.client.get(url).json()
+            paginas.insert(0, [s["id"] for s in dados["segmentos"]])
+            url = dados["anteriores"] and f"/api/chat/arquivo/?antes={dados['anteriores']}"
+        self.assertEqual([len(p) for p in paginas], [1, 1, 1])
+
+        arquivo = [
+            m["content"]
+            for (segmento,) in paginas
+            for m in self.client.get(f"/api/chat/arquivo/{segmento}/").json()["mensagens"]
+        ]
+        vivo = [m["content"] for m in self.client.get("/api/chat/").json()["mensagens"]]
+        self.assertEqual(arquivo, [linha["content"] for linha in self.arquivadas])
+        self.assertEqual(vivo, ["Antiga 6", "Recente 0", "Recente 1"])
+
+        outro = User.objects.create_user("outro", password="senha")
+        self.client.force_authenticate(outro)
+        self.assertEqual(self.client.get(f"/api/chat/arquivo/{paginas[0][0]}/").status_code, 404)
+
+
+class FalhaNVezes:
+    """Chamada ao provedor que falha com erro transitório nas primeiras 'n' vezes."""
+
+    def __init__(self, n, erro=httpx.ConnectError):
+        self.n = n
+        self.erro = erro
+        self.chamadas = 0
+
+    def __call__(self):
+        self.chamadas += 1
+        if self.chamadas <= self.n:
+            raise self.erro("conexão recusada")
+        return "Resposta"
+
+
+def pedaco(texto):
+    return SimpleNamespace(usage=None, choices=[SimpleNamespace(delta=SimpleNamespace(content=texto))])
+
+
+class ClienteFalso:
+    """InferenceClient falso: cada chamada em streaming segue o próximo roteiro (textos e erros)."""
+
+    def __init__(self, roteiros):
+        self.roteiros = list(roteiros)
+        self.chamadas = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        pass
+
+    def chat_completion(self, **kwargs):
+        roteiro = self.roteiros[self.chamadas]
+        self.chamadas += 1
+        for item in roteiro:
+            if isinstance(item, Exception):
+                raise item
+            yield pedaco(item)
+
+
+@override_settings(
+    CHAT_LLM_BASE_URL="http://llm.falso", CHAT_LLM_ENDPOINTS=[],
+    CHAT_LLM_MAX_RETRIES=2, CHAT_LLM_RETRY_BASE_DELAY=0,
+)
+class ResilienciaTests(TestCase):
+    """Retries e circuit breaker em volta das chamadas ao modelo (chat/resilience.py)."""
+
+    def setUp(self):
+        llm_breaker.record_success()
+        self.addCleanup(llm_breaker.record_success)
+        self.addCleanup(reset_routing_stats)
+
+    def test_erros_transitorios_sao_repetidos(self):
+        breaker = CircuitBreaker(failure_threshold=5)
+        chamada = FalhaNVezes(2)
+        self.assertEqual(call_with_retries(chamada, breaker), "Resposta")
+        self.assertEqual(chamada.chamadas, 3)
+        self.assertEqual(breaker.snapshot()["estado"], CircuitBreaker.CLOSED)
+
+        # Erro que não é transitório (ex: 400) não é repetido
+        chamada = FalhaNVezes(1, erro=ValueError)
+        with self.assertRaises(ValueError):
+            call_with_retries(chamada, breaker)
+        self.assertEqual(chamada.chamadas, 1)
+
+    def test_circuito_abre_e_a_chamada_de_teste_decide(self):
+        breaker = CircuitBreaker(failure_threshold=3, recovery_timeout=0.05)
+        with self.assertRaises(httpx.ConnectError):
+            call_with_retries(FalhaNVezes(3), breaker)
+        self.assertEqual(breaker.snapshot()["estado"], CircuitBreaker.OPEN)
+
+        # Aberto: falha na hora, sem chamar o provedor
+        chamada = FalhaNVezes(0)
+        with self.assertRaises(CircuitOpenError):
+            call_with_retries(chamada, breaker)
+        self.assertEqual(chamada.chamadas, 0)
+
+        # Passado o tempo de recuperação, uma chamada de teste; se falha, reabre
+        time.sleep(0.06)
+        chamada = FalhaNVezes(1)
+        with self.assertRaises(CircuitOpenError):
+            call_with_retries(chamada, breaker)
+        self.assertEqual(chamada.chamadas, 1)
+        self.assertEqual(breaker.snapshot()["estado"], CircuitBreaker.OPEN)
+
+        # Só uma chamada de teste por vez; o sucesso dela fecha o circuito
+        time.sleep(0.06)
+        breaker.before_call()
+        self.assertEqual(breaker.snapshot()["estado"], CircuitBreaker.HALF_OPEN)
+        with self.assertRaises(CircuitOpenError):
+            breaker.before_call()
+        breaker.record_success()
+        self.assertEqual(call_with_retries(FalhaNVezes(0), breaker), "Resposta")
+        self.assertEqual(breaker.snapshot()["estado"], CircuitBreaker.CLOSED)
+
+    def modelo(self, *roteiros):
+        cliente = ClienteFalso(roteiros)
+        engine = ChatEngine()
+        patcher = mock.patch.object(engine, "_open_client", return_value=cliente)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        return engine, cliente
+
+    def test_stream_repete_antes_do_primeiro_token(self):
+        engine, cliente = self.modelo([httpx.ConnectError("caiu")], [httpx.ReadTimeout("lento")], ["Bom ", "dia!"])
+        self.assertEqual(list(engine.stream_message("Oi", [])), ["Bom ", "dia!"])
+        self.assertEqual(cliente.chamadas, 3)
+
+    def test_stream_nao_repete_depois_do_primeiro_token(self):
+        engine, cliente = self.modelo(["Bom ", httpx.ReadTimeout("lento")], ["Bom dia!"])
+        recebidos = []
+        with self.assertRaises(httpx.ReadTimeout):
+            for delta in engine.stream_message("Oi", []):
+                recebidos.append(delta)
+        # O texto parcial já foi para o cliente: repetir duplicaria a resposta
+        self.assertEqual(recebidos, ["Bom "])
+        self.assertEqual(cliente.chamadas, 1)
+
+
+@override_settings(
+    CHAT_LLM_BASE_URL="http://llm.falso", CHAT_LLM_ENDPOINTS=[],
+    CHAT_LLM_MAX_RETRIES=2, CHAT_LLM_RETRY_BASE_DELAY=0,
+)
+class RespostaEmStreamingTests(TestCase):
+    """POST /api/chat/stream/: tokens do modelo como eventos SSE."""
+
+    def setUp(self):
+        cache.clear()
+        llm_breaker.record_success()
+        self.addCleanup(llm_breaker.record_success)
+        self.addCleanup(reset_routing_stats)
+        self.usuario = User.objects.create_user("paciente", password="senha")
+        self.client = APIClient()
+        self.client.force_authenticate(self.usuario)
+
+    def conversar(self, mensagem, *roteiros):
+        cliente = ClienteFalso(roteiros)
+        engine = ChatEngine()
+        with mock.patch.object(engine, "_open_client", return_value=cliente), \
+                mock.patch.object(views, "get_engine", return_value=engine):
+            resposta = self.client.post("/api/chat/stream/", {"message": mensagem}, format="json")
+            corpo = b"".join(resposta.streaming_content).decode()
+        self.assertTrue(resposta["Content-Type"].startswith("text/event-stream"))
+        eventos = []
+        for bloco in corpo.strip().split("\n\n"):
+            evento, dados = bloco.split("\n")
+            eventos.append((evento.removeprefix("event: "), json.loads(dados.removeprefix("data: "))))
+        return eventos, cliente
+
+    def historico(self):
+        return list(HistoricoChat.objects.filter(usuario=self.usuario).order_by("id").values_list("content", flat=True))
+
+    def test_tokens_e_resposta_completa(self):
+        eventos, cliente = self.conversar(
+            "Minha neta faz aniversário amanhã",
+            [httpx.ConnectError("caiu")],
+            ["Que bom, ", "dê os parabéns a ela!"],
+        )
+        self.assertEqual(eventos, [
+            ("token", {"delta": "Que bom, "}),
+            ("token", {"delta": "dê os parabéns a ela!"}),
+            ("done", {"resposta": "Que bom, dê os parabéns a ela!"}),
+        ])
+        # O erro antes do primeiro token foi repetido sem o paciente perceber
+        self.assertEqual(cliente.chamadas, 2)
+        self.assertEqual(self.historico(), ["Minha neta faz aniversário amanhã", "Que bom, dê os parabéns a ela!"])
+
+    def test_falha_depois_do_primeiro_token(self):
+        eventos, cliente = self.conversar(
+            "Vou caminhar à tarde", ["Que bom, ", httpx.ReadTimeout("lento")], ["nunca chega"]
+        )
+        self.assertEqual(eventos[0], ("token", {"delta": "Que bom, "}))
+        # Sem nova tentativa nem resposta de contingência depois do texto parcial
+        evento, dados = eventos[1]
+        self.assertEqual(evento, "error")
+        self.assertNotIn("resposta", dados)
+        self.assertEqual(len(eventos), 2)
+        self.assertEqual(cliente.chamadas, 1)
+        self.assertEqual(self.historico(), ["Vou caminhar à tarde", "Que bom,"])
+
+
+@override_settings(CHAT_LLM_BASE_URL="http://llm.falso", CHAT_LLM_ENDPOINTS=[])
+class ClienteAsyncDoModeloTests(TestCase):
+    """Clients async do modelo, um por event loop (ChatEngine._shared_async_client)."""
+
+    def test_clients_sao_fechados_quando_o_loop_termina(self):
+        engine = ChatEngine()
+        endpoint = engine.router.endpoints[0]
+        fechados = []
+
+        class ClienteAsyncFalso:
+            async def close(self):
+                fechados.append(self)
+
+        async def turno():
+            cliente = engine._shared_async_client(endpoint)
+            self.assertIs(engine._shared_async_client(endpoint), cliente)
+            return cliente
+
+        with mock.patch.object(engine, "_open_async_client", side_effect=lambda endpoint: ClienteAsyncFalso()):
+            # Cada asyncio.run (como o async_to_sync) cria e descarta um loop
+            clientes = [asyncio.run(turno()) for _ in range(2)]
+
+        self.assertIsNot(clientes[0], clientes[1])
+        self.assertEqual(fechados, clientes)
+        self.assertEqual(len(engine._async_clients), 0)
+        self.assertFalse(engine._async_closers)
@@ -0,0 +1,23 @@
+# chat/throttling.py
+"""
+Limite de turnos do chat por usuário (throttle do DRF).
+
+Os contadores ficam no cache CHAT_THROTTLE_CACHE: com o LocMemCache
+padrão o limite vale por processo; com um cache compartilhado (Redis)
+vale para todos os workers.
+"""
+from django.conf import settings
+from django.core.cache import caches
+from rest_framework.throttling import UserRateThrottle
+
+
+class ChatRateThrottle(UserRateThrottle):
+    """Até CHAT_THROTTLE_RATE turnos por usuário (ex: '20/min'; None desliga)."""
+    scope = 'chat'
+
+    @property
+    def cache(self):
+        return caches[getattr(settings, 'CHAT_THROTTLE_CACHE', 'default')]
+
+    def get_rate(self):
+        return getattr(settings, 'CHAT_THROTTLE_RATE', '20/min')
@@ -0,0 +1,69 @@
+# chat/tokens.py
+"""
+Estimativa local de tokens (sem baixar o tokenizer do modelo).
+
+Conta palavras e pontuação como um tokenizer BPE faria de forma
+aproximada: palavras curtas valem 1 token e palavras longas são
+quebradas em pedaços de ~4 caracteres. Para o português com o
+Llama 3 a estimativa fica próxima (e levemente acima) do valor real,
+o que é o lado seguro para respeitar um orçamento.
+"""
+import re
+from typing import Dict, Iterable
+
+# Tokens extras que o template de chat adiciona em cada mensagem
+# (cabeçalho com o papel + marcador de fim de turno).
+MESSAGE_OVERHEAD = 4
+
+_PIECE_RE = re.compile(r"\w+|[^\w\s]")
+
+
+def estimate_tokens(text: str) -> int:
+    """Número aproximado de tokens de um texto."""
+    if not text:
+        return 0
+    total = 0
+    for piece in _PIECE_RE.findall(text):
+        total += max(1, round(len(piece) / 4))
+    return total
+
+
+def estimate_message_tokens(message: Dict[str, str]) -> int:
+    """Tokens de uma mensagem no formato {"role", "content"}."""
+    return estimate_tokens(message["content"]) + MESSAGE_OVERHEAD
+
+
+def estimate_messages_tokens(messages: Iterable[Dict[str, str]]) -> int:
+    return sum(estimate_message_tokens(m) for m in messages)
+
+
+class TokenUsage:
+    """
+    Tokens gastos numa chamada ao modelo. Quem chama o ChatEngine passa
+    uma instância vazia; o engine preenche com o 'usage' informado pelo
+    provedor ou, se ele não vier, com a estimativa local.
+    """
+    __slots__ = ("prompt_tokens", "completion_tokens", "estimated")
+
+    def __init__(self) -> None:
+        self.prompt_tokens = 0
+        self.completion_tokens = 0
+        self.estimated = False
+
+    @property
+    def total_tokens(self) -> int:
+        return self.prompt_tokens + self.completion_tokens
+
+    def report(self, usage) -> bool:
+        """Copia o 'usage' da resposta do provedor (se veio)."""
+        if not usage or not (usage.prompt_tokens or usage.completion_tokens):
+            return False
+        self.prompt_tokens = usage.prompt_tokens or 0
+        self.completion_tokens = usage.completion_tokens or 0
+        self.estimated = False
+        return True
+
+    def estimate(self, messages: Iterable[Dict[str, str]], completion: str) -> None:
+        self.prompt_tokens = estimate_messages_tokens(messages)
+        self.completion_tokens = estimate_tokens(completion)
+        self.estimated = True
@@ -1,8 +1,38 @@
 # chat/urls.py
 from django.urls import path
-from .views import ChatAPIView
+from .async_views import AsyncChatTarefaView, AsyncChatView
+from .views import (
+    ChatAPIView,
+    ChatArquivoAPIView,
+    ChatArquivoSegmentoAPIView,
+    ChatBriefingAPIView,
+    ChatSessaoAPIView,
+    ChatStatusAPIView,
+    ChatStreamAPIView,
+    ChatTarefaAPIView,
+    ChatUsoAPIView,
+)
 
 urlpatterns = [
     # /api/chat/
     path('chat/', ChatAPIView.as_view(), name='chat-api'),
+    # /api/chat/stream/ (Server-Sent Events)
+    path('chat/stream/', ChatStreamAPIView.as_view(), name='chat-stream'),
+    # /api/chat/async/ (view async, para rodar sob ASGI)
+    path('chat/async/', AsyncChatView.as_view(), name='chat-async'),
+    # /api/chat/async/tarefas/<id>/ (long-polling do modo assíncrono, sob ASGI)
+    path('chat/async/tarefas/<int:pk>/', AsyncChatTarefaView.as_view(), name='chat-async-tarefa'),
+    # /api/chat/sessao/ (POST: nova conversa)
+    path('chat/sessao/', ChatSessaoAPIView.as_view(), name='chat-sessao'),
+    # /api/chat/tarefas/<id>/ (modo assíncrono: resultado do turno)
+    path('chat/tarefas/<int:pk>/', ChatTarefaAPIView.as_view(), name='chat-tarefa'),
+    # /api/chat/briefing/ (briefing do dia, gerado em lote)
+    path('chat/briefing/', ChatBriefingAPIView.as_view(), name='chat-briefing'),
+    # /api/chat/arquivo/ (histórico arquivado: segmentos e conteúdo sob demanda)
+    path('chat/arquivo/', ChatArquivoAPIView.as_view(), name='chat-arquivo'),
+    path('chat/arquivo/<int:pk>/', ChatArquivoSegmentoAPIView.as_view(), name='chat-arquivo-segmento'),
+    # /api/chat/uso/ (tokens gastos por dia e orçamento diário)
+    path('chat/uso/', ChatUsoAPIView.as_view(), name='chat-uso'),
+    # /api/chat/status/ (monitoramento, só admin)
+    path('chat/status/', ChatStatusAPIView.as_view(), name='chat-status'),
 ]
\ No newline at end of file
@@ -0,0 +1,136 @@
+# chat/usage.py
+"""
+Contabilidade de tokens do chat e orçamento diário por usuário.
+
+Cada turno que chama o modelo soma o 'usage' da resposta (ou a
+estimativa local, ver tokens.TokenUsage) na linha do usuário/dia em
+UsoTokens, com um UPDATE incremental (sem ler antes).
+
+O orçamento (CHAT_DAILY_TOKEN_BUDGET) nunca bloqueia o chat: perto do
+limite o turno fica mais barato, e não falha.
+- normal:   prompt e resposta com os limites padrão;
+- reduzido: a partir de CHAT_TOKEN_BUDGET_SOFT_LIMIT do orçamento,
+            janela do histórico e resposta menores;
+- esgotado: orçamento estourado, só o essencial (quase sem histórico
+            e resposta curta).
+"""
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F, Sum
+from django.utils import timezone
+
+from .models import UsoTokens
+
+NORMAL = 'normal'
+REDUZIDO = 'reduzido'
+ESGOTADO = 'esgotado'
+
+
+class TokenPlan:
+    """Limites de um turno conforme o gasto do usuário no dia."""
+    __slots__ = ("nivel", "usados", "orcamento", "prompt_budget", "max_tokens")
+
+    def __init__(self, nivel, usados, orcamento, prompt_budget, max_tokens) -> None:
+        self.nivel = nivel
+        self.usados = usados
+        self.orcamento = orcamento
+        # Orçamento do prompt (ver conversation.build_history)
+        self.prompt_budget = prompt_budget
+        # None: limite padrão do ChatEngine
+        self.max_tokens = max_tokens
+
+    def snapshot(self) -> dict:
+        return {
+            "nivel": self.nivel,
+            "usados": self.usados,
+            "orcamento": self.orcamento,
+            "restantes": max(0, self.orcamento - self.usados) if self.orcamento else None,
+        }
+
+
+def _plan(used: int) -> TokenPlan:
+    budget = getattr(settings, 'CHAT_DAILY_TOKEN_BUDGET', 100000)
+    prompt_budget = getattr(settings, 'CHAT_PROMPT_TOKEN_BUDGET', 3000)
+    if not budget:
+        # Sem orçamento configurado: só contabiliza
+        return TokenPlan(NORMAL, used, None, prompt_budget, None)
+
+    if used >= budget:
+        return TokenPlan(
+            ESGOTADO, used, budget,
+            getattr(settings, 'CHAT_EXHAUSTED_PROMPT_TOKEN_BUDGET', 800),
+            getattr(settings, 'CHAT_EXHAUSTED_MAX_TOKENS', 120),
+        )
+    if used >= budget * getattr(settings, 'CHAT_TOKEN_BUDGET_SOFT_LIMIT', 0.8):
+        return TokenPlan(
+            REDUZIDO, used, budget,
+            getattr(settings, 'CHAT_REDUCED_PROMPT_TOKEN_BUDGET', 1500),
+            getattr(settings, 'CHAT_REDUCED_MAX_TOKENS', 250),
+        )
+    return TokenPlan(NORMAL, used, budget, prompt_budget, None)
+
+
+def _today_qs(user, now):
+    return UsoTokens.objects.filter(usuario=user, data=timezone.localdate(now))
+
+
+def _used(row) -> int:
+    return sum(row) if row else 0
+
+
+def token_plan(user, now) -> TokenPlan:
+    """Limites do próximo turno do usuário (uma consulta pela chave única)."""
+    return _plan(_used(_today_qs(user, now).values_list('tokens_prompt', 'tokens_resposta').first()))
+
+
+async def atoken_plan(user, now) -> TokenPlan:
+    """Versão assíncrona de token_plan."""
+    return _plan(_used(await _today_qs(user, now).values_list('tokens_prompt', 'tokens_resposta').afirst()))
+
+
+def record_usage(user, now, usage) -> None:
+    """
+    Soma os tokens de uma chamada ao agregado do dia. Sem a linha do dia,
+    cria; se outro turno criou ao mesmo tempo, soma na linha dele.
+    """
+    if usage is None or not usage.total_tokens:
+        return
+
+    qs = _today_qs(user, now)
+    increments = {
+        "tokens_prompt": F('tokens_prompt') + usage.prompt_tokens,
+        "tokens_resposta": F('tokens_resposta') + usage.completion_tokens,
+        "chamadas": F('chamadas') + 1,
+        "chamadas_estimadas": F('chamadas_estimadas') + int(usage.estimated),
+        "atualizado_em": timezone.now(),
+    }
+    if qs.update(**increments):
+        return
+    try:
+        with transaction.atomic():
+            UsoTokens.objects.create(
+                usuario=user,
+                data=timezone.localdate(now),
+                tokens_prompt=usage.prompt_tokens,
+                tokens_resposta=usage.completion_tokens,
+                chamadas=1,
+                chamadas_estimadas=int(usage.estimated),
+            )
+    except IntegrityError:
+        qs.update(**increments)
+
+
+arecord_usage = sync_to_async(record_usage)
+
+
+def usage_totals(now) -> dict:
+    """Gasto de todos os usuários no dia (para o GET /api/chat/status/)."""
+    totals = UsoTokens.objects.filter(data=timezone.localdate(now)).aggregate(
+        usuarios=Count('id'),
+        tokens_prompt=Sum('tokens_prompt'),
+        tokens_resposta=Sum('tokens_resposta'),
+        chamadas=Sum('chamadas'),
+        chamadas_estimadas=Sum('chamadas_estimadas'),
+    )
+    return {key: value or 0 for key, value in totals.items()}
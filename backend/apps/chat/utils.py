@@ -1,19 +1,48 @@
 # chat/utils.py
 from pathlib import Path
 
+from dotenv import load_dotenv
+
 def load_prompt(filename: str) -> str:
     """
     Carrega um arquivo de prompt a partir de:
     chat/prompts/<filename>
     """
-    # Pega a pasta "chat" (onde este arquivo .py está)
-    base_dir = Path(__file__).resolve().parent
-
     # Constrói o caminho: chat/prompts/<filename>
-    prompt_path = base_dir / "prompts" / filename
+    prompt_path = get_prompt_path(filename)
 
     if not prompt_path.is_file():
         raise FileNotFoundError(f"O arquivo de prompt '{filename}' não foi encontrado em '{prompt_path}'.")
 
     with open(prompt_path, 'r', encoding='utf-8') as f:
-        return f.read().strip()
\ No newline at end of file
+        return f.read().strip()
+
+
+def get_prompt_path(filename: str) -> Path:
+    """Caminho absoluto de chat/prompts/<filename>."""
+    return Path(__file__).resolve().parent / "prompts" / filename
+
+
+def get_env_path() -> Path:
+    """
+    Caminho do .env do projeto.
+    Caminho: backend/apps/chat/utils.py -> sobe 3 níveis -> backend/config/.env
+    """
+    return Path(__file__).resolve().parent.parent.parent / "config" / ".env"
+
+
+def load_env(override: bool = False) -> Path:
+    """
+    Carrega as variáveis de ambiente do .env.
+
+    Tenta o diretório atual e, depois, o backend/config/.env explicitamente
+    (para garantir no Windows/caminhos complexos).
+    Com override=True os valores do arquivo substituem os já carregados
+    (usado no recarregamento a quente do .env).
+    """
+    load_dotenv(override=override)
+
+    config_env = get_env_path()
+    if config_env.exists():
+        load_dotenv(config_env, override=override)
+    return config_env
@@ -0,0 +1,309 @@
+# chat/vector_index.py
+"""
+Índice vetorial (semântico) local por usuário, sobre o diário e as
+mensagens que o paciente escreveu no chat.
+
+Cada usuário tem uma pasta em CHAT_VECTOR_INDEX_DIR com:
+- meta.json     embedder e dimensão usados
+- vectors.f32   matriz (n, dim) float32, só de acréscimo (lida via memmap)
+- keys.i64      chave de cada linha (origem + id do objeto)
+- deleted.i64   linhas removidas (entradas apagadas ou editadas)
+
+Novas linhas são acrescentadas de forma incremental pelos signals de
+EntradaDiario e pelo ChatAPIView ao salvar o histórico. A busca é um
+produto matriz-vetor (cosseno, já que os vetores têm norma 1) seguido de
+um top-k com argpartition. Escritas usam um FileLock, então vários
+processos podem compartilhar a mesma pasta.
+"""
+import json
+import shutil
+import threading
+from collections import OrderedDict
+from pathlib import Path
+
+import numpy as np
+from django.conf import settings
+from django.utils import timezone
+from filelock import FileLock
+
+from apps.diario.models import EntradaDiario
+
+from .embeddings import get_embedder
+from .lexical_index import snippet
+from .models import HistoricoChat
+
+SOURCE_DIARIO = 0
+SOURCE_CHAT = 1
+
+
+def make_key(source: int, object_id: int) -> int:
+    return object_id * 2 + source
+
+
+def split_key(key: int) -> tuple[int, int]:
+    return key % 2, key // 2
+
+
+def _size(path: Path) -> int:
+    try:
+        return path.stat().st_size
+    except OSError:
+        return 0
+
+
+class _UserVectors:
+    """Arquivos de um usuário já abertos em memória (memmap)."""
+
+    def __init__(self, signature, matrix, keys, deleted_rows) -> None:
+        self.signature = signature
+        self.matrix = matrix
+        self.keys = keys
+        self.deleted_rows = deleted_rows
+
+
+class VectorIndex:
+    def __init__(self, base_dir=None, max_users: int = 256) -> None:
+        # Sem base_dir, usa CHAT_VECTOR_INDEX_DIR lido a cada uso (e não no
+        # import): os testes apontam a configuração para uma pasta temporária.
+        self._base_dir = Path(base_dir) if base_dir is not None else None
+        self.max_users = max_users
+        self._lock = threading.Lock()
+        # Arquivos abertos, por pasta do usuário
+        self._loaded: OrderedDict[Path, _UserVectors] = OrderedDict()
+
+    # -- arquivos ---------------------------------------------------------
+
+    @property
+    def base_dir(self) -> Path:
+        if self._base_dir is not None:
+            return self._base_dir
+        return Path(getattr(settings, 'CHAT_VECTOR_INDEX_DIR', Path(settings.BASE_DIR) / 'indices'))
+
+    def _dir(self, user_id) -> Path:
+        return self.base_dir / str(user_id)
+
+    def _file_lock(self, user_id) -> FileLock:
+        self.base_dir.mkdir(parents=True, exist_ok=True)
+        return FileLock(str(self.base_dir / f"{user_id}.lock"))
+
+    def _meta(self) -> dict:
+        embedder = get_embedder()
+        return {"embedder": embedder.name, "dim": embedder.dim}
+
+    def _is_built(self, user_id) -> bool:
+        meta_path = self._dir(user_id) / "meta.json"
+        if not meta_path.exists():
+            return False
+        with open(meta_path, encoding="utf-8") as f:
+            return json.load(f) == self._meta()
+
+    def _append_locked(self, user_id, keys: list[int], texts: list[str]) -> None:
+        if not keys:
+            return
+        folder = self._dir(user_id)
+        vectors = get_embedder().embed(texts).astype(np.float32, copy=False)
+        # Os vetores são gravados antes das chaves: quem lê usa o menor
+        # dos dois tamanhos e nunca enxerga uma linha pela metade.
+        with open(folder / "vectors.f32", "ab") as f:
+            f.write(vectors.tobytes())
+        with open(folder / "keys.i64", "ab") as f:
+            f.write(np.asarray(keys, dtype=np.int64).tobytes())
+
+    def _rebuild_locked(self, user_id) -> None:
+        folder = self._dir(user_id)
+        if folder.exists():
+            shutil.rmtree(folder)
+        folder.mkdir(parents=True)
+
+        entradas = (
+            EntradaDiario.objects
+            .filter(usuario_id=user_id)
+            .exclude(texto__isnull=True)
+            .exclude(texto='')
+            .values_list('id', 'texto')
+        )
+        mensagens = (
+            HistoricoChat.objects
+            .filter(usuario_id=user_id, role='user')
+            .values_list('id', 'content')
+        )
+
+        batch_keys, batch_texts = [], []
+        for source, rows in ((SOURCE_DIARIO, entradas), (SOURCE_CHAT, mensagens)):
+            for object_id, text in rows.iterator():
+                batch_keys.append(make_key(source, object_id))
+                batch_texts.append(text)
+                if len(batch_keys) >= 512:
+                    self._append_locked(user_id, batch_keys, batch_texts)
+                    batch_keys, batch_texts = [], []
+        self._append_locked(user_id, batch_keys, batch_texts)
+
+        # meta.json por último: marca o índice como completo
+        with open(folder / "meta.json", "w", encoding="utf-8") as f:
+            json.dump(self._meta(), f)
+
+    def build(self, user_id) -> None:
+        """(Re)constrói o índice do usuário a partir do banco."""
+        with self._file_lock(user_id):
+            self._rebuild_locked(user_id)
+        self._forget(user_id)
+
+    def ensure_built(self, user_id) -> None:
+        if self._is_built(user_id):
+            return
+        with self._file_lock(user_id):
+            if not self._is_built(user_id):
+                self._rebuild_locked(user_id)
+        self._forget(user_id)
+
+    def drop(self, user_id) -> None:
+        """Apaga o índice do usuário (ex: usuário removido)."""
+        with self._file_lock(user_id):
+            shutil.rmtree(self._dir(user_id), ignore_errors=True)
+        self._forget(user_id)
+
+    # -- atualização incremental -----------------------------------------
+
+    def add(self, user_id, source: int, items: list[tuple[int, str]]) -> None:
+        """
+        Acrescenta objetos (id, texto) ao índice do usuário. Se o índice
+        ainda não existe, não faz nada: ele será construído já com esses
+        dados na primeira busca.
+        """
+        items = [(object_id, text) for object_id, text in items if text]
+        if not items or not self._is_built(user_id):
+            return
+        with self._file_lock(user_id):
+            self._append_locked(
+                user_id,
+                [make_key(source, object_id) for object_id, _ in items],
+                [text for _, text in items],
+            )
+
+    def remove(self, user_id, source: int, object_ids: list[int]) -> None:
+        """Marca como removidas as linhas desses objetos."""
+        if not object_ids or not self._is_built(user_id):
+            return
+        state = self._load(user_id)
+        targets = np.asarray([make_key(source, i) for i in object_ids], dtype=np.int64)
+        rows = np.nonzero(np.isin(state.keys, targets))[0]
+        if rows.size == 0:
+            return
+        with self._file_lock(user_id):
+            with open(self._dir(user_id) / "deleted.i64", "ab") as f:
+                f.write(rows.astype(np.int64).tobytes())
+
+        # Muitas linhas mortas: reconstrói para não pesar na busca
+        if len(state.deleted_rows) + rows.size > max(len(state.keys) // 2, 1024):
+            self.build(user_id)
+
+    # -- leitura ------------------------------------------------------------
+
+    def _forget(self, user_id) -> None:
+        with self._lock:
+            self._loaded.pop(self._dir(user_id), None)
+
+    def _load(self, user_id) -> _UserVectors:
+        folder = self._dir(user_id)
+        dim = get_embedder().dim
+        signature = tuple(
+            _size(folder / name) for name in ("vectors.f32", "keys.i64", "deleted.i64")
+        )
+
+        with self._lock:
+            state = self._loaded.get(folder)
+            if state is not None and state.signature == signature:
+                self._loaded.move_to_end(folder)
+                return state
+
+        n_rows = min(signature[0] // (4 * dim), signature[1] // 8)
+        if n_rows:
+            matrix = np.memmap(folder / "vectors.f32", dtype=np.float32, mode="r", shape=(n_rows, dim))
+            keys = np.fromfile(folder / "keys.i64", dtype=np.int64, count=n_rows)
+        else:
+            matrix = np.zeros((0, dim), dtype=np.float32)
+            keys = np.zeros(0, dtype=np.int64)
+        deleted_rows = (
+            np.fromfile(folder / "deleted.i64", dtype=np.int64)
+            if signature[2] else np.zeros(0, dtype=np.int64)
+        )
+
+        state = _UserVectors(signature, matrix, keys, deleted_rows)
+        with self._lock:
+            self._loaded[folder] = state
+            self._loaded.move_to_end(folder)
+            while len(self._loaded) > self.max_users:
+                self._loaded.popitem(last=False)
+        return state
+
+    def search_many(self, user_id, queries: list[str], k: int = 3) -> list[list[tuple[float, int]]]:
+        """
+        Busca em lote: para cada consulta, até k pares (score, chave),
+        do mais parecido ao menos parecido.
+        """
+        self.ensure_built(user_id)
+        state = self._load(user_id)
+        if len(state.keys) == 0 or not queries:
+            return [[] for _ in queries]
+
+        q = get_embedder().embed(queries)
+        scores = q @ np.asarray(state.matrix).T  # (n_queries, n_rows)
+        if state.deleted_rows.size:
+            scores[:, state.deleted_rows[state.deleted_rows < scores.shape[1]]] = -np.inf
+
+        k = min(k, scores.shape[1])
+        results = []
+        for row in scores:
+            top = np.argpartition(-row, k - 1)[:k]
+            top = top[np.argsort(-row[top])]
+            results.append([
+                (float(row[i]), int(state.keys[i])) for i in top if np.isfinite(row[i])
+            ])
+        return results
+
+    def search(self, user_id, query: str, k: int = 3) -> list[tuple[float, int]]:
+        return self.search_many(user_id, [query], k)[0]
+
+
+vector_index = VectorIndex(max_users=getattr(settings, 'CHAT_VECTOR_INDEX_MAX_USERS', 256))
+
+
+def semantic_memories(user, query: str, k: int | None = None) -> list[str]:
+    """
+    Entradas do diário e mensagens antigas do paciente semanticamente
+    próximas de 'query', já formatadas para o contexto do modelo.
+    """
+    if k is None:
+        k = getattr(settings, 'CHAT_SEMANTIC_TOP_K', 3)
+    if k <= 0 or not getattr(settings, 'CHAT_VECTOR_INDEX_ENABLED', True):
+        return []
+
+    min_score = getattr(settings, 'CHAT_SEMANTIC_MIN_SCORE', 0.15)
+    hits = [
+        split_key(key)
+        for score, key in vector_index.search(user.pk, query, k)
+        if score >= min_score
+    ]
+    if not hits:
+        return []
+
+    diario_ids = [i for source, i in hits if source == SOURCE_DIARIO]
+    chat_ids = [i for source, i in hits if source == SOURCE_CHAT]
+
+    textos = {}
+    for entrada_id, texto, data in (
+        EntradaDiario.objects
+        .filter(usuario=user, id__in=diario_ids)
+        .values_list('id', 'texto', 'data_criacao')
+    ):
+        dia = timezone.localtime(data).strftime('%d/%m/%Y')
+        textos[(SOURCE_DIARIO, entrada_id)] = f"[Diário {dia}] {snippet(texto)}"
+    for msg_id, content, data in (
+        HistoricoChat.objects
+        .filter(usuario=user, id__in=chat_ids)
+        .values_list('id', 'content', 'timestamp')
+    ):
+        dia = timezone.localtime(data).strftime('%d/%m/%Y')
+        textos[(SOURCE_CHAT, msg_id)] = f"[Conversa {dia}] Paciente disse: {snippet(content)}"
+
+    return [textos[hit] for hit in hits if hit in textos]
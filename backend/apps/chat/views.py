@@ -1,24 +1,70 @@
 # backend/apps/chat/views.py
+from contextlib import closing, nullcontext
+from datetime import timedelta
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.http import StreamingHttpResponse
+from django.urls import reverse
 from django.utils import timezone
 
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework import status
-from rest_framework.permissions import IsAuthenticated
-
-from drf_spectacular.utils import extend_schema
+from rest_framework.permissions import IsAdminUser, IsAuthenticated
+from rest_framework.settings import api_settings
 
-from .models import HistoricoChat
-from .engine import ChatEngine
-from .serializers import ChatInputSerializer
+from drf_spectacular.utils import extend_schema, OpenApiParameter
 
-from apps.lembretes.models import Lembrete
-from apps.contatos.models import Contato
+from .admission import ChatSaturatedError, chat_admission
+from .archive import read_segment
+from .context import get_rag_context, get_rag_data, rag_fingerprint
+from .conversation import build_history, persist_turn, quick_answer
+from . import jobs
+from .history import InvalidCursor, history_page
+from .intents import intent_stats, is_intent
+from .models import ArquivoChat, BriefingDiario, TarefaChat, UsoTokens
+from .registry import get_engine
+from .renderers import EventStreamRenderer, format_sse
+from .resilience import FALLBACK_REPLY, CircuitOpenError, is_retryable, llm_breaker
+from .response_cache import response_cache
+from .routing import routing_snapshot
+from .serializers import (
+    ArquivoChatSerializer,
+    BriefingDiarioSerializer,
+    ChatInputSerializer,
+    SessaoChatSerializer,
+    TarefaChatSerializer,
+    UsoTokensSerializer,
+)
+from .sessions import start_session
+from .singleflight import chat_flights, flights_snapshot
+from .throttling import ChatRateThrottle
+from .tokens import TokenUsage
+from .usage import record_usage, token_plan, usage_totals
+from .write_buffer import history_buffer
 
 
 @extend_schema(
     request=ChatInputSerializer,
     responses={200: dict},
+    parameters=[
+        OpenApiParameter(
+            name='stream',
+            type=bool,
+            required=False,
+            description="Se '1', a resposta é enviada em streaming (Server-Sent Events).",
+        ),
+        OpenApiParameter(
+            name='async',
+            type=bool,
+            required=False,
+            description=(
+                "Se '1', o turno é enfileirado e a resposta (202) traz o id da tarefa; "
+                "o resultado é consultado em /api/chat/tarefas/<id>/."
+            ),
+        ),
+    ],
     description="Envia uma mensagem para o assistente, com histórico e contexto RAG."
 )
 class ChatAPIView(APIView):
@@ -26,92 +72,216 @@ class ChatAPIView(APIView):
     Endpoint da API para interagir com o ChatEngine.
     """
     permission_classes = [IsAuthenticated]
+    # Aceita também 'Accept: text/event-stream' (modo streaming)
+    renderer_classes = [*api_settings.DEFAULT_RENDERER_CLASSES, EventStreamRenderer]
+
+    def get_throttles(self):
+        # Só o envio de mensagens tem limite por usuário (ver throttling.py)
+        if self.request.method == 'POST':
+            return [ChatRateThrottle()]
+        return []
 
     def get_engine(self):
         """
-        Instancia o ChatEngine sob demanda.
-        Isso previne erros de carregamento de .env durante o 'migrate'.
+        Retorna o ChatEngine compartilhado pelo processo (criado uma vez e
+        reaproveitado entre requisições; ver chat/registry.py).
         """
-        if not hasattr(self, '_chat_engine'):
-            self._chat_engine = ChatEngine()
-        return self._chat_engine
+        return get_engine()
 
     def _get_rag_context(self, user, now):
         """
         Recupera lembretes do DIA ATUAL (passados e futuros) e contatos
         para montar um contexto textual para a IA.
+        Fica em cache por usuário/dia (ver chat/context.py).
+        """
+        return get_rag_context(user, now)
+
+    @extend_schema(
+        parameters=[
+            OpenApiParameter(
+                name='antes', type=str, required=False,
+                description="Cursor 'anteriores' da página anterior: devolve as mensagens mais antigas que ela.",
+            ),
+            OpenApiParameter(
+                name='limite', type=int, required=False,
+                description="Mensagens por página (padrão: CHAT_HISTORY_PAGE_SIZE).",
+            ),
+        ],
+    )
+    def get(self, request, *args, **kwargs):
+        """
+        Retorna o histórico da conversa atual do usuário (ver chat/sessions.py),
+        paginado das mensagens mais novas para as mais antigas: cada página vem
+        em ordem cronológica e 'anteriores' é o cursor da página seguinte
+        (None quando não há mais mensagens).
         """
-        
-        # Converte para o horário local para filtrar corretamente pelo "dia de hoje"
-        today_local = timezone.localtime(now).date()
-
-        # 1. Recuperar lembretes:
-        # Filtramos por DATA igual a hoje (data_hora__date=today_local).
-        # Assim pegamos lembretes das 08:00 mesmo se agora forem 20:00.
-        lembretes = (
-            Lembrete.objects
-            .filter(
-                usuario=user, 
-                concluido=False, 
-                data_hora__date=today_local 
+        page_size = getattr(settings, 'CHAT_HISTORY_PAGE_SIZE', 50)
+        try:
+            limit = int(request.query_params.get('limite', page_size))
+        except ValueError:
+            return Response(
+                {"limite": ["Informe um número inteiro de mensagens."]},
+                status=status.HTTP_400_BAD_REQUEST,
             )
-            .order_by('data_hora')
+        limit = min(max(limit, 1), getattr(settings, 'CHAT_HISTORY_MAX_PAGE_SIZE', 200))
+
+        # Leia o que escreveu: o último turno pode estar no buffer de escrita
+        history_buffer.ensure_persisted(request.user.pk)
+        try:
+            rows, older = history_page(request.user, request.query_params.get('antes'), limit)
+        except InvalidCursor:
+            return Response({"antes": ["Cursor inválido."]}, status=status.HTTP_400_BAD_REQUEST)
+
+        return Response({"mensagens": rows, "anteriores": older}, status=status.HTTP_200_OK)
+
+    def _build_history(self, user, user_input, now, system_prompt, prompt_budget=None):
+        """
+        Monta a lista de mensagens enviada ao modelo
+        (ver chat/conversation.py).
+        """
+        return build_history(user, user_input, now, system_prompt, prompt_budget)
+
+    def _persist_turn(self, user, user_input, answer):
+        """
+        Salva a mensagem do usuário e a resposta da IA.
+        """
+        persist_turn(user, user_input, answer)
+
+    def _unavailable_response(self, exc):
+        """
+        Resposta rápida quando o provedor do modelo está fora do ar (circuito
+        aberto ou retries esgotados) ou o assistente está sobrecarregado
+        (ver admission.py): 503 com uma mensagem amigável para o paciente
+        e Retry-After. Esse turno não é salvo no histórico.
+        """
+        retry_after = getattr(exc, 'retry_after', None) or llm_breaker.retry_after() or 5
+        response = Response(
+            {"resposta": getattr(exc, 'reply', FALLBACK_REPLY), "error": f"Erro na IA: {str(exc)}"},
+            status=status.HTTP_503_SERVICE_UNAVAILABLE,
         )
+        response['Retry-After'] = str(int(retry_after + 0.999))
+        return response
 
-        contatos = Contato.objects.filter(usuario=user, is_emergencia=True)
-
-        # Definição do nome do paciente
-        nome_paciente = user.first_name if user.first_name else user.username
-
-        # 2. Montar o texto do contexto
-        context_parts = []
-        
-        # Cabeçalho do Contexto
-        context_parts.append(f"Nome do Paciente: {nome_paciente}")
-        context_parts.append(f"Data/Hora Atual: {timezone.localtime(now).strftime('%d/%m/%Y %H:%M')}")
-
-        # Lista de Lembretes
-        if lembretes.exists():
-            context_parts.append("\nAGENDA DE HOJE (PENDENTES/ATIVOS):")
-            for lem in lembretes:
-                # Formata hora limpa (ex: 14:30)
-                hora_local = timezone.localtime(lem.data_hora).strftime('%H:%M')
-                # Ex: - [14:30] Tomar remédio X (Medicamento)
-                context_parts.append(
-                    f"- [{hora_local}] {lem.titulo} (Tipo: {lem.get_tipo_display()})"
-                )
-        else:
-            context_parts.append("\nNão há lembretes agendados para hoje.")
-
-        # Lista de Contatos
-        if contatos.exists():
-            context_parts.append("\nCONTATOS DE EMERGÊNCIA:")
-            for c in contatos:
-                context_parts.append(
-                    f"- Nome: {c.nome}, Telefone: {c.telefone}"
-                )
+    def _wants_async(self, request):
+        value = request.query_params.get('async')
+        if value is not None:
+            return value in ('1', 'true')
+        # Modo assíncrono como padrão (CHAT_ASYNC_MODE), exceto para streaming
+        return getattr(settings, 'CHAT_ASYNC_MODE', False) and not self._wants_stream(request)
 
-        return "\n".join(context_parts)
+    def _enqueue_response(self, user, user_input):
+        """Enfileira o turno para os workers e responde na hora (202)."""
+        job = jobs.enqueue(user, user_input)
+        url = reverse('chat-tarefa', args=[job.id])
+        response = Response(
+            {"tarefa": job.id, "status": job.status, "url": url},
+            status=status.HTTP_202_ACCEPTED,
+        )
+        response['Location'] = url
+        return response
 
-    def get(self, request, *args, **kwargs):
+    def _wants_stream(self, request):
+        if request.query_params.get('stream') in ('1', 'true'):
+            return True
+        return getattr(request.accepted_renderer, 'format', None) == EventStreamRenderer.format
+
+    def _error_event(self, exc, partial):
+        data = {"error": f"Erro na IA: {str(exc)}"}
+        if not partial and (isinstance(exc, (CircuitOpenError, ChatSaturatedError)) or is_retryable(exc)):
+            data["resposta"] = getattr(exc, 'reply', FALLBACK_REPLY)
+        return format_sse('error', data)
+
+    def _stream_response(self, engine, user, user_input):
         """
-        Retorna o histórico de conversas do usuário.
+        Repassa os tokens do modelo como eventos SSE:
+        - 'token': {"delta": "..."} para cada pedaço da resposta
+        - 'done':  {"resposta": "..."} com a resposta completa
+        - 'error': {"error": "..."} se a IA falhar
+
+        O turno é persistido ao final do stream, inclusive se o cliente
+        desconectar no meio (o servidor fecha o gerador -> 'finally').
+        Um turno idêntico já em andamento não gera outra chamada ao
+        modelo: a resposta dele chega de uma vez ao final (ver singleflight.py).
+        Respostas que não precisam do modelo (ver conversation.quick_answer)
+        chegam num único 'token'.
         """
-        history_qs = HistoricoChat.objects.filter(usuario=request.user)
-        
-        data = []
-        for h in history_qs:
-            if h.role == 'system':
-                continue
-                
-            data.append({
-                "id": h.id,
-                "role": h.role,
-                "content": h.content,
-                "timestamp": h.timestamp
-            })
-            
-        return Response(data, status=status.HTTP_200_OK)
+        def event_stream():
+            flight, leader = chat_flights.begin(user.pk, user_input)
+            if not leader:
+                try:
+                    answer = chat_flights.wait(flight)
+                except Exception as e:
+                    yield self._error_event(e, partial=False)
+                    return
+                yield format_sse('token', {"delta": answer})
+                yield format_sse('done', {"resposta": answer})
+                return
+
+            parts = []
+            answer = ""
+            error = None
+            usage = None
+            # Vaga para chamar o modelo (ver admission.py), obtida antes da vez
+            # do usuário: um turno recusado não segura os outros turnos dele
+            slot = nullcontext() if is_intent(user_input) else chat_admission.slot()
+            try:
+                # Um turno por vez: o prompt só é montado depois que o
+                # turno anterior do usuário foi salvo
+                with slot, chat_flights.user_turn(user.pk):
+                    try:
+                        now = timezone.now()
+                        quick, cache_key = quick_answer(user, user_input, now)
+                        if quick is not None:
+                            parts.append(quick)
+                            yield format_sse('token', {"delta": quick})
+                        else:
+                            # Perto do orçamento diário de tokens, um turno mais barato
+                            plan = token_plan(user, now)
+                            history_list = self._build_history(
+                                user, user_input, now, engine.system_prompt, plan.prompt_budget
+                            )
+                            usage = TokenUsage()
+                            # closing: o uso é contado mesmo se o cliente desconectar
+                            with closing(engine.stream_message(
+                                user_input, history_list, plan.max_tokens, usage
+                            )) as stream:
+                                for delta in stream:
+                                    parts.append(delta)
+                                    yield format_sse('token', {"delta": delta})
+                            # Só respostas completas vão para o cache
+                            response_cache.put(cache_key, "".join(parts).strip())
+                    except Exception as e:
+                        error = e
+                        yield self._error_event(e, partial=bool(parts))
+                    finally:
+                        answer = "".join(parts).strip()
+                        if answer:
+                            self._persist_turn(user, user_input, answer)
+                        if usage is not None:
+                            record_usage(user, now, usage)
+            except ChatSaturatedError as e:
+                error = e
+                yield self._error_event(e, partial=False)
+            finally:
+                # Resposta cortada por erro não vale para quem repetir a pergunta
+                if answer and error is None:
+                    chat_flights.finish(user.pk, user_input, flight, result=answer)
+                else:
+                    chat_flights.finish(
+                        user.pk, user_input, flight,
+                        error=error or RuntimeError("Turno interrompido antes da resposta."),
+                    )
+            if error is None:
+                yield format_sse('done', {"resposta": answer})
+
+        response = StreamingHttpResponse(
+            event_stream(),
+            content_type='text/event-stream; charset=utf-8',
+        )
+        # Evita que proxies (ex: nginx) acumulem os eventos antes de enviar
+        response['Cache-Control'] = 'no-cache'
+        response['X-Accel-Buffering'] = 'no'
+        return response
 
     def post(self, request, *args, **kwargs):
         # 1. Validar o JSON de entrada
@@ -124,43 +294,347 @@ class ChatAPIView(APIView):
 
         user = request.user
         user_input = serializer.validated_data["message"]
-        now = timezone.now()
 
-        # 2. Recuperar histórico do usuário
-        history_qs = HistoricoChat.objects.filter(usuario=user)
-        history_list = [h.to_dict() for h in history_qs]
-
-        # 3. Gerar contexto RAG atualizado
-        rag_context = self._get_rag_context(user, now)
-
-        # Injetamos o contexto atualizado como uma instrução de sistema
-        # imediatamente antes da resposta da IA, para garantir prioridade.
-        history_list.append({
-            "role": "system",
-            "content": (
-                "--- CONTEXTO ATUALIZADO (RAG) ---\n"
-                "Use as informações abaixo se forem relevantes para responder ao usuário:\n"
-                f"{rag_context}\n"
-                "-----------------------------------"
-            ),
-        })
+        # Modo assíncrono: o modelo é chamado pelos workers da fila
+        if self._wants_async(request):
+            return self._enqueue_response(user, user_input)
 
-        # 4. Chamada ao modelo
         try:
             engine = self.get_engine()
-            answer = engine.send_message(user_input, history_list)
         except Exception as e:
             return Response(
                 {"error": f"Erro na IA: {str(e)}"},
                 status=status.HTTP_500_INTERNAL_SERVER_ERROR,
             )
 
-        # 5. Persistir histórico
-        # Salvamos apenas o que foi dito, não o contexto técnico injetado
-        HistoricoChat.objects.bulk_create([
-            HistoricoChat(usuario=user, role='user', content=user_input),
-            HistoricoChat(usuario=user, role='assistant', content=answer),
-        ])
+        # Modo streaming (SSE): o primeiro token chega sem esperar a resposta toda
+        if self._wants_stream(request):
+            # Circuito aberto ou assistente sobrecarregado: falha na hora,
+            # antes de abrir o stream (perguntas do atalho não dependem do modelo)
+            if not is_intent(user_input):
+                if llm_breaker.is_open():
+                    return self._unavailable_response(CircuitOpenError(llm_breaker.retry_after()))
+                try:
+                    chat_admission.check()
+                except ChatSaturatedError as e:
+                    return self._unavailable_response(e)
+            return self._stream_response(engine, user, user_input)
+
+        def answer_turn():
+            now = timezone.now()
+            # Perguntas estruturadas ("o que tenho hoje?"), o briefing do dia
+            # e perguntas repetidas saem sem chamar o modelo
+            answer, cache_key = quick_answer(user, user_input, now)
+            if answer is None:
+                # Perto do orçamento diário de tokens, um turno mais barato
+                plan = token_plan(user, now)
+                # 2. Recuperar histórico recente do usuário + 3. contexto RAG atualizado
+                history_list = self._build_history(
+                    user, user_input, now, engine.system_prompt, plan.prompt_budget
+                )
+                # 4. Chamada ao modelo (com timeout, retries e circuit breaker)
+                usage = TokenUsage()
+                answer = engine.send_message(user_input, history_list, plan.max_tokens, usage)
+                record_usage(user, now, usage)
+                response_cache.put(cache_key, answer)
+            # 5. Persistir histórico
+            self._persist_turn(user, user_input, answer)
+            return answer
+
+        # Turnos idênticos simultâneos (toque duplo, retry do app) dividem
+        # uma única chamada; turnos diferentes do usuário vão em sequência.
+        # A vaga para chamar o modelo vem antes da vez do usuário; sem vaga,
+        # 503 na hora (ver admission.py). O atalho de intenções não precisa dela.
+        slot = None if is_intent(user_input) else chat_admission.slot()
+        try:
+            answer, _ = chat_flights.do(user.pk, user_input, answer_turn, slot=slot)
+        except (CircuitOpenError, ChatSaturatedError) as e:
+            return self._unavailable_response(e)
+        except Exception as e:
+            if is_retryable(e):
+                return self._unavailable_response(e)
+            return Response(
+                {"error": f"Erro na IA: {str(e)}"},
+                status=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            )
 
         # 6. Retornar resposta
-        return Response({"resposta": answer}, status=status.HTTP_200_OK)
\ No newline at end of file
+        return Response({"resposta": answer}, status=status.HTTP_200_OK)
+
+
+@extend_schema(
+    request=ChatInputSerializer,
+    responses={(200, 'text/event-stream'): str},
+    description=(
+        "Versão em streaming do chat: a resposta chega em eventos SSE "
+        "('token', 'done' ou 'error') conforme o modelo gera o texto."
+    ),
+)
+class ChatStreamAPIView(ChatAPIView):
+    """
+    Mesmo fluxo do ChatAPIView, mas sempre respondendo em streaming (SSE).
+    """
+
+    def _wants_stream(self, request):
+        return True
+
+    def _wants_async(self, request):
+        return False
+
+
+@extend_schema(
+    responses={200: TarefaChatSerializer},
+    parameters=[
+        OpenApiParameter(
+            name='esperar',
+            type=float,
+            required=False,
+            description=(
+                "Long-polling: segundos a esperar a tarefa terminar antes de responder "
+                "(limitado por CHAT_JOB_MAX_WAIT)."
+            ),
+        ),
+    ],
+    description="Consulta uma tarefa do chat enfileirada no modo assíncrono.",
+)
+class ChatTarefaAPIView(APIView):
+    """
+    Resultado de um turno enfileirado ('pendente', 'processando',
+    'concluida' ou 'erro'). Só o dono da tarefa pode consultá-la.
+
+    Responde na hora: ?esperar=N espera no máximo CHAT_JOB_SYNC_MAX_WAIT
+    segundos, para não prender o worker WSGI (o long-polling longo fica
+    na view async, GET /api/chat/async/tarefas/<id>/). Enquanto a tarefa
+    não termina, o header Retry-After indica quando consultar de novo.
+    """
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request, pk, *args, **kwargs):
+        try:
+            wait = float(request.query_params.get('esperar', 0))
+        except ValueError:
+            return Response(
+                {"esperar": ["Informe um número de segundos."]},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        wait = min(max(wait, 0.0), getattr(settings, 'CHAT_JOB_SYNC_MAX_WAIT', 1))
+
+        try:
+            job = jobs.wait_for(pk, request.user, wait)
+        except TarefaChat.DoesNotExist:
+            return Response({"detail": "Tarefa não encontrada."}, status=status.HTTP_404_NOT_FOUND)
+
+        response = Response(TarefaChatSerializer(job).data, status=status.HTTP_200_OK)
+        retry_after = jobs.retry_after(job)
+        if retry_after is not None:
+            response['Retry-After'] = str(retry_after)
+        return response
+
+
+@extend_schema(
+    request=None,
+    responses={201: SessaoChatSerializer},
+    description=(
+        "Começa uma conversa nova: o histórico do chat e o prompt do modelo "
+        "passam a usar só as mensagens dela. Nada é apagado."
+    ),
+)
+class ChatSessaoAPIView(APIView):
+    """
+    "Nova conversa": cria uma sessão do chat para o usuário logado. Custa
+    um INSERT, não importa o tamanho do histórico.
+    """
+    permission_classes = [IsAuthenticated]
+
+    def post(self, request, *args, **kwargs):
+        sessao = start_session(request.user)
+        return Response(SessaoChatSerializer(sessao).data, status=status.HTTP_201_CREATED)
+
+
+@extend_schema(
+    parameters=[
+        OpenApiParameter(
+            name='antes', type=int, required=False,
+            description="Cursor 'anteriores' da página anterior: devolve os segmentos mais antigos que ela.",
+        ),
+    ],
+    description=(
+        "Segmentos arquivados do histórico do chat (mensagens antigas, ver "
+        "comando 'arquivar_historico'), do mais novo para o mais antigo."
+    ),
+)
+class ChatArquivoAPIView(APIView):
+    """
+    Lista os segmentos do histórico arquivado do usuário logado, sem o
+    conteúdo: cada um é lido sob demanda em /api/chat/arquivo/<id>/.
+    """
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request, *args, **kwargs):
+        try:
+            before = int(request.query_params['antes']) if 'antes' in request.query_params else None
+        except ValueError:
+            return Response({"antes": ["Cursor inválido."]}, status=status.HTTP_400_BAD_REQUEST)
+
+        limit = getattr(settings, 'CHAT_ARCHIVE_PAGE_SIZE', 20)
+        qs = ArquivoChat.objects.filter(usuario=request.user)
+        if before is not None:
+            qs = qs.filter(id__lt=before)
+        segments = list(qs.only('id', 'inicio', 'fim', 'mensagens').order_by('-id')[:limit + 1])
+
+        older = segments[limit - 1].id if len(segments) > limit else None
+        return Response(
+            {
+                "segmentos": ArquivoChatSerializer(segments[:limit], many=True).data,
+                "anteriores": older,
+            },
+            status=status.HTTP_200_OK,
+        )
+
+
+@extend_schema(
+    description="Mensagens de um segmento do histórico arquivado, em ordem cronológica.",
+)
+class ChatArquivoSegmentoAPIView(APIView):
+    """Lê (descomprime) um segmento do histórico arquivado do usuário logado."""
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request, pk, *args, **kwargs):
+        segment = ArquivoChat.objects.filter(usuario=request.user, pk=pk).first()
+        if segment is None:
+            return Response({"detail": "Segmento não encontrado."}, status=status.HTTP_404_NOT_FOUND)
+
+        return Response(
+            {
+                "segmento": ArquivoChatSerializer(segment).data,
+                "mensagens": [
+                    {key: row[key] for key in ('id', 'role', 'content', 'timestamp')}
+                    for row in read_segment(segment)
+                ],
+            },
+            status=status.HTTP_200_OK,
+        )
+
+
+@extend_schema(
+    responses={200: BriefingDiarioSerializer},
+    description=(
+        "Briefing do dia (saudação + agenda), gerado em lote pelo comando "
+        "'gerar_briefings'. 404 se ainda não foi gerado."
+    ),
+)
+class ChatBriefingAPIView(APIView):
+    """
+    Briefing diário do usuário logado, para o dashboard mostrar sem
+    esperar o modelo.
+    """
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request, *args, **kwargs):
+        now = timezone.now()
+        briefing = BriefingDiario.objects.filter(
+            usuario=request.user, data=timezone.localtime(now).date()
+        ).first()
+        if briefing is None:
+            return Response(
+                {"detail": "O briefing de hoje ainda não foi gerado."},
+                status=status.HTTP_404_NOT_FOUND,
+            )
+
+        fingerprint = rag_fingerprint(get_rag_data(request.user, now))
+        serializer = BriefingDiarioSerializer(briefing, context={"contexto_hash": fingerprint})
+        return Response(serializer.data, status=status.HTTP_200_OK)
+
+
+@extend_schema(
+    responses={200: dict},
+    parameters=[
+        OpenApiParameter(
+            name='dias', type=int, required=False,
+            description="Quantos dias de histórico de uso devolver (padrão: 7, máximo: 90).",
+        ),
+        OpenApiParameter(
+            name='usuario', type=str, required=False,
+            description="Username de outro paciente (só administradores).",
+        ),
+    ],
+    description=(
+        "Tokens do modelo gastos pelo usuário por dia e situação do orçamento "
+        "diário ('normal', 'reduzido' ou 'esgotado')."
+    ),
+)
+class ChatUsoAPIView(APIView):
+    """
+    Uso de tokens do usuário logado (ou, para administradores, de
+    qualquer usuário via ?usuario=): orçamento de hoje e gasto por dia.
+    """
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request, *args, **kwargs):
+        try:
+            days = min(max(int(request.query_params.get('dias', 7)), 1), 90)
+        except ValueError:
+            return Response(
+                {"dias": ["Informe um número inteiro de dias."]},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        user = request.user
+        username = request.query_params.get('usuario')
+        if username and username != user.username:
+            if not user.is_staff:
+                return Response(
+                    {"detail": "Só administradores podem consultar o uso de outro usuário."},
+                    status=status.HTTP_403_FORBIDDEN,
+                )
+            user = User.objects.filter(username=username).first()
+            if user is None:
+                return Response({"detail": "Usuário não encontrado."}, status=status.HTTP_404_NOT_FOUND)
+
+        now = timezone.now()
+        since = timezone.localdate(now) - timedelta(days=days - 1)
+        rows = UsoTokens.objects.filter(usuario=user, data__gte=since)
+        return Response(
+            {
+                "hoje": token_plan(user, now).snapshot(),
+                "dias": UsoTokensSerializer(rows, many=True).data,
+            },
+            status=status.HTTP_200_OK,
+        )
+
+
+@extend_schema(
+    responses={200: dict},
+    description=(
+        "Estado do assistente (circuit breaker do provedor do modelo, fila do "
+        "modo assíncrono, turnos coalescidos, perguntas respondidas sem o "
+        "modelo, cache de respostas, latência por endpoint do modelo, tokens "
+        "gastos hoje e vagas de chamada ao modelo). "
+        "Só para administradores."
+    ),
+)
+class ChatStatusAPIView(APIView):
+    """
+    Monitoramento do chat: estado do circuit breaker do provedor,
+    tamanho da fila de tarefas, turnos coalescidos e taxas de acerto do
+    atalho de intenções e do cache de respostas, latência/hedging
+    por endpoint do modelo, tokens gastos no dia, controle de admissão e
+    buffer de escrita do histórico.
+    """
+    permission_classes = [IsAdminUser]
+
+    def get(self, request, *args, **kwargs):
+        return Response(
+            {
+                "llm": llm_breaker.snapshot(),
+                "fila": jobs.queue_stats(),
+                "coalescencia": flights_snapshot(),
+                "intencoes": intent_stats(),
+                "cache_respostas": response_cache.snapshot(),
+                "roteamento": routing_snapshot(),
+                "uso_tokens_hoje": usage_totals(timezone.now()),
+                "admissao": chat_admission.snapshot(),
+                "escrita_historico": history_buffer.snapshot(),
+            },
+            status=status.HTTP_200_OK,
+        )
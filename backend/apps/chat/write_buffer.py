@@ -0,0 +1,245 @@
+# chat/write_buffer.py
+"""
+Gravação adiada (write-behind) do histórico do chat.
+
+Sem o buffer, cada turno faz sua própria transação (INSERT das duas
+mensagens + COMMIT). Com CHAT_HISTORY_WRITE_BEHIND ligado, persist_turn só
+coloca o turno numa fila em memória; uma thread do processo grava a fila
+inteira num único bulk_create dentro de uma transação quando ela chega a
+CHAT_HISTORY_BUFFER_MAX_TURNS turnos ou quando o turno mais antigo espera
+CHAT_HISTORY_BUFFER_MAX_DELAY segundos. No SQLite, onde cada COMMIT é um
+fsync e as escritas são serializadas, isso multiplica a vazão de escrita.
+
+Garantias:
+- Leia o que escreveu: antes de ler o histórico de um usuário (GET do
+  chat, janela do prompt, briefing) chamamos ensure_persisted(), que grava
+  na hora os turnos pendentes daquele usuário. Vale dentro do processo; em
+  outro processo a mensagem aparece em até CHAT_HISTORY_BUFFER_MAX_DELAY.
+- Ordem: cada mensagem guarda o horário do turno (definido ao enfileirar,
+  ver conversation._turn_rows), e não o do flush, então a ordem e o
+  cursor (timestamp, id) do histórico valem também para turnos gravados
+  em lote.
+- Desligamento: a fila só é gravada no atexit, numa saída normal do
+  processo (inclusive o SIGTERM do gunicorn). Um processo morto sem
+  chance de rodar o atexit (SIGKILL, OOM killer, timeout do worker no
+  gunicorn) perde os turnos ainda na fila: no máximo os dos últimos
+  CHAT_HISTORY_BUFFER_MAX_DELAY segundos.
+
+Como o bulk_create não dispara signals, a fala do paciente entra no índice
+vetorial logo depois do COMMIT, como no persist_turn sem buffer.
+"""
+import atexit
+import logging
+import threading
+import time
+from collections import defaultdict
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import IntegrityError, close_old_connections, transaction
+
+from .models import HistoricoChat
+from .vector_index import SOURCE_CHAT, vector_index
+
+logger = logging.getLogger(__name__)
+
+
+def write_behind_enabled() -> bool:
+    return getattr(settings, 'CHAT_HISTORY_WRITE_BEHIND', False)
+
+
+class _Turn:
+    """Um turno esperando para ser gravado."""
+    __slots__ = ("user_id", "rows", "user_input", "queued_at")
+
+    def __init__(self, user_id, rows, user_input) -> None:
+        self.user_id = user_id
+        self.rows = rows
+        self.user_input = user_input
+        self.queued_at = time.monotonic()
+
+
+class HistoryWriteBuffer:
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._wakeup = threading.Condition(self._lock)
+        # Só um flush por vez: quem precisa ler espera o lote em andamento
+        self._flush_lock = threading.Lock()
+        self._pending: list[_Turn] = []
+        # Turnos ainda não gravados por usuário (na fila ou no lote em andamento)
+        self._unsaved: dict[int, int] = defaultdict(int)
+        self._thread: threading.Thread | None = None
+        self._stopping = False
+        self._batches = 0
+        self._rows_written = 0
+        self._largest_batch = 0
+        self._failures = 0
+        self._dropped = 0
+
+    @staticmethod
+    def _max_turns() -> int:
+        return getattr(settings, 'CHAT_HISTORY_BUFFER_MAX_TURNS', 100)
+
+    @staticmethod
+    def _max_delay() -> float:
+        return getattr(settings, 'CHAT_HISTORY_BUFFER_MAX_DELAY', 0.5)
+
+    # -- fila ------------------------------------------------------------------
+
+    def add(self, user_id, rows: list[HistoricoChat], user_input: str) -> None:
+        """Enfileira as mensagens de um turno (não toca no banco)."""
+        with self._lock:
+            self._pending.append(_Turn(user_id, rows, user_input))
+            self._unsaved[user_id] += 1
+            self._start_locked()
+            # Primeiro da fila (a thread passa a contar o prazo) ou lote cheio
+            if len(self._pending) == 1 or len(self._pending) >= self._max_turns():
+                self._wakeup.notify()
+
+    def has_pending(self, user_id) -> bool:
+        with self._lock:
+            return self._unsaved.get(user_id, 0) > 0
+
+    def ensure_persisted(self, user_id) -> None:
+        """Leia o que escreveu: grava agora os turnos pendentes do usuário."""
+        if self.has_pending(user_id):
+            self.flush()
+
+    async def aensure_persisted(self, user_id) -> None:
+        """Versão assíncrona de ensure_persisted (só sai do loop se houver o que gravar)."""
+        if self.has_pending(user_id):
+            await sync_to_async(self.flush)()
+
+    # -- gravação --------------------------------------------------------------
+
+    def flush(self) -> int:
+        """Grava tudo o que está na fila numa transação. Retorna os turnos gravados."""
+        with self._flush_lock:
+            with self._lock:
+                batch, self._pending = self._pending, []
+            if not batch:
+                return 0
+
+            try:
+                saved = self._write(batch)
+            except IntegrityError:
+                # Um turno inválido (ex: usuário apagado) não derruba o lote
+                saved = self._write_one_by_one(batch)
+            except Exception:
+                logger.exception("Erro ao gravar %d turno(s) do chat; nova tentativa no próximo lote", len(batch))
+                self._reset(batch)
+                with self._lock:
+                    self._pending[:0] = batch
+                    self._failures += 1
+                return 0
+
+            self._index(saved)
+            with self._lock:
+                for turn in batch:
+                    self._unsaved[turn.user_id] -= 1
+                    if self._unsaved[turn.user_id] <= 0:
+                        del self._unsaved[turn.user_id]
+                self._batches += 1
+                self._rows_written += sum(len(turn.rows) for turn in saved)
+                self._largest_batch = max(self._largest_batch, len(saved))
+                self._dropped += len(batch) - len(saved)
+            return len(saved)
+
+    @staticmethod
+    def _write(batch: list[_Turn]) -> list[_Turn]:
+        with transaction.atomic():
+            HistoricoChat.objects.bulk_create([row for turn in batch for row in turn.rows])
+        return batch
+
+    @staticmethod
+    def _reset(batch: list[_Turn]) -> None:
+        # Ids atribuídos dentro da transação desfeita não valem mais
+        for turn in batch:
+            for row in turn.rows:
+                row.pk = None
+                row._state.adding = True
+
+    @classmethod
+    def _write_one_by_one(cls, batch: list[_Turn]) -> list[_Turn]:
+        cls._reset(batch)
+        saved = []
+        for turn in batch:
+            try:
+                with transaction.atomic():
+                    HistoricoChat.objects.bulk_create(turn.rows)
+            except IntegrityError:
+                logger.exception("Turno do chat descartado (usuário %s)", turn.user_id)
+                continue
+            saved.append(turn)
+        return saved
+
+    @staticmethod
+    def _index(saved: list[_Turn]) -> None:
+        items_by_user = defaultdict(list)
+        for turn in saved:
+            user_msg = turn.rows[0]
+            if user_msg.id is not None:
+                items_by_user[turn.user_id].append((user_msg.id, turn.user_input))
+        for user_id, items in items_by_user.items():
+            vector_index.add(user_id, SOURCE_CHAT, items)
+
+    # -- thread de gravação ----------------------------------------------------
+
+    def _start_locked(self) -> None:
+        if self._thread is not None or self._stopping:
+            return
+        self._thread = threading.Thread(target=self._run, name="chat-write-behind", daemon=True)
+        self._thread.start()
+        atexit.register(self.close)
+
+    def _due_locked(self) -> bool:
+        if not self._pending:
+            return False
+        if len(self._pending) >= self._max_turns():
+            return True
+        return time.monotonic() - self._pending[0].queued_at >= self._max_delay()
+
+    def _run(self) -> None:
+        while True:
+            with self._lock:
+                while not self._stopping and not self._due_locked():
+                    if self._pending:
+                        timeout = self._max_delay() - (time.monotonic() - self._pending[0].queued_at)
+                    else:
+                        timeout = None
+                    self._wakeup.wait(timeout)
+                if self._stopping:
+                    return
+            close_old_connections()
+            failures = self._failures
+            self.flush()
+            with self._lock:
+                if self._failures != failures and not self._stopping:
+                    # Banco indisponível: espera um intervalo antes de tentar de novo
+                    self._wakeup.wait(self._max_delay())
+
+    def close(self) -> None:
+        """Para a thread e grava o que ainda estiver na fila (chamado no atexit)."""
+        with self._lock:
+            self._stopping = True
+            self._wakeup.notify_all()
+            thread = self._thread
+        if thread is not None and thread is not threading.current_thread():
+            thread.join(timeout=5)
+        self.flush()
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {
+                "ativo": write_behind_enabled(),
+                "pendentes": len(self._pending),
+                "lotes": self._batches,
+                "mensagens_gravadas": self._rows_written,
+                "maior_lote": self._largest_batch,
+                "falhas": self._failures,
+                "descartados": self._dropped,
+            }
+
+
+# Buffer compartilhado pelo processo (views síncronas, async e workers)
+history_buffer = HistoryWriteBuffer()
@@ -0,0 +1,19 @@
+# Generated by Django 5.2.8 on 2026-10-18 09:57
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('contatos', '0001_initial'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='contato',
+            index=models.Index(condition=models.Q(('is_emergencia', True)), fields=['usuario'], name='contato_usuario_emergencia'),
+        ),
+    ]
@@ -15,5 +15,16 @@ class Contato(models.Model):
     
     criado_em = models.DateTimeField(auto_now_add=True)
 
+    class Meta:
+        indexes = [
+            # Contatos de emergência no contexto do chat (parcial, como o de
+            # lembretes pendentes: o filtro vira só 'is_emergencia' no SQL)
+            models.Index(
+                fields=['usuario'],
+                condition=models.Q(is_emergencia=True),
+                name='contato_usuario_emergencia',
+            ),
+        ]
+
     def __str__(self):
         return f"{self.nome} ({self.usuario.username})"
\ No newline at end of file
@@ -1,7 +1,9 @@
 from rest_framework import serializers
+
+from apps.core.serializers import SparseFieldsMixin
 from .models import Contato
 
-class ContatoSerializer(serializers.ModelSerializer):
+class ContatoSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     usuario_username = serializers.ReadOnlyField(source='usuario.username')
 
     class Meta:
@@ -2,21 +2,25 @@ from rest_framework import viewsets, permissions
 
 from .models import Contato
 from .serializers import ContatoSerializer
+from apps.core.mixins import BulkOperationsMixin, LeanListMixin
 from apps.core.permissions import IsOwner
 
 
-class ContatoViewSet(viewsets.ModelViewSet):
+class ContatoViewSet(BulkOperationsMixin, LeanListMixin, viewsets.ModelViewSet):
     """
     API endpoint que permite Contatos serem vistos ou editados.
+    Em lote: POST/PATCH em /contatos/lote/.
     """
     serializer_class = ContatoSerializer
     permission_classes = [permissions.IsAuthenticated, IsOwner]
+    # Ordem das páginas (paginação por cursor, ver apps/core/pagination.py)
+    ordering = ('id',)
 
     def get_queryset(self):
         """
         Retorna apenas os contatos do usuário logado.
         """
-        return Contato.objects.filter(usuario=self.request.user)
+        return Contato.objects.filter(usuario=self.request.user).select_related('usuario')
 
     def perform_create(self, serializer):
         """
@@ -0,0 +1,199 @@
+# core/mixins.py
+"""
+Mixins compartilhados pelos ViewSets de lembretes, contatos e diário.
+"""
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F, FileField
+from rest_framework import serializers, status
+from rest_framework.decorators import action
+from rest_framework.exceptions import ValidationError
+from rest_framework.response import Response
+
+from .signals import bulk_saved
+
+
+class LeanListMixin:
+    """
+    list() sem instanciar os modelos: a página vem do banco com values()
+    (só as colunas dos campos da resposta, respeitando ?fields=, e os
+    campos de objetos relacionados como 'usuario.username' pelo mesmo
+    JOIN) e cada linha é serializada direto do dicionário, com o
+    to_representation de cada campo do serializer. A resposta é a mesma
+    do caminho normal, em uma única consulta por página.
+
+    Serializers com campos que precisam do objeto inteiro (source='*',
+    SerializerMethodField) caem no list() normal do DRF.
+    """
+
+    def list(self, request, *args, **kwargs):
+        serializer = self.get_serializer()
+        plan = self._lean_plan(serializer)
+        if plan is None:
+            return super().list(request, *args, **kwargs)
+
+        columns, aliases, readers = plan
+        # O paginador por cursor lê a posição dos campos de ordenação
+        ordering = getattr(self, 'ordering', None) or ()
+        if isinstance(ordering, str):
+            ordering = (ordering,)
+        for name in ordering:
+            name = name.lstrip('-')
+            if name not in columns and name not in aliases:
+                columns.append(name)
+
+        queryset = self.filter_queryset(self.get_queryset()).values(*columns, **aliases)
+        page = self.paginate_queryset(queryset)
+        rows = queryset if page is None else page
+        data = [{name: read(row) for name, read in readers.items()} for row in rows]
+        if page is None:
+            return Response(data)
+        return self.get_paginated_response(data)
+
+    @staticmethod
+    def _lean_plan(serializer):
+        model = serializer.Meta.model
+        columns, aliases, readers = [], {}, {}
+        for name, field in serializer.fields.items():
+            if field.write_only:
+                continue
+            if field.source == '*' or isinstance(field, serializers.SerializerMethodField):
+                return None
+
+            if '.' in field.source:
+                key = name
+                aliases[key] = F(field.source.replace('.', '__'))
+            else:
+                key = field.source
+                columns.append(key)
+
+            model_field = model._meta.get_field(key) if key in columns else None
+            readers[name] = _reader(field, key, model_field)
+        return columns, aliases, readers
+
+
+def _reader(field, key, model_field):
+    if isinstance(field, serializers.RelatedField):
+        # Chave estrangeira: values() já traz o id, que é a representação
+        return lambda row: row[key]
+
+    if isinstance(model_field, FileField):
+        def read_file(row):
+            # Mesmo objeto que o modelo teria, para a URL sair igual
+            value = model_field.attr_class(None, model_field, row[key] or None)
+            return field.to_representation(value)
+        return read_file
+
+    def read(row):
+        value = row[key]
+        return None if value is None else field.to_representation(value)
+    return read
+
+
+class BulkOperationsMixin:
+    """
+    Criação e edição em lote: POST/PATCH em <lista>/lote/ com uma lista de
+    itens. Cada item é validado pelo serializer da view, como numa criação
+    (ou PATCH) individual; se algum for inválido nada é gravado e a resposta
+    (400) traz os erros alinhados com a lista ({} para os itens válidos).
+    Tudo vai ao banco numa transação, com um bulk_create/bulk_update.
+
+    Como operações em lote não disparam post_save, o signal bulk_saved
+    (core/signals.py) avisa quem mantém caches/índices desses objetos.
+    """
+
+    @staticmethod
+    def _bulk_max_items() -> int:
+        return getattr(settings, 'API_BULK_MAX_ITEMS', 500)
+
+    def _bulk_items(self, request):
+        items = request.data
+        if not isinstance(items, list) or not items:
+            return None, Response(
+                {"detail": "Envie uma lista (não vazia) de itens."},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        if len(items) > self._bulk_max_items():
+            return None, Response(
+                {"detail": f"No máximo {self._bulk_max_items()} itens por requisição."},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        return items, None
+
+    @staticmethod
+    def _bulk_item_id(item):
+        """(id, None) de um item do PATCH em lote, ou (None, erros do campo 'id')."""
+        if not isinstance(item, dict) or item.get('id') is None:
+            return None, ["Informe o id do item."]
+        try:
+            return serializers.IntegerField().run_validation(item['id']), None
+        except ValidationError as exc:
+            return None, exc.detail
+
+    def _bulk_saved(self, instances) -> None:
+        model = self.get_queryset().model
+        user_id = self.request.user.pk
+        transaction.on_commit(
+            lambda: bulk_saved.send(sender=model, usuario_id=user_id, instances=instances)
+        )
+
+    @action(detail=False, methods=['post', 'patch'], url_path='lote')
+    def lote(self, request, *args, **kwargs):
+        items, error = self._bulk_items(request)
+        if error is not None:
+            return error
+        if request.method == 'PATCH':
+            return self._bulk_update(items)
+        return self._bulk_create(items)
+
+    def _bulk_create(self, items):
+        serializers_ = [self.get_serializer(data=item) for item in items]
+        errors = [{} if s.is_valid() else s.errors for s in serializers_]
+        if any(errors):
+            return Response(errors, status=status.HTTP_400_BAD_REQUEST)
+
+        model = self.get_queryset().model
+        instances = [model(**s.validated_data, usuario=self.request.user) for s in serializers_]
+        with transaction.atomic():
+            model.objects.bulk_create(instances)
+            self._bulk_saved(instances)
+
+        data = self.get_serializer(instances, many=True).data
+        return Response(data, status=status.HTTP_201_CREATED)
+
+    def _bulk_update(self, items):
+        ids = [self._bulk_item_id(item) for item in items]
+        with transaction.atomic():
+            found = self.get_queryset().select_for_update().in_bulk(
+                [pk for pk, _ in ids if pk is not None]
+            )
+
+            serializers_, errors, seen = [], [], set()
+            for item, (pk, id_errors) in zip(items, ids):
+                if id_errors is not None:
+                    serializers_.append(None)
+                    errors.append({"id": id_errors})
+                    continue
+                instance = found.get(pk)
+                if instance is None or pk in seen:
+                    serializers_.append(None)
+                    errors.append({"id": ["Item repetido na lista." if pk in seen else "Item não encontrado."]})
+                    continue
+                seen.add(pk)
+                serializer = self.get_serializer(instance, data=item, partial=True)
+                serializers_.append(serializer)
+                errors.append({} if serializer.is_valid() else serializer.errors)
+            if any(errors):
+                return Response(errors, status=status.HTTP_400_BAD_REQUEST)
+
+            fields = set()
+            for serializer in serializers_:
+                for name, value in serializer.validated_data.items():
+                    setattr(serializer.instance, name, value)
+                    fields.add(name)
+            instances = [s.instance for s in serializers_]
+            if fields:
+                self.get_queryset().model.objects.bulk_update(instances, sorted(fields))
+                self._bulk_saved(instances)
+
+        return Response(self.get_serializer(instances, many=True).data, status=status.HTTP_200_OK)
@@ -0,0 +1,25 @@
+# core/pagination.py
+from rest_framework.pagination import CursorPagination
+
+
+class DefaultCursorPagination(CursorPagination):
+    """
+    Paginação padrão das listagens da API (lembretes, contatos, diário).
+
+    Por cursor em vez de número de página: cada página é uma busca no
+    índice a partir da última linha vista (sem OFFSET) e não pula nem
+    repete itens quando algo é criado ou apagado entre uma página e outra.
+    A ordenação vem do atributo 'ordering' da view (padrão: '-id').
+
+    Resposta: {"next": url | null, "previous": url | null, "results": [...]}.
+    O cliente pode pedir outro tamanho de página com ?limite= (até max_page_size).
+    """
+    ordering = '-id'
+    page_size_query_param = 'limite'
+    max_page_size = 200
+
+    def get_ordering(self, request, queryset, view):
+        ordering = getattr(view, 'ordering', None) or self.ordering
+        if isinstance(ordering, str):
+            return (ordering,)
+        return tuple(ordering)
@@ -2,10 +2,32 @@
 from django.contrib.auth.models import User
 from django.utils.text import slugify
 from rest_framework import serializers
+from rest_framework.permissions import SAFE_METHODS
 
 from .models import PerfilPaciente
 
 
+class SparseFieldsMixin:
+    """
+    Campos esparsos: em leituras com ?fields=id,titulo a resposta traz só
+    esses campos (nomes desconhecidos são ignorados). Escritas usam sempre
+    o serializer completo.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        request = self.context.get('request')
+        if request is None or request.method not in SAFE_METHODS:
+            return
+        requested = request.query_params.get('fields')
+        if not requested:
+            return
+        wanted = {name.strip() for name in requested.split(',') if name.strip()}
+        for name in list(self.fields):
+            if name not in wanted:
+                self.fields.pop(name)
+
+
 class UserSerializer(serializers.ModelSerializer):
     """
     Serializer para criar um novo usuário (Registro).
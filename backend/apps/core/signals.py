@@ -0,0 +1,8 @@
+# core/signals.py
+from django.dispatch import Signal
+
+# Enviado depois do COMMIT de uma operação em lote (BulkOperationsMixin):
+# bulk_create, bulk_update e update() não disparam post_save. Argumentos:
+# sender (o model), usuario_id e instances (os objetos gravados; vazio
+# quando só um campo foi alterado com update()).
+bulk_saved = Signal()
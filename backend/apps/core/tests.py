@@ -1,3 +1,180 @@
+from datetime import timedelta
+
+from django.contrib.auth.models import User
 from django.test import TestCase
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from apps.contatos.models import Contato
+from apps.contatos.serializers import ContatoSerializer
+from apps.diario.models import EntradaDiario
+from apps.lembretes.models import Lembrete
+
+
+def criar_dados(usuario, n):
+    agora = timezone.now()
+    Lembrete.objects.bulk_create([
+        Lembrete(usuario=usuario, titulo=f"Lembrete {i}", data_hora=agora + timedelta(hours=i))
+        for i in range(n)
+    ])
+    Contato.objects.bulk_create([
+        Contato(usuario=usuario, nome=f"Contato {i}", telefone="5199999999", foto=f"contato_fotos/{i}.jpg")
+        for i in range(n)
+    ])
+    EntradaDiario.objects.bulk_create([
+        EntradaDiario(usuario=usuario, texto=f"Entrada {i}") for i in range(n)
+    ])
+
+
+class ListagemPaginadaTests(TestCase):
+    """Listagens de lembretes, contatos e diário (apps/core/pagination.py e mixins.py)."""
+
+    URLS = ["/api/lembretes/", "/api/contatos/", "/api/diario/"]
+
+    def setUp(self):
+        self.usuario = User.objects.create_user("paciente", password="senha")
+        self.client = APIClient()
+        self.client.force_authenticate(self.usuario)
+
+    def test_numero_de_consultas_nao_depende_do_tamanho_da_lista(self):
+        criar_dados(self.usuario, 3)
+        for url in self.URLS:
+            with self.assertNumQueries(1):
+                self.client.get(url)
+
+        criar_dados(self.usuario, 60)
+        for url in self.URLS:
+            with self.assertNumQueries(1):
+                resposta = self.client.get(url)
+            self.assertEqual(len(resposta.json()["results"]), 50)
+
+    def test_paginas_por_cursor_cobrem_a_lista_sem_repetir(self):
+        criar_dados(self.usuario, 7)
+        ids, url = [], "/api/contatos/?limite=3"
+        while url:
+            dados = self.client.get(url).json()
+            ids += [item["id"] for item in dados["results"]]
+            url = dados["next"]
+        self.assertEqual(ids, sorted(Contato.objects.values_list("id", flat=True)))
+
+    def test_listagem_igual_ao_serializer_completo(self):
+        criar_dados(self.usuario, 2)
+        resposta = self.client.get("/api/contatos/").json()["results"]
+        detalhe = self.client.get(f"/api/contatos/{resposta[0]['id']}/").json()
+        self.assertEqual(resposta[0], detalhe)
+        self.assertEqual(set(resposta[0]), set(ContatoSerializer.Meta.fields))
+        self.assertEqual(resposta[0]["usuario_username"], "paciente")
+        self.assertTrue(resposta[0]["foto"].endswith("/media/contato_fotos/0.jpg"))
+
+    def test_campos_esparsos(self):
+        criar_dados(self.usuario, 2)
+        item = self.client.get("/api/lembretes/?fields=id,titulo,inexistente").json()["results"][0]
+        self.assertEqual(set(item), {"id", "titulo"})
+
+        lembrete = Lembrete.objects.first()
+        item = self.client.get(f"/api/lembretes/{lembrete.id}/?fields=titulo").json()
+        self.assertEqual(item, {"titulo": lembrete.titulo})
+
+    def test_lista_so_do_usuario_logado(self):
+        outro = User.objects.create_user("outro", password="senha")
+        criar_dados(outro, 2)
+        for url in self.URLS:
+            self.assertEqual(self.client.get(url).json()["results"], [])
+
+
+class OperacoesEmLoteTests(TestCase):
+    """POST/PATCH <lista>/lote/ e POST /api/lembretes/concluir/ (apps/core/mixins.py)."""
+
+    def setUp(self):
+        self.usuario = User.objects.create_user("paciente", password="senha")
+        self.outro = User.objects.create_user("outro", password="senha")
+        self.client = APIClient()
+        self.client.force_authenticate(self.usuario)
+        self.agora = timezone.now()
+
+    def lembrete(self, usuario=None, titulo="Losartana"):
+        return Lembrete.objects.create(usuario=usuario or self.usuario, titulo=titulo, data_hora=self.agora)
+
+    def test_criacao_em_lote(self):
+        itens = [{"titulo": f"Remédio {i}", "data_hora": self.agora.isoformat()} for i in range(3)]
+        resposta = self.client.post("/api/lembretes/lote/", itens, format="json")
+        self.assertEqual(resposta.status_code, 201)
+        self.assertEqual([item["titulo"] for item in resposta.json()], ["Remédio 0", "Remédio 1", "Remédio 2"])
+        self.assertEqual(Lembrete.objects.filter(usuario=self.usuario).count(), 3)
+
+        resposta = self.client.post("/api/contatos/lote/", [{"nome": "Ana", "telefone": "5199999999"}], format="json")
+        self.assertEqual(resposta.status_code, 201)
+        self.assertEqual(Contato.objects.get().usuario, self.usuario)
+
+    def test_criacao_tudo_ou_nada_com_erros_alinhados(self):
+        itens = [
+            {"titulo": "Losartana", "data_hora": self.agora.isoformat()},
+            {"titulo": "Sem horário"},
+            {"titulo": "Metformina", "data_hora": self.agora.isoformat()},
+            "não é um item",
+        ]
+        resposta = self.client.post("/api/lembretes/lote/", itens, format="json")
+        self.assertEqual(resposta.status_code, 400)
+        erros = resposta.json()
+        self.assertEqual(len(erros), 4)
+        self.assertEqual(erros[0], {})
+        self.assertIn("data_hora", erros[1])
+        self.assertEqual(erros[2], {})
+        self.assertTrue(erros[3])
+        self.assertFalse(Lembrete.objects.exists())
+
+        for corpo in [[], {"titulo": "Losartana"}]:
+            self.assertEqual(self.client.post("/api/lembretes/lote/", corpo, format="json").status_code, 400)
+
+    def test_edicao_em_lote(self):
+        primeiro, segundo = self.lembrete(), self.lembrete(titulo="Metformina")
+        itens = [{"id": primeiro.id, "concluido": True}, {"id": str(segundo.id), "titulo": "Metformina 500mg"}]
+        resposta = self.client.patch("/api/lembretes/lote/", itens, format="json")
+        self.assertEqual(resposta.status_code, 200)
+
+        primeiro.refresh_from_db()
+        segundo.refresh_from_db()
+        self.assertTrue(primeiro.concluido)
+        self.assertEqual(segundo.titulo, "Metformina 500mg")
+
+    def test_edicao_com_ids_invalidos_erros_alinhados(self):
+        meu, alheio = self.lembrete(), self.lembrete(usuario=self.outro)
+        itens = [
+            {"id": meu.id, "titulo": "Editado"},
+            {"id": "abc", "titulo": "x"},
+            {"id": [meu.id], "titulo": "x"},
+            {"titulo": "sem id"},
+            {"id": alheio.id, "titulo": "Invasão"},
+            {"id": meu.id, "titulo": "De novo"},
+            {"id": 999999, "titulo": "x"},
+        ]
+        resposta = self.client.patch("/api/lembretes/lote/", itens, format="json")
+        self.assertEqual(resposta.status_code, 400)
+        erros = resposta.json()
+        self.assertEqual(len(erros), len(itens))
+        self.assertEqual(erros[0], {})
+        for i in (1, 2, 3):
+            self.assertIn("id", erros[i])
+        self.assertEqual(erros[4], {"id": ["Item não encontrado."]})
+        self.assertEqual(erros[5], {"id": ["Item repetido na lista."]})
+        self.assertEqual(erros[6], {"id": ["Item não encontrado."]})
+
+        meu.refresh_from_db()
+        alheio.refresh_from_db()
+        self.assertEqual((meu.titulo, alheio.titulo), ("Losartana", "Losartana"))
+
+    def test_concluir_so_os_lembretes_do_usuario(self):
+        primeiro, segundo, alheio = self.lembrete(), self.lembrete(), self.lembrete(usuario=self.outro)
+        resposta = self.client.post(
+            "/api/lembretes/concluir/", {"ids": [primeiro.id, segundo.id, alheio.id]}, format="json"
+        )
+        self.assertEqual(resposta.status_code, 200)
+        self.assertEqual(resposta.json(), {"atualizados": 2, "nao_encontrados": [alheio.id]})
+        self.assertEqual(
+            list(Lembrete.objects.filter(concluido=True).order_by("id").values_list("id", flat=True)),
+            [primeiro.id, segundo.id],
+        )
 
-# Create your tests here.
+        resposta = self.client.post("/api/lembretes/concluir/", {"ids": [primeiro.id], "concluido": False}, format="json")
+        self.assertEqual(resposta.json()["atualizados"], 1)
+        self.assertEqual(self.client.post("/api/lembretes/concluir/", {"ids": []}, format="json").status_code, 400)
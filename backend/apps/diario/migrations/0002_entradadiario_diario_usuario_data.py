@@ -0,0 +1,19 @@
+# Generated by Django 5.2.8 on 2026-10-18 09:57
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('diario', '0001_initial'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='entradadiario',
+            index=models.Index(fields=['usuario', 'data_criacao'], name='diario_usuario_data'),
+        ),
+    ]
@@ -17,6 +17,12 @@ class EntradaDiario(models.Model):
     
     data_criacao = models.DateTimeField(auto_now_add=True)
 
+    class Meta:
+        indexes = [
+            # Listagem do diário, da entrada mais recente para a mais antiga
+            models.Index(fields=['usuario', 'data_criacao'], name='diario_usuario_data'),
+        ]
+
     def __str__(self):
         if self.texto:
             return f"Diário de {self.usuario.username}: {self.texto[:50]}..."
@@ -1,7 +1,9 @@
 from rest_framework import serializers
+
+from apps.core.serializers import SparseFieldsMixin
 from .models import EntradaDiario
 
-class EntradaDiarioSerializer(serializers.ModelSerializer):
+class EntradaDiarioSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     usuario_username = serializers.ReadOnlyField(source='usuario.username')
 
     class Meta:
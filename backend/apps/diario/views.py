@@ -2,15 +2,18 @@ from rest_framework import viewsets, permissions
 
 from .models import EntradaDiario
 from .serializers import EntradaDiarioSerializer
+from apps.core.mixins import LeanListMixin
 from apps.core.permissions import IsOwner
 
 
-class EntradaDiarioViewSet(viewsets.ModelViewSet):
+class EntradaDiarioViewSet(LeanListMixin, viewsets.ModelViewSet):
     """
     API endpoint que permite Entradas do Diário serem vistas ou editadas.
     """
     serializer_class = EntradaDiarioSerializer
     permission_classes = [permissions.IsAuthenticated, IsOwner]
+    # Ordem das páginas (paginação por cursor, ver apps/core/pagination.py)
+    ordering = ('-data_criacao', '-id')
 
     def get_queryset(self):
         """
@@ -20,6 +23,7 @@ class EntradaDiarioViewSet(viewsets.ModelViewSet):
         return (
             EntradaDiario.objects
             .filter(usuario=self.request.user)
+            .select_related('usuario')
             .order_by('-data_criacao')
         )
 
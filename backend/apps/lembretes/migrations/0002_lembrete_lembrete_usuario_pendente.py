@@ -0,0 +1,19 @@
+# Generated by Django 5.2.8 on 2026-10-18 09:57
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('lembretes', '0001_initial'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='lembrete',
+            index=models.Index(condition=models.Q(('concluido', False)), fields=['usuario', 'data_hora'], name='lembrete_usuario_pendente'),
+        ),
+    ]
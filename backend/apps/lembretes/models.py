@@ -30,5 +30,17 @@ class Lembrete(models.Model):
     
     criado_em = models.DateTimeField(auto_now_add=True)
 
+    class Meta:
+        indexes = [
+            # Agenda do dia no contexto do chat: pendentes de hoje em ordem de
+            # horário. Índice parcial porque o Django escreve 'concluido=False'
+            # como 'NOT concluido', que não casa com uma coluna de índice.
+            models.Index(
+                fields=['usuario', 'data_hora'],
+                condition=models.Q(concluido=False),
+                name='lembrete_usuario_pendente',
+            ),
+        ]
+
     def __str__(self):
         return f"'{self.titulo}' para {self.usuario.username}"
\ No newline at end of file
@@ -1,7 +1,9 @@
 from rest_framework import serializers
+
+from apps.core.serializers import SparseFieldsMixin
 from .models import Lembrete
 
-class LembreteSerializer(serializers.ModelSerializer):
+class LembreteSerializer(SparseFieldsMixin, serializers.ModelSerializer):
 
     usuario_username = serializers.ReadOnlyField(source='usuario.username')
 
@@ -21,4 +23,10 @@ class LembreteSerializer(serializers.ModelSerializer):
         ]
 
         # Impede que o usuário 'troque' o dono do lembrete
-        read_only_fields = ['usuario']
\ No newline at end of file
+        read_only_fields = ['usuario']
+
+
+class ConcluirLembretesSerializer(serializers.Serializer):
+    """Corpo de POST /api/lembretes/concluir/."""
+    ids = serializers.ListField(child=serializers.IntegerField(), allow_empty=False)
+    concluido = serializers.BooleanField(default=True)
@@ -1,25 +1,58 @@
-from rest_framework import viewsets, permissions
+from django.db import transaction
+from rest_framework import viewsets, permissions, status
+from rest_framework.decorators import action
+from rest_framework.response import Response
 
 from .models import Lembrete
-from .serializers import LembreteSerializer
+from .serializers import ConcluirLembretesSerializer, LembreteSerializer
+from apps.core.mixins import BulkOperationsMixin, LeanListMixin
 from apps.core.permissions import IsOwner
 
 
-class LembreteViewSet(viewsets.ModelViewSet):
+class LembreteViewSet(BulkOperationsMixin, LeanListMixin, viewsets.ModelViewSet):
     """
     API endpoint que permite Lembretes serem vistos ou editados.
+    Em lote: POST/PATCH em /lembretes/lote/ e POST em /lembretes/concluir/.
     """
     serializer_class = LembreteSerializer
     permission_classes = [permissions.IsAuthenticated, IsOwner]
+    # Ordem das páginas (paginação por cursor, ver apps/core/pagination.py)
+    ordering = ('id',)
 
     def get_queryset(self):
         """
         Retorna apenas os lembretes do usuário autenticado.
         """
-        return Lembrete.objects.filter(usuario=self.request.user)
+        return Lembrete.objects.filter(usuario=self.request.user).select_related('usuario')
 
     def perform_create(self, serializer):
         """
         Define o 'usuario' automaticamente ao criar um novo lembrete.
         """
-        serializer.save(usuario=self.request.user)
\ No newline at end of file
+        serializer.save(usuario=self.request.user)
+
+    @action(detail=False, methods=['post'], url_path='concluir')
+    def concluir(self, request, *args, **kwargs):
+        """
+        Marca vários lembretes como concluídos (ou não, com "concluido": false)
+        num único UPDATE. Ids que não são do usuário voltam em "nao_encontrados".
+        """
+        serializer = ConcluirLembretesSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        ids = serializer.validated_data['ids']
+        if len(ids) > self._bulk_max_items():
+            return Response(
+                {"ids": [f"No máximo {self._bulk_max_items()} itens por requisição."]},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        with transaction.atomic():
+            lembretes = self.get_queryset().filter(id__in=ids)
+            found = set(lembretes.values_list('id', flat=True))
+            updated = lembretes.update(concluido=serializer.validated_data['concluido'])
+            self._bulk_saved([])
+
+        return Response(
+            {"atualizados": updated, "nao_encontrados": [i for i in ids if i not in found]},
+            status=status.HTTP_200_OK,
+        )
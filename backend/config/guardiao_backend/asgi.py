@@ -14,3 +14,9 @@ from django.core.asgi import get_asgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'guardiao_backend.settings')
 
 application = get_asgi_application()
+
+# Cria o ChatEngine compartilhado antes da primeira requisição (ver
+# apps/chat/registry.py). Os comandos de gerenciamento não passam por aqui.
+from apps.chat.registry import engine_registry  # noqa: E402
+
+engine_registry.warm_up()
@@ -84,6 +84,9 @@ TEMPLATES = [
 
 WSGI_APPLICATION = 'guardiao_backend.wsgi.application'
 
+# Runner dos testes: índices vetoriais do chat numa pasta temporária
+TEST_RUNNER = 'guardiao_backend.test_runner.GuardiaoTestRunner'
+
 
 # Database
 # https://docs.djangoproject.com/en/5.2/ref/settings/#databases
@@ -151,8 +154,15 @@ REST_FRAMEWORK = {
         'rest_framework.authentication.TokenAuthentication',
     ],
     'DEFAULT_SCHEMA_CLASS': 'drf_spectacular.openapi.AutoSchema',
+    # Listagens paginadas por cursor (ver apps/core/pagination.py)
+    'DEFAULT_PAGINATION_CLASS': 'apps.core.pagination.DefaultCursorPagination',
+    'PAGE_SIZE': 50,
 }
 
+# Máximo de itens numa operação em lote (POST/PATCH em /lote/, ver
+# apps/core/mixins.py)
+API_BULK_MAX_ITEMS = 500
+
 
 # drf-spectacular
 
@@ -167,7 +177,211 @@ SPECTACULAR_SETTINGS = {
 }
 
 
+# Cache
+# https://docs.djangoproject.com/en/5.2/topics/cache/
+# Em produção com vários processos, use um cache compartilhado
+# (ex: 'django.core.cache.backends.redis.RedisCache').
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'guardiao',
+    },
+}
+
+
 # Media files (uploads de áudio, imagens etc.)
 
 MEDIA_URL = '/media/'
-MEDIA_ROOT = BASE_DIR / 'media'
\ No newline at end of file
+MEDIA_ROOT = BASE_DIR / 'media'
+
+
+# Chat (assistente)
+
+# URL de um servidor compatível com a API de chat da OpenAI/HF para usar no
+# lugar do Hugging Face (ex: 'http://127.0.0.1:8001/v1' com o comando
+# 'servidor_llm_falso'). Se vazio, usa a variável HF_BASE_URL do .env.
+CHAT_LLM_BASE_URL = None
+
+# Intervalo (s) entre as verificações de mudança no prompt/.env
+# para recarregar o ChatEngine compartilhado.
+CHAT_ENGINE_RELOAD_INTERVAL = 5.0
+
+# Tamanho máximo (em tokens estimados) do prompt enviado ao modelo:
+# prompt do sistema + contexto RAG + janela do histórico + mensagem nova.
+CHAT_PROMPT_TOKEN_BUDGET = 3000
+
+# Limite de mensagens lidas do banco ao montar a janela do histórico.
+CHAT_HISTORY_MAX_MESSAGES = 200
+
+# Mensagens mais antigas que esta janela (em tokens estimados) são
+# incorporadas ao resumo do usuário pelo comando 'resumir_conversas'.
+CHAT_SUMMARY_WINDOW_TOKENS = 1000
+
+# Cache (alias de CACHES) usado para o contexto RAG do chat, guardado
+# por usuário/dia. Pode ser local ao processo: a chave inclui a versão do
+# contexto no banco (VersaoContexto), que os signals de Lembrete, Contato,
+# PerfilPaciente e EntradaDiario incrementam, então uma mudança vale para
+# todos os workers e para o 'gerar_briefings --loop'. Os índices BM25 em
+# memória de cada processo usam a mesma versão.
+CHAT_CONTEXT_CACHE_ALIAS = 'default'
+
+# Quantas entradas do diário/lembretes relacionadas à mensagem
+# (busca BM25 local) entram no contexto do chat.
+CHAT_MEMORY_TOP_K = 3
+
+# Máximo de índices BM25 (um por usuário) mantidos em memória.
+CHAT_LEXICAL_INDEX_MAX_USERS = 1000
+
+# Busca semântica local (índice vetorial NumPy por usuário) sobre o
+# diário e as mensagens do paciente. CHAT_EMBEDDER aponta para a classe
+# que vetoriza os textos (padrão: feature hashing, sem rede nem GPU).
+# Os testes (manage.py test) usam uma pasta temporária (ver TEST_RUNNER).
+CHAT_VECTOR_INDEX_ENABLED = True
+CHAT_VECTOR_INDEX_DIR = BASE_DIR / 'indices'
+CHAT_EMBEDDER = 'apps.chat.embeddings.HashingEmbedder'
+CHAT_SEMANTIC_TOP_K = 3
+CHAT_SEMANTIC_MIN_SCORE = 0.15
+
+# Resiliência das chamadas ao modelo: timeouts (segundos), retries com
+# backoff exponencial + jitter para erros transitórios e circuit breaker
+# (depois de N falhas seguidas, o chat responde na hora com uma mensagem
+# de indisponibilidade até passar o tempo de recuperação).
+CHAT_LLM_CONNECT_TIMEOUT = 5.0
+CHAT_LLM_READ_TIMEOUT = 30.0
+CHAT_LLM_MAX_RETRIES = 2
+CHAT_LLM_RETRY_BASE_DELAY = 0.5
+CHAT_LLM_RETRY_MAX_DELAY = 4.0
+CHAT_BREAKER_FAILURE_THRESHOLD = 5
+CHAT_BREAKER_RECOVERY_TIMEOUT = 30.0
+
+# Modo assíncrono do chat (fila no banco): POST /api/chat/?async=1
+# enfileira o turno e os workers do comando 'processar_tarefas_chat'
+# respondem. CHAT_ASYNC_MODE = True torna esse o modo padrão.
+CHAT_ASYNC_MODE = False
+CHAT_JOB_WORKERS = 4
+CHAT_JOB_POLL_INTERVAL = 1.0
+# Espera máxima (segundos) de GET /api/chat/tarefas/<id>/?esperar=N. A view
+# é síncrona e segura o worker WSGI enquanto espera, então fica curta; o
+# long-polling longo é o da view async (GET /api/chat/async/tarefas/<id>/),
+# limitado por CHAT_JOB_MAX_WAIT.
+CHAT_JOB_SYNC_MAX_WAIT = 1
+CHAT_JOB_MAX_WAIT = 25
+# Retry-After (segundos) sugerido enquanto a tarefa não termina
+CHAT_JOB_RETRY_AFTER = 1
+# Tarefas 'processando' há mais que isso voltam para a fila
+CHAT_JOB_STALE_AFTER = 300
+
+# Por quantos segundos uma mensagem repetida (toque duplo em "enviar",
+# retry do app) recebe a resposta do turno que acabou de terminar, sem
+# chamar o modelo de novo. Turnos idênticos simultâneos sempre dividem
+# a mesma chamada.
+CHAT_DEDUP_WINDOW = 3.0
+
+# Atalho de intenções: perguntas como "o que eu tenho hoje?" ou "quem é
+# meu contato de emergência?" são respondidas direto dos lembretes/contatos,
+# sem chamar o modelo (ver apps/chat/intents.py).
+CHAT_INTENTS_ENABLED = True
+
+# Cache de respostas para perguntas repetidas (ver apps/chat/response_cache.py).
+# Chave: usuário + hash do contexto RAG + versão do contexto (muda também com
+# o diário) + sessão atual + mensagem normalizada. Perguntas
+# relativas ao relógio ("agora", "hoje", "já"...) não entram. TTL em segundos;
+# 0 desliga o cache.
+CHAT_RESPONSE_CACHE_TTL = 600
+CHAT_RESPONSE_CACHE_MAX_ENTRIES = 2048
+# Com um valor < 1, perguntas parecidas (cosseno >= limite, mesmas negações)
+# também reaproveitam a resposta. Desligado por padrão (None ou 1.0): num
+# app de remédios, uma resposta para a pergunta errada é pior que uma
+# chamada a mais ao modelo.
+CHAT_RESPONSE_CACHE_SIMILARITY = None
+CHAT_RESPONSE_CACHE_MIN_WORDS = 3
+
+# Briefing diário (ver apps/chat/briefing.py e o comando 'gerar_briefings'):
+# chamadas simultâneas ao modelo na geração em lote e, no modo --loop,
+# a partir de que hora (local) os briefings do dia são gerados.
+CHAT_BRIEFING_WORKERS = 8
+CHAT_BRIEFING_HOUR = 5
+
+# Vários endpoints do modelo (ex: um provedor dedicado + a API do Hugging
+# Face), em ordem de prioridade (ver apps/chat/routing.py). Cada item:
+# {"nome": ..., "model": ..., "base_url": ..., "token_env": "NOME_DA_VARIAVEL"};
+# sem 'base_url' usa o Hugging Face com o 'model'. Vazio: um único endpoint
+# com HF_MODEL_ID/HF_BASE_URL do .env. CHAT_LLM_BASE_URL tem precedência.
+CHAT_LLM_ENDPOINTS = []
+
+# Hedging: se o endpoint principal não responde em CHAT_HEDGE_PERCENTILE da
+# própria latência recente (ou CHAT_HEDGE_DELAY segundos, enquanto há menos de
+# CHAT_ROUTING_MIN_SAMPLES amostras), a mesma chamada vai também para o próximo
+# e fica a resposta que chegar primeiro. Endpoints com muitos erros ou muito
+# mais lentos que o melhor saem da frente por CHAT_ENDPOINT_DEMOTION_SECONDS.
+CHAT_HEDGE_ENABLED = True
+CHAT_HEDGE_PERCENTILE = 90
+CHAT_HEDGE_DELAY = 2.0
+CHAT_HEDGE_MIN_DELAY = 0.2
+CHAT_HEDGE_MAX_EXTRA = 1
+CHAT_HEDGE_THREADS = 64
+CHAT_ROUTING_WINDOW = 200
+CHAT_ROUTING_MIN_SAMPLES = 20
+CHAT_ENDPOINT_MAX_ERROR_RATE = 0.5
+CHAT_ENDPOINT_SLOW_FACTOR = 2.0
+CHAT_ENDPOINT_DEMOTION_SECONDS = 60
+
+# Orçamento diário de tokens do modelo por usuário (ver apps/chat/usage.py).
+# O uso de cada turno é somado em UsoTokens (GET /api/chat/uso/). Ao passar de
+# CHAT_TOKEN_BUDGET_SOFT_LIMIT do orçamento, o turno usa um prompt menor (menos
+# histórico) e uma resposta mais curta; estourado, menores ainda. O chat nunca
+# é bloqueado. 0 ou None: só contabiliza.
+CHAT_DAILY_TOKEN_BUDGET = 100000
+CHAT_TOKEN_BUDGET_SOFT_LIMIT = 0.8
+CHAT_REDUCED_PROMPT_TOKEN_BUDGET = 1500
+CHAT_REDUCED_MAX_TOKENS = 250
+CHAT_EXHAUSTED_PROMPT_TOKEN_BUDGET = 800
+CHAT_EXHAUSTED_MAX_TOKENS = 120
+
+# Controle de admissão (ver apps/chat/admission.py): no máximo
+# CHAT_MAX_CONCURRENT_LLM_CALLS chamadas ao modelo ao mesmo tempo por processo
+# (deixe abaixo do número de threads do servidor, para sobrar worker para o
+# resto da API), com uma fila de CHAT_ADMISSION_QUEUE_SIZE turnos esperando até
+# CHAT_ADMISSION_WAIT segundos. Além disso: 503 na hora, com Retry-After.
+CHAT_MAX_CONCURRENT_LLM_CALLS = 32
+CHAT_ADMISSION_QUEUE_SIZE = 32
+CHAT_ADMISSION_WAIT = 1.0
+CHAT_ADMISSION_RETRY_AFTER = 2
+
+# Limite de mensagens por usuário no chat (throttle do DRF, 429 + Retry-After).
+# Os contadores ficam no cache CHAT_THROTTLE_CACHE (compartilhado entre
+# processos se for Redis). None desliga.
+CHAT_THROTTLE_RATE = '20/min'
+CHAT_THROTTLE_CACHE = 'default'
+
+# Gravação adiada do histórico do chat (ver apps/chat/write_buffer.py): os
+# turnos vão para uma fila em memória e são gravados em lote, numa transação,
+# a cada CHAT_HISTORY_BUFFER_MAX_TURNS turnos ou CHAT_HISTORY_BUFFER_MAX_DELAY
+# segundos. O próprio usuário sempre vê suas mensagens; a fila é gravada ao
+# encerrar o processo normalmente (atexit). ATENÇÃO: um processo morto à força
+# (SIGKILL, OOM killer, timeout do worker no gunicorn) perde os turnos ainda
+# na fila, até CHAT_HISTORY_BUFFER_MAX_DELAY segundos de conversa.
+# Compare com: python manage.py comparar_escrita_historico
+CHAT_HISTORY_WRITE_BEHIND = False
+CHAT_HISTORY_BUFFER_MAX_TURNS = 100
+CHAT_HISTORY_BUFFER_MAX_DELAY = 0.5
+
+# Histórico do chat na tela do assistente (GET /api/chat/): páginas de
+# CHAT_HISTORY_PAGE_SIZE mensagens, das mais novas para as mais antigas, por
+# cursor (?antes=). O cliente pode pedir até CHAT_HISTORY_MAX_PAGE_SIZE (?limite=).
+CHAT_HISTORY_PAGE_SIZE = 50
+CHAT_HISTORY_MAX_PAGE_SIZE = 200
+
+# Arquivamento do histórico do chat (ver apps/chat/archive.py e o comando
+# 'arquivar_historico'): mensagens com mais de CHAT_ARCHIVE_AFTER_DAYS dias
+# saem do HistoricoChat para segmentos comprimidos (ArquivoChat), lidos sob
+# demanda em GET /api/chat/arquivo/. Com CHAT_ARCHIVE_REQUIRE_SUMMARY, só as
+# já incorporadas ao resumo. Segmentos com mais de CHAT_ARCHIVE_RETENTION_DAYS
+# dias são expurgados (None: guarda para sempre).
+CHAT_ARCHIVE_AFTER_DAYS = 180
+CHAT_ARCHIVE_SEGMENT_MESSAGES = 500
+CHAT_ARCHIVE_COMPRESSION_LEVEL = 6
+CHAT_ARCHIVE_REQUIRE_SUMMARY = True
+CHAT_ARCHIVE_RETENTION_DAYS = None
+CHAT_ARCHIVE_PAGE_SIZE = 20
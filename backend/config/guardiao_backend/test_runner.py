@@ -0,0 +1,27 @@
+# guardiao_backend/test_runner.py
+import shutil
+import tempfile
+from pathlib import Path
+
+from django.test.runner import DiscoverRunner
+from django.test.utils import override_settings
+
+
+class GuardiaoTestRunner(DiscoverRunner):
+    """
+    Runner do 'manage.py test': os índices vetoriais do chat
+    (CHAT_VECTOR_INDEX_DIR) vão para uma pasta temporária, apagada no fim.
+    Os usuários de teste reaproveitam ids baixos; com a pasta de verdade,
+    os testes leriam, misturariam e apagariam os índices dos pacientes.
+    """
+
+    def setup_test_environment(self, **kwargs):
+        super().setup_test_environment(**kwargs)
+        self._index_dir = tempfile.mkdtemp(prefix="guardiao-indices-")
+        self._index_settings = override_settings(CHAT_VECTOR_INDEX_DIR=Path(self._index_dir))
+        self._index_settings.enable()
+
+    def teardown_test_environment(self, **kwargs):
+        self._index_settings.disable()
+        shutil.rmtree(self._index_dir, ignore_errors=True)
+        super().teardown_test_environment(**kwargs)
@@ -14,3 +14,9 @@ from django.core.wsgi import get_wsgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'guardiao_backend.settings')
 
 application = get_wsgi_application()
+
+# Cria o ChatEngine compartilhado antes da primeira requisição (ver
+# apps/chat/registry.py). Os comandos de gerenciamento não passam por aqui.
+from apps.chat.registry import engine_registry  # noqa: E402
+
+engine_registry.warm_up()
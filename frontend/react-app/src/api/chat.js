@@ -35,11 +35,14 @@ function getAuthHeaders() {
   };
 }
 
-// BUSCAR HISTÓRICO (GET)
-export async function fetchChatHistory() {
+// BUSCAR HISTÓRICO (GET) — paginado das mensagens mais novas para as mais
+// antigas. Sem cursor, traz a página mais recente; com o cursor "anteriores"
+// da página já carregada, traz as mensagens antes dela.
+export async function fetchChatHistory(antes = null) {
   const headers = getAuthHeaders();
+  const query = antes ? `?antes=${encodeURIComponent(antes)}` : "";
 
-  const res = await fetch(`${API_URL}/api/chat/`, {
+  const res = await fetch(`${API_URL}/api/chat/${query}`, {
     method: "GET",
     headers,
   });
@@ -54,7 +57,55 @@ export async function fetchChatHistory() {
     throw new Error(errorMessage);
   }
 
-  return data; // Lista de mensagens [{role, content, ...}]
+  return data; // { mensagens: [{id, role, content, timestamp}], anteriores: cursor | null }
+}
+
+// NOVA CONVERSA (POST) — o histórico e o contexto do assistente recomeçam;
+// as conversas anteriores não são apagadas.
+export async function startNewChatSession() {
+  const headers = getAuthHeaders();
+
+  const res = await fetch(`${API_URL}/api/chat/sessao/`, {
+    method: "POST",
+    headers,
+  });
+
+  const data = await res.json().catch(() => null);
+
+  if (!res.ok) {
+    const errorMessage = extractErrorMessage(
+      data,
+      "Erro ao começar uma nova conversa."
+    );
+    throw new Error(errorMessage);
+  }
+
+  return data; // { id, iniciada_em }
+}
+
+// BRIEFING DO DIA (GET) — saudação + agenda, gerada em lote de madrugada.
+// Retorna null se o briefing de hoje ainda não foi gerado.
+export async function fetchDailyBriefing() {
+  const headers = getAuthHeaders();
+
+  const res = await fetch(`${API_URL}/api/chat/briefing/`, {
+    method: "GET",
+    headers,
+  });
+
+  if (res.status === 404) return null;
+
+  const data = await res.json().catch(() => null);
+
+  if (!res.ok) {
+    const errorMessage = extractErrorMessage(
+      data,
+      "Erro ao carregar o resumo do dia."
+    );
+    throw new Error(errorMessage);
+  }
+
+  return data; // { data, conteudo, gerado_em, atualizado }
 }
 
 // ENVIAR MENSAGEM (POST)
@@ -80,3 +131,68 @@ export async function sendChatMessage(message) {
   // backend retorna { "resposta": "..." }
   return data.resposta;
 }
+
+
+// ENVIAR MENSAGEM EM STREAMING (POST /api/chat/stream/, Server-Sent Events)
+// onDelta(pedaco) é chamado a cada trecho recebido; retorna a resposta completa.
+export async function streamChatMessage(message, onDelta) {
+  const headers = {
+    ...getAuthHeaders(),
+    Accept: "text/event-stream",
+  };
+
+  const res = await fetch(`${API_URL}/api/chat/stream/`, {
+    method: "POST",
+    headers,
+    body: JSON.stringify({ message }),
+  });
+
+  if (!res.ok || !res.body) {
+    // Assistente indisponível (503): o backend já manda uma mensagem amigável
+    const data = await res.json().catch(() => null);
+    if (data && data.resposta) return data.resposta;
+    throw new Error("Erro ao enviar mensagem para o assistente.");
+  }
+
+  const reader = res.body.getReader();
+  const decoder = new TextDecoder("utf-8");
+  let buffer = "";
+  let fullText = "";
+
+  while (true) {
+    const { value, done } = await reader.read();
+    if (done) break;
+
+    buffer += decoder.decode(value, { stream: true });
+
+    // Cada evento SSE termina com uma linha em branco
+    let sep;
+    while ((sep = buffer.indexOf("\n\n")) !== -1) {
+      const rawEvent = buffer.slice(0, sep);
+      buffer = buffer.slice(sep + 2);
+
+      let eventName = "message";
+      let dataLine = "";
+      for (const line of rawEvent.split("\n")) {
+        if (line.startsWith("event:")) eventName = line.slice(6).trim();
+        else if (line.startsWith("data:")) dataLine += line.slice(5).trim();
+      }
+
+      const data = dataLine ? JSON.parse(dataLine) : {};
+
+      if (eventName === "token") {
+        fullText += data.delta;
+        if (onDelta) onDelta(data.delta);
+      } else if (eventName === "done") {
+        return data.resposta;
+      } else if (eventName === "error") {
+        if (data.resposta && !fullText) return data.resposta;
+        throw new Error(
+          extractErrorMessage(data, "Erro ao enviar mensagem para o assistente.")
+        );
+      }
+    }
+  }
+
+  return fullText.trim();
+}
@@ -43,23 +43,31 @@ function getAuthHeaders(isMultipart = false) {
 // GET /api/contatos/
 export async function fetchContacts() {
   const headers = getAuthHeaders();
+  const items = [];
 
-  const res = await fetch(`${API_URL}/api/contatos/`, {
-    method: "GET",
-    headers,
-  });
+  // A API devolve páginas ({ results, next }); seguimos "next" até o fim
+  let url = `${API_URL}/api/contatos/`;
+  while (url) {
+    const res = await fetch(url, {
+      method: "GET",
+      headers,
+    });
 
-  const data = await res.json().catch(() => null);
+    const data = await res.json().catch(() => null);
 
-  if (!res.ok) {
-    const errorMessage = extractErrorMessage(
-      data,
-      "Erro ao carregar contatos."
-    );
-    throw new Error(errorMessage);
+    if (!res.ok) {
+      const errorMessage = extractErrorMessage(
+        data,
+        "Erro ao carregar contatos."
+      );
+      throw new Error(errorMessage);
+    }
+
+    items.push(...data.results);
+    url = data.next;
   }
 
-  return data;
+  return items;
 }
 
 // GET /api/contatos/:id/
@@ -45,23 +45,31 @@ function getAuthHeaders(isMultipart = false) {
 // GET /api/diario/
 export async function fetchDiaryEntries() {
   const headers = getAuthHeaders();
+  const items = [];
 
-  const res = await fetch(`${API_URL}/api/diario/`, {
-    method: "GET",
-    headers,
-  });
+  // A API devolve páginas ({ results, next }); seguimos "next" até o fim
+  let url = `${API_URL}/api/diario/`;
+  while (url) {
+    const res = await fetch(url, {
+      method: "GET",
+      headers,
+    });
 
-  const data = await res.json().catch(() => null);
+    const data = await res.json().catch(() => null);
 
-  if (!res.ok) {
-    const errorMessage = extractErrorMessage(
-      data,
-      "Erro ao carregar entradas do diário."
-    );
-    throw new Error(errorMessage);
+    if (!res.ok) {
+      const errorMessage = extractErrorMessage(
+        data,
+        "Erro ao carregar entradas do diário."
+      );
+      throw new Error(errorMessage);
+    }
+
+    items.push(...data.results);
+    url = data.next;
   }
 
-  return data;
+  return items;
 }
 
 // POST /api/diario/
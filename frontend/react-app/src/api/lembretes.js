@@ -37,23 +37,82 @@ function getAuthHeaders() {
 // LISTAR lembretes do usuário logado
 export async function fetchReminders() {
   const headers = getAuthHeaders();
+  const items = [];
 
-  const res = await fetch(`${API_URL}/api/lembretes/`, {
-    method: "GET",
-    headers,
+  // A API devolve páginas ({ results, next }); seguimos "next" até o fim
+  let url = `${API_URL}/api/lembretes/`;
+  while (url) {
+    const res = await fetch(url, {
+      method: "GET",
+      headers,
+    });
+
+    const data = await res.json().catch(() => null);
+
+    if (!res.ok) {
+      const errorMessage = extractErrorMessage(
+        data,
+        "Erro ao carregar lembretes."
+      );
+      throw new Error(errorMessage);
+    }
+
+    items.push(...data.results);
+    url = data.next;
+  }
+
+  return items; // lista de lembretes
+}
+
+// CRIAR vários lembretes de uma vez (ex: uma semana de remédios).
+// Tudo ou nada: se algum item for inválido, nenhum é criado e o erro
+// indica o número do item.
+export async function createReminders(lembretes) {
+  const baseHeaders = getAuthHeaders();
+
+  const res = await fetch(`${API_URL}/api/lembretes/lote/`, {
+    method: "POST",
+    headers: {
+      ...baseHeaders,
+      "Content-Type": "application/json",
+    },
+    body: JSON.stringify(lembretes),
   });
 
   const data = await res.json().catch(() => null);
 
   if (!res.ok) {
-    const errorMessage = extractErrorMessage(
-      data,
-      "Erro ao carregar lembretes."
-    );
-    throw new Error(errorMessage);
+    if (Array.isArray(data)) {
+      const index = data.findIndex((erros) => Object.keys(erros).length > 0);
+      const message = extractErrorMessage(data[index], "dados inválidos.");
+      throw new Error(`Lembrete ${index + 1}: ${message}`);
+    }
+    throw new Error(extractErrorMessage(data, "Erro ao criar lembretes."));
+  }
+
+  return data; // lista dos lembretes criados
+}
+
+// MARCAR vários lembretes como concluídos (ou não) de uma vez
+export async function completeReminders(ids, concluido = true) {
+  const baseHeaders = getAuthHeaders();
+
+  const res = await fetch(`${API_URL}/api/lembretes/concluir/`, {
+    method: "POST",
+    headers: {
+      ...baseHeaders,
+      "Content-Type": "application/json",
+    },
+    body: JSON.stringify({ ids, concluido }),
+  });
+
+  const data = await res.json().catch(() => null);
+
+  if (!res.ok) {
+    throw new Error(extractErrorMessage(data, "Erro ao atualizar lembretes."));
   }
 
-  return data; // lista de lembretes
+  return data; // { atualizados, nao_encontrados }
 }
 
 // BUSCAR um lembrete específico (para edição)
@@ -1,9 +1,22 @@
 import { useState, useRef, useEffect } from "react";
 import { Link, useNavigate } from "react-router-dom";
 import Header from "../components/Header";
-import { sendChatMessage, fetchChatHistory } from "../api/chat";
+import {
+  streamChatMessage,
+  fetchChatHistory,
+  startNewChatSession,
+} from "../api/chat";
 import useSpeechRecognition from "../hooks/useSpeechRecognition";
 
+// Mensagem do histórico (API) no formato usado na tela
+function formatHistoryMessage(msg) {
+  return {
+    id: msg.id,
+    sender: msg.role === "user" ? "user" : "bot",
+    text: msg.content,
+  };
+}
+
 function Assistente() {
   const navigate = useNavigate();
 
@@ -12,6 +25,9 @@ function Assistente() {
   const [messages, setMessages] = useState([]);
   const [chatStarted, setChatStarted] = useState(false);
   const [isLoadingHistory, setIsLoadingHistory] = useState(true);
+  // Cursor das mensagens mais antigas que as da tela (null: não há mais)
+  const [olderCursor, setOlderCursor] = useState(null);
+  const [isLoadingOlder, setIsLoadingOlder] = useState(false);
   const [isSending, setIsSending] = useState(false);
   const [chatError, setChatError] = useState("");
 
@@ -20,6 +36,8 @@ function Assistente() {
   const lastSpokenIdRef = useRef(null);
 
   const messagesEndRef = useRef(null);
+  // Ao carregar mensagens antigas, a tela não deve pular para o fim
+  const skipScrollRef = useRef(false);
 
   // Hook de Voz (reconhecimento de fala)
   const {
@@ -45,13 +63,9 @@ function Assistente() {
         setIsLoadingHistory(true);
         const historyData = await fetchChatHistory();
 
-        if (historyData && historyData.length > 0) {
-          const formattedMessages = historyData.map((msg) => ({
-            id: msg.id,
-            sender: msg.role === "user" ? "user" : "bot",
-            text: msg.content,
-          }));
-          setMessages(formattedMessages);
+        if (historyData && historyData.mensagens.length > 0) {
+          setMessages(historyData.mensagens.map(formatHistoryMessage));
+          setOlderCursor(historyData.anteriores);
           setChatStarted(true);
         }
       } catch (err) {
@@ -63,8 +77,31 @@ function Assistente() {
     loadHistory();
   }, []);
 
+  // Carrega a página de mensagens anterior às que estão na tela
+  const handleLoadOlder = async () => {
+    if (!olderCursor || isLoadingOlder) return;
+    try {
+      setIsLoadingOlder(true);
+      const historyData = await fetchChatHistory(olderCursor);
+      skipScrollRef.current = true;
+      setMessages((prev) => [
+        ...historyData.mensagens.map(formatHistoryMessage),
+        ...prev,
+      ]);
+      setOlderCursor(historyData.anteriores);
+    } catch (err) {
+      setChatError(err.message);
+    } finally {
+      setIsLoadingOlder(false);
+    }
+  };
+
   // Scroll automático pro fim da conversa
   useEffect(() => {
+    if (skipScrollRef.current) {
+      skipScrollRef.current = false;
+      return;
+    }
     if (messagesEndRef.current) {
       messagesEndRef.current.scrollIntoView({ behavior: "smooth" });
     }
@@ -93,6 +130,9 @@ function Assistente() {
     // Se já foi lida, não repete
     if (lastSpokenIdRef.current === lastBotMessage.id) return;
 
+    // Só lê depois que a resposta terminou de chegar (streaming)
+    if (lastBotMessage.streaming) return;
+
     lastSpokenIdRef.current = lastBotMessage.id;
     speakText(lastBotMessage.text);
   }, [messages, ttsEnabled]);
@@ -112,22 +152,54 @@ function Assistente() {
     setMessage("");
     setTranscript("");
 
+    const botId = tempId + 1;
+
     try {
       setIsSending(true);
-      const resposta = await sendChatMessage(text);
-
       setMessages((prev) => [
         ...prev,
-        { id: Date.now() + 1, sender: "bot", text: resposta },
+        { id: botId, sender: "bot", text: "", streaming: true },
       ]);
+
+      // A resposta vai aparecendo conforme o modelo gera os tokens
+      const resposta = await streamChatMessage(text, (delta) => {
+        setMessages((prev) =>
+          prev.map((m) => (m.id === botId ? { ...m, text: m.text + delta } : m))
+        );
+      });
+
+      setMessages((prev) =>
+        prev.map((m) =>
+          m.id === botId ? { ...m, text: resposta, streaming: false } : m
+        )
+      );
       // Leitura automática fica a cargo do useEffect
     } catch (err) {
+      // Remove a bolha vazia/incompleta da resposta
+      setMessages((prev) => prev.filter((m) => m.id !== botId));
       setChatError("Erro ao obter resposta. Tente novamente.");
     } finally {
       setIsSending(false);
     }
   };
 
+  // Nova conversa: o servidor só abre uma sessão nova (nada é apagado)
+  const handleNewChat = async () => {
+    if (isSending) return;
+    setChatError("");
+    try {
+      await startNewChatSession();
+      if (typeof window !== "undefined" && window.speechSynthesis) {
+        window.speechSynthesis.cancel();
+      }
+      setMessages([]);
+      setOlderCursor(null);
+      setChatStarted(false);
+    } catch (err) {
+      setChatError(err.message);
+    }
+  };
+
   const handleBack = () => {
     if (typeof window !== "undefined" && window.speechSynthesis) {
       window.speechSynthesis.cancel();
@@ -178,9 +250,20 @@ function Assistente() {
           <h1 className="flex-1 text-center text-2xl font-semibold text-gray-900">
             Assistente
           </h1>
-          <div className="bg-white rounded-full w-11 h-11 flex justify-center items-center shadow text-primary">
-            <i className="fas fa-user-circle"></i>
-          </div>
+          {messages.length > 0 ? (
+            <button
+              onClick={handleNewChat}
+              disabled={isSending}
+              className="bg-white rounded-full w-11 h-11 flex justify-center items-center shadow text-primary disabled:opacity-50"
+              title="Nova conversa"
+            >
+              <i className="fas fa-redo"></i>
+            </button>
+          ) : (
+            <div className="bg-white rounded-full w-11 h-11 flex justify-center items-center shadow text-primary">
+              <i className="fas fa-user-circle"></i>
+            </div>
+          )}
         </header>
 
         {displayError && (
@@ -213,8 +296,29 @@ function Assistente() {
               </div>
             )}
 
+            {olderCursor && (
+              <div className="text-center">
+                <button
+                  onClick={handleLoadOlder}
+                  disabled={isLoadingOlder}
+                  className="px-4 py-2 text-sm text-[#3A5FCD] font-semibold disabled:opacity-50"
+                >
+                  {isLoadingOlder ? (
+                    <>
+                      <i className="fas fa-spinner fa-spin mr-2"></i> Carregando...
+                    </>
+                  ) : (
+                    "Ver mensagens anteriores"
+                  )}
+                </button>
+              </div>
+            )}
+
             {(chatStarted || messages.length > 0) &&
-              messages.map((msg) => (
+              messages
+                // Bolha da resposta só aparece quando chega o primeiro token
+                .filter((msg) => !msg.streaming || msg.text)
+                .map((msg) => (
                 <div
                   key={msg.id}
                   className={`flex ${
@@ -238,7 +342,7 @@ function Assistente() {
                 </div>
               ))}
 
-            {isSending && (
+            {isSending && !messages.some((m) => m.streaming && m.text) && (
               <div className="flex justify-start animate-pulse ml-10">
                 <div className="bg-gray-200 px-4 py-2 rounded-full text-xs text-gray-500">
                   Digitando...
@@ -1,8 +1,20 @@
+import { useEffect, useState } from "react";
 import { Link, useNavigate } from "react-router-dom";
 import Header from "../components/Header";
+import { fetchDailyBriefing } from "../api/chat";
 
 export default function Dashboard() {
   const navigate = useNavigate();
+  const [briefing, setBriefing] = useState(null);
+
+  useEffect(() => {
+    // Briefing do dia já vem pronto do backend; se falhar, o dashboard segue sem ele
+    fetchDailyBriefing()
+      .then((data) => {
+        if (data && data.atualizado) setBriefing(data.conteudo);
+      })
+      .catch(() => {});
+  }, []);
 
   const handleLogout = () => {
     // aqui depois vamos limpar token e afins
@@ -15,7 +27,17 @@ export default function Dashboard() {
       <Header username="Usuário" onLogout={handleLogout} />
 
       {/* Área principal: ocupa o resto e centraliza os atalhos */}
-      <main className="flex-1 flex items-center justify-center pb-6">
+      <main className="flex-1 flex flex-col items-center justify-center gap-5 pb-6">
+        {briefing && (
+          <div className="bg-white rounded-3xl p-5 shadow-lg w-full max-w-xs">
+            <h2 className="text-xl mb-2">
+              <i className="fas fa-sun text-primary mr-2"></i>
+              Seu dia
+            </h2>
+            <p className="whitespace-pre-line">{briefing}</p>
+          </div>
+        )}
+
         <div className="grid grid-cols-2 gap-5 w-full max-w-xs">
           <Link
             to="/lembretes"